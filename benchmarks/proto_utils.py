@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+# Compare the time taken to convert a config block between the binary and JSON
+# formats using configtxlator subprocesses, a configtxlator server, and the
+# native codec. The collection must be installed, for example by running
+# "just local", and configtxlator must be on the path.
+#
+# Usage: python benchmarks/proto_utils.py <config block> [iterations]
+
+import os
+import sys
+import time
+
+from ansible_collections.hyperledger.fabric_ansible_collection.plugins.module_utils.proto_utils import json_to_proto, proto_to_json
+
+
+def benchmark(mode, block, iterations, codec, server):
+    os.environ['IBP_ANSIBLE_PROTO_CODEC'] = codec
+    os.environ['IBP_ANSIBLE_CONFIGTXLATOR_SERVER'] = server
+
+    # Convert once before timing, so that the server mode is not charged for
+    # starting the server.
+    block_json = proto_to_json('common.Block', block)
+    config_json = block_json['data']['data'][0]['payload']['data']['config']
+    start = time.time()
+    for _ in range(iterations):
+        block_json = proto_to_json('common.Block', block)
+        json_to_proto('common.Config', config_json)
+    elapsed = time.time() - start
+    print(f'{mode:<12} {iterations} iterations in {elapsed:.3f}s, {elapsed * 1000 / iterations:.1f}ms per decode and encode')
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(f'Usage: {sys.argv[0]} <config block> [iterations]')
+        sys.exit(1)
+    with open(sys.argv[1], 'rb') as file:
+        block = file.read()
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    benchmark('subprocess', block, iterations, 'configtxlator', 'false')
+    benchmark('server', block, iterations, 'configtxlator', 'true')
+    benchmark('native', block, iterations, 'native', 'false')
+
+
+if __name__ == '__main__':
+    main()
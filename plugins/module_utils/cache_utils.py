@@ -0,0 +1,350 @@
+#!/usr/bin/python
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+
+def get_cache_dir():
+
+    # The cache directory is shared by all of the module invocations on this
+    # host, so it must only be accessible by the current user.
+    cache_dir = os.environ.get('IBP_ANSIBLE_CACHE_DIR', None)
+    if not cache_dir:
+        cache_dir = os.path.join(tempfile.gettempdir(), f'ibp-ansible-cache-{os.getuid()}')
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        st = os.lstat(cache_dir)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        return None
+    return cache_dir
+
+
+def hash_key(*parts):
+    m = hashlib.sha256()
+    for part in parts:
+        m.update(str(part).encode('utf-8'))
+        m.update(b'\0')
+    return m.hexdigest()
+
+
+def write_json_atomic(path, data):
+
+    # Write to a temporary file and rename it, so that other processes never
+    # see a partially written cache entry. The caches are only an optimization,
+    # so failing to write them is not an error.
+    try:
+        (fd, temp_path) = tempfile.mkstemp(dir=os.path.dirname(path))
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+class FileCache:
+
+    def __init__(self, name, ttl):
+        self.ttl = ttl
+        self.path = None
+        if ttl > 0:
+            cache_dir = get_cache_dir()
+            if cache_dir:
+                self.path = os.path.join(cache_dir, f'{name}.json')
+
+    @contextlib.contextmanager
+    def lock(self):
+
+        # Hold an exclusive lock across a get and a set, so that concurrent
+        # processes wait for one of them to populate the cache entry.
+        if not self.path:
+            yield
+            return
+        try:
+            fd = os.open(f'{self.path}.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError:
+            yield
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def get(self):
+        if not self.path:
+            return None
+        try:
+            with open(self.path, 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if entry.get('expires', 0) <= time.time():
+            return None
+        return entry.get('value', None)
+
+    def set(self, value, ttl=None):
+        if not self.path:
+            return
+        if ttl is None:
+            ttl = self.ttl
+        entry = dict(expires=time.time() + ttl, value=value)
+        write_json_atomic(self.path, entry)
+
+    def invalidate(self):
+        if not self.path:
+            return
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class LRUFileStore:
+
+    def __init__(self, name, max_entries):
+        self.max_entries = max_entries
+        self.path = None
+        if max_entries > 0:
+            cache_dir = get_cache_dir()
+            if cache_dir:
+                self.path = os.path.join(cache_dir, name)
+                try:
+                    os.makedirs(self.path, mode=0o700, exist_ok=True)
+                except OSError:
+                    self.path = None
+
+    def get(self, key):
+        if not self.path:
+            return None
+        path = os.path.join(self.path, f'{key}.json')
+        try:
+            with open(path, 'r') as file:
+                value = json.load(file)
+
+            # The modification time records when the entry was last used.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def set(self, key, value):
+        if not self.path:
+            return
+        write_json_atomic(os.path.join(self.path, f'{key}.json'), value)
+        self._evict()
+
+    def _evict(self):
+        try:
+            entries = list()
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.json'):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        except OSError:
+            return
+        entries.sort()
+        for (_, path) in entries[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class DirectoryCache:
+
+    def __init__(self, name, max_entries):
+        self.max_entries = max_entries
+        self.path = None
+        if max_entries > 0:
+            cache_dir = get_cache_dir()
+            if cache_dir:
+                self.path = os.path.join(cache_dir, name)
+                try:
+                    os.makedirs(self.path, mode=0o700, exist_ok=True)
+                except OSError:
+                    self.path = None
+
+    def acquire(self, key, populate):
+
+        # Returns the path to the directory for the key, populating it first if
+        # required, and a lock that must be passed to release_directory. Every
+        # user holds a shared lock on the directory, so that it is not evicted
+        # while it is in use. Returns a path of None if the cache is disabled.
+        if not self.path:
+            return (None, None)
+        lock = self._lock(key, fcntl.LOCK_SH)
+        if lock is None:
+            return (None, None)
+        try:
+            path = os.path.join(self.path, key)
+            if os.path.isdir(path):
+                os.utime(path)
+                return (path, lock)
+
+            # Populate a temporary directory and rename it, so that other
+            # processes never see a partially populated directory.
+            temp_path = tempfile.mkdtemp(dir=self.path, prefix='.')
+            try:
+                populate(temp_path)
+                os.rename(temp_path, path)
+            except OSError:
+                if not os.path.isdir(path):
+                    raise
+            finally:
+                shutil.rmtree(temp_path, ignore_errors=True)
+            self._evict(key)
+            return (path, lock)
+        except OSError:
+            os.close(lock)
+            return (None, None)
+        except BaseException:
+            os.close(lock)
+            raise
+
+    def _lock(self, key, operation):
+
+        # The lock file is removed when the directory is evicted, so a lock taken
+        # on a lock file that has since been removed does not protect anything.
+        # Check that the lock file is still in place after locking it.
+        lock_path = os.path.join(self.path, f'{key}.lock')
+        while True:
+            try:
+                lock = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            except OSError:
+                return None
+            try:
+                fcntl.flock(lock, operation)
+                stat = os.fstat(lock)
+                current_stat = os.stat(lock_path)
+                if (stat.st_dev, stat.st_ino) == (current_stat.st_dev, current_stat.st_ino):
+                    return lock
+            except FileNotFoundError:
+                pass
+            except OSError:
+                os.close(lock)
+                return None
+            except BaseException:
+                os.close(lock)
+                raise
+            os.close(lock)
+
+    def _evict(self, key):
+        try:
+            entries = list()
+            for entry in os.scandir(self.path):
+                if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.') and entry.name != key:
+                    entries.append((entry.stat().st_mtime, entry.name))
+        except OSError:
+            return
+        entries.sort()
+
+        # Skip any directories that are still in use by another process.
+        for (_, name) in entries[:max(len(entries) + 1 - self.max_entries, 0)]:
+            lock = self._lock(name, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if lock is None:
+                continue
+            try:
+                path = os.path.join(self.path, name)
+                shutil.rmtree(path, ignore_errors=True)
+
+                # Remove the lock file while it is still locked, so that it is
+                # not left behind. Any process that is waiting on it will find
+                # that it has been removed and create a new one.
+                if not os.path.exists(path):
+                    os.unlink(os.path.join(self.path, f'{name}.lock'))
+            except OSError:
+                pass
+            finally:
+                os.close(lock)
+
+
+def release_directory(path, lock):
+
+    # Directories that did not come from a cache are temporary.
+    if lock is None:
+        shutil.rmtree(path)
+    else:
+        os.close(lock)
+
+
+class ComponentInventory:
+
+    # An index of the components in the console, used only to look up the IDs of
+    # components. Only the attributes that are indexed are kept, so the details of
+    # a component must always be retrieved from the console.
+
+    INDEXES = ['id', 'display_name', 'type', 'cluster_name', 'msp_id']
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.components = None
+        self.indexes = None
+        self.fresh = False
+
+    def get_components(self, loader):
+        if self.components is None:
+            components = self.cache.get()
+            if components is None:
+                self.refresh(loader())
+            else:
+                self.fresh = False
+                self._build_indexes(components)
+        return self.components
+
+    def refresh(self, components):
+        self._build_indexes(components)
+        self.cache.set(self.components)
+        self.fresh = True
+
+    def find(self, loader, **criteria):
+        components = self.get_components(loader)
+        if not criteria:
+            return list(components)
+
+        # Intersect the positions from each index, preserving the order
+        # that the console returned the components in.
+        positions = None
+        for attribute, value in criteria.items():
+            matches = set(self.indexes[attribute].get(value, list()))
+            positions = matches if positions is None else positions & matches
+        return [components[position] for position in sorted(positions)]
+
+    def invalidate(self):
+        self.components = None
+        self.indexes = None
+        self.fresh = False
+        self.cache.invalidate()
+
+    def _build_indexes(self, components):
+        components = [
+            {attribute: component[attribute] for attribute in self.INDEXES if attribute in component}
+            for component in components
+        ]
+        indexes = {attribute: dict() for attribute in self.INDEXES}
+        for position, component in enumerate(components):
+            for attribute in self.INDEXES:
+                value = component.get(attribute, None)
+                if value is not None:
+                    indexes[attribute].setdefault(value, list()).append(position)
+        self.components = components
+        self.indexes = indexes
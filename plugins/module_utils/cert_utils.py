@@ -16,23 +16,58 @@ except ImportError:
     pass
 
 import base64
+import functools
 import hashlib
 
+# The maximum number of base64 encoded certificates, or certificate chains, that
+# are parsed and kept in memory.
+PARSED_CERT_CACHE_SIZE = 256
 
-def load_cert(cert):
+
+class ParsedCert:
+
+    # A certificate that has been parsed once, along with the values that are
+    # used to compare certificates, so that they do not have to be computed again.
+
+    def __init__(self, cert):
+        self.cert = cert
+        self.pem = cert.public_bytes(Encoding.PEM)
+        self.normalized = base64.b64encode(self.pem).decode('utf-8')
+        self.fingerprint = hashlib.sha256(cert.public_bytes(Encoding.DER)).hexdigest()
+        self.ski = get_ski_for_cert(cert)
+        self.aki = get_aki_for_cert(cert)
+        self.subject = cert.subject.rfc4514_string()
+        # The expiry time is a naive datetime in UTC, as returned by older versions of cryptography.
+        if hasattr(cert, 'not_valid_after_utc'):
+            self.not_after = cert.not_valid_after_utc.replace(tzinfo=None)
+        else:
+            self.not_after = cert.not_valid_after
+
+
+@functools.lru_cache(maxsize=PARSED_CERT_CACHE_SIZE)
+def parse_cert(cert):
     parsed_cert = base64.b64decode(cert).decode('utf8')
-    return x509.load_pem_x509_certificate(parsed_cert.encode('utf8'), default_backend())
+    return ParsedCert(x509.load_pem_x509_certificate(parsed_cert.encode('utf8'), default_backend()))
 
 
-def load_certs(certs):
+@functools.lru_cache(maxsize=PARSED_CERT_CACHE_SIZE)
+def parse_certs(certs):
     parsed_certs = base64.b64decode(certs).decode('utf8').split('-----END CERTIFICATE-----\n')
     result = list()
     for parsed_cert in parsed_certs:
         if not parsed_cert.strip():
             continue
         parsed_cert += '-----END CERTIFICATE-----\n'
-        result.append(x509.load_pem_x509_certificate(parsed_cert.encode('utf8'), default_backend()))
-    return result
+        result.append(ParsedCert(x509.load_pem_x509_certificate(parsed_cert.encode('utf8'), default_backend())))
+    return tuple(result)
+
+
+def load_cert(cert):
+    return parse_cert(cert).cert
+
+
+def load_certs(certs):
+    return [parsed_cert.cert for parsed_cert in parse_certs(certs)]
 
 
 def get_ski_for_cert(cert):
@@ -58,15 +93,11 @@ def get_aki_for_cert(cert):
 def split_ca_chain(chain):
     root_certs = list()
     intermediate_certs = list()
-    certs = load_certs(chain)
-    for cert in certs:
-        ski = get_ski_for_cert(cert)
-        aki = get_aki_for_cert(cert)
-        serialized_cert = base64.b64encode(cert.public_bytes(Encoding.PEM)).decode('utf8')
-        if aki is None or ski == aki:
-            root_certs.append(serialized_cert)
+    for cert in parse_certs(chain):
+        if cert.aki is None or cert.ski == cert.aki:
+            root_certs.append(cert.normalized)
         else:
-            intermediate_certs.append(serialized_cert)
+            intermediate_certs.append(cert.normalized)
     return (root_certs, intermediate_certs)
 
 
@@ -94,6 +125,15 @@ def normalize_whitespace(cert):
     # Load and save the certificate. This will format the certificate
     # as per the cryptography module rules, rather than whatever it was
     # passed in as - this is needed so we can compare certificates.
-    loaded_cert = load_cert(cert)
-    pem = loaded_cert.public_bytes(Encoding.PEM)
-    return base64.b64encode(pem).decode('utf-8')
+    return parse_cert(cert).normalized
+
+
+def diff_certs(expected_certs, actual_certs):
+    # Compare two lists of certificates by fingerprint, and return the
+    # certificates that are missing from, and the certificates that should
+    # be removed from, the actual certificates, with normalized whitespace.
+    expected = {parse_cert(cert).fingerprint: parse_cert(cert).normalized for cert in expected_certs}
+    actual = {parse_cert(cert).fingerprint: parse_cert(cert).normalized for cert in actual_certs}
+    missing_certs = [expected[fingerprint] for fingerprint in expected.keys() - actual.keys()]
+    extra_certs = [actual[fingerprint] for fingerprint in actual.keys() - expected.keys()]
+    return (missing_certs, extra_certs)
@@ -10,6 +10,7 @@ __metaclass__ = type
 from ansible.module_utils.urls import open_url
 
 from .enrolled_identities import EnrolledIdentity
+from .key_pools import PooledCrypto, get_key_pool_size
 from .pkcs11.crypto import PKCS11Crypto
 
 try:
@@ -28,6 +29,7 @@ import ipaddress
 import json
 import os
 import tempfile
+import threading
 import time
 import urllib
 
@@ -142,6 +144,9 @@ class CertificateAuthorityConnection:
         self.hsm = hsm
         self.tls = tls
         self.retries = retries
+        self.retry_policy = module.retry_policy
+        self.enrollments = dict()
+        self.enrollments_lock = threading.Lock()
 
     def __enter__(self):
         temp = tempfile.mkstemp()
@@ -152,6 +157,9 @@ class CertificateAuthorityConnection:
             self.crypto = PKCS11Crypto(self.hsm['pkcs11library'], self.hsm['label'], self.hsm['pin'])
         else:
             self.crypto = ecies()
+        key_pool_size = get_key_pool_size()
+        if key_pool_size:
+            self.crypto = PooledCrypto(self.crypto, key_pool_size)
         ca_name = self.certificate_authority.ca_name
         if self.tls:
             ca_name = self.certificate_authority.tlsca_name
@@ -161,6 +169,8 @@ class CertificateAuthorityConnection:
         return self
 
     def __exit__(self, type, value, tb):
+        if isinstance(self.crypto, PooledCrypto):
+            self.crypto.close()
         os.remove(self.pem_path)
 
     def get_ca_chain(self):
@@ -301,6 +311,20 @@ class CertificateAuthorityConnection:
             raise CertificateAuthorityException(result['errors'][0]['code'], result['errors'][0]['message'])
         return result['result']
 
+    def get_all_registrations(self, registrar):
+        return self._run_with_retry(lambda: self._get_all_registrations(registrar))
+
+    def _get_all_registrations(self, registrar):
+
+        # List all of the identities that the registrar can see with a single request,
+        # and return them indexed by enrollment ID. An identity that is not in the index
+        # is treated the same as an identity that is not registered.
+        result = self.identity_service.getAll(self._get_enrollment(registrar))
+        if not result['success']:
+            raise CertificateAuthorityException(result['errors'][0]['code'], result['errors'][0]['message'])
+        identities = (result['result'] or dict()).get('identities') or list()
+        return {identity['id']: identity for identity in identities}
+
     def create_registration(self, registrar, enrollment_id, enrollment_secret, type, affiliation, max_enrollments, attrs):
         return self._run_with_retry(lambda: self._create_registration(registrar, enrollment_id, enrollment_secret, type, affiliation, max_enrollments, attrs))
 
@@ -340,6 +364,18 @@ class CertificateAuthorityConnection:
         return self.ca_service.generateCRL(None, None, None, None, self._get_enrollment(registrar))
 
     def _get_enrollment(self, identity):
+
+        # The enrollment for an identity, typically the registrar, is reused for
+        # every request made over this connection, including requests made from
+        # multiple threads, so that the private key is only loaded once.
+        with self.enrollments_lock:
+            enrollment = self.enrollments.get(identity.cert)
+            if enrollment is None:
+                enrollment = self._create_enrollment(identity)
+                self.enrollments[identity.cert] = enrollment
+            return enrollment
+
+    def _create_enrollment(self, identity):
         if self.hsm and not identity.hsm:
             raise Exception('HSM configuration specified, but specified identity does not use HSM')
         elif not self.hsm and identity.hsm:
@@ -366,11 +402,7 @@ class CertificateAuthorityConnection:
                 msg = str(e)
                 if attempt >= self.retries:
                     raise e
-                elif "timed out" in msg:
-                    time.sleep(5)
-                    continue
-                elif "retries exceeded" in msg:
-                    time.sleep(5)
+                elif ("timed out" in msg or "retries exceeded" in msg) and self.retry_policy.sleep(attempt):
                     continue
                 else:
                     raise e
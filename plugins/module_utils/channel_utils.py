@@ -6,6 +6,8 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+from .proto_codec import decode_message, encode_message
+
 
 def get_application_capability(channel_group):
     application_capabilities = channel_group['groups'].get('Application', dict()).get('values', dict()).get('Capabilities', dict()).get('value', dict()).get('capabilities', dict())
@@ -45,3 +47,122 @@ def get_highest_capability(channel_group):
     if capabilities:
         return capabilities[0]
     return None
+
+
+def _equal_policies(original_policy, updated_policy):
+    return encode_message('common.Policy', original_policy) == encode_message('common.Policy', updated_policy)
+
+
+def _equal_values(key, original_value, updated_value):
+    return encode_message('common.ConfigValue', dict(value=original_value), key) == encode_message('common.ConfigValue', dict(value=updated_value), key)
+
+
+def _compute_policies_map_update(original, updated):
+    read_set, write_set, same_set = dict(), dict(), dict()
+    updated_members = False
+    for name, original_policy in original.items():
+        if name not in updated:
+            updated_members = True
+            continue
+        updated_policy = updated[name]
+        if original_policy.get('mod_policy', '') == updated_policy.get('mod_policy', '') and _equal_policies(original_policy.get('policy'), updated_policy.get('policy')):
+            same_set[name] = dict(version=original_policy.get('version', '0'))
+            continue
+        write_set[name] = dict(version=str(int(original_policy.get('version', '0')) + 1), mod_policy=updated_policy.get('mod_policy', ''), policy=updated_policy.get('policy'))
+    for name, updated_policy in updated.items():
+        if name in original:
+            continue
+        updated_members = True
+        write_set[name] = dict(version='0', mod_policy=updated_policy.get('mod_policy', ''), policy=updated_policy.get('policy'))
+    return read_set, write_set, same_set, updated_members
+
+
+def _compute_values_map_update(original, updated):
+    read_set, write_set, same_set = dict(), dict(), dict()
+    updated_members = False
+    for name, original_value in original.items():
+        if name not in updated:
+            updated_members = True
+            continue
+        updated_value = updated[name]
+        if original_value.get('mod_policy', '') == updated_value.get('mod_policy', '') and _equal_values(name, original_value.get('value'), updated_value.get('value')):
+            same_set[name] = dict(version=original_value.get('version', '0'))
+            continue
+        write_set[name] = dict(version=str(int(original_value.get('version', '0')) + 1), mod_policy=updated_value.get('mod_policy', ''), value=updated_value.get('value'))
+    for name, updated_value in updated.items():
+        if name in original:
+            continue
+        updated_members = True
+        write_set[name] = dict(version='0', mod_policy=updated_value.get('mod_policy', ''), value=updated_value.get('value'))
+    return read_set, write_set, same_set, updated_members
+
+
+def _compute_groups_map_update(original, updated):
+    read_set, write_set, same_set = dict(), dict(), dict()
+    updated_members = False
+    for name, original_group in original.items():
+        if name not in updated:
+            updated_members = True
+            continue
+        group_read_set, group_write_set, group_updated = _compute_group_update(original_group, updated[name])
+        if not group_updated:
+            same_set[name] = group_read_set
+            continue
+        read_set[name] = group_read_set
+        write_set[name] = group_write_set
+    for name, updated_group in updated.items():
+        if name in original:
+            continue
+        updated_members = True
+        _, group_write_set, _ = _compute_group_update(dict(), updated_group)
+        write_set[name] = dict(version='0', mod_policy=updated_group.get('mod_policy', ''), policies=group_write_set['policies'], values=group_write_set['values'], groups=group_write_set['groups'])
+    return read_set, write_set, same_set, updated_members
+
+
+def _compute_group_update(original, updated):
+    version = original.get('version', '0')
+    read_set_policies, write_set_policies, same_set_policies, policies_updated = _compute_policies_map_update(original.get('policies') or dict(), updated.get('policies') or dict())
+    read_set_values, write_set_values, same_set_values, values_updated = _compute_values_map_update(original.get('values') or dict(), updated.get('values') or dict())
+    read_set_groups, write_set_groups, same_set_groups, groups_updated = _compute_groups_map_update(original.get('groups') or dict(), updated.get('groups') or dict())
+
+    # If no members were added or removed, and the mod policy is the same, then
+    # only the modified members need to be included.
+    if not (policies_updated or values_updated or groups_updated or original.get('mod_policy', '') != updated.get('mod_policy', '')):
+        if not (read_set_policies or write_set_policies or read_set_values or write_set_values or read_set_groups or write_set_groups):
+            return dict(version=version), dict(version=version), False
+        read_set = dict(version=version, policies=read_set_policies, values=read_set_values, groups=read_set_groups)
+        write_set = dict(version=version, policies=write_set_policies, values=write_set_values, groups=write_set_groups)
+        return read_set, write_set, True
+
+    # Otherwise, the group itself is being modified, so all of the unchanged
+    # members must be included in both the read set and the write set.
+    for name, same_policy in same_set_policies.items():
+        read_set_policies[name] = same_policy
+        write_set_policies[name] = same_policy
+    for name, same_value in same_set_values.items():
+        read_set_values[name] = same_value
+        write_set_values[name] = same_value
+    for name, same_group in same_set_groups.items():
+        read_set_groups[name] = same_group
+        write_set_groups[name] = same_group
+    read_set = dict(version=version, policies=read_set_policies, values=read_set_values, groups=read_set_groups)
+    write_set = dict(version=str(int(version) + 1), policies=write_set_policies, values=write_set_values, groups=write_set_groups, mod_policy=updated.get('mod_policy', ''))
+    return read_set, write_set, True
+
+
+def compute_config_update(channel_id, original_config, updated_config):
+
+    # This is the same algorithm as configtxlator compute_update, operating on
+    # the JSON form of the original and updated configurations. Returns None
+    # if there are no differences between the configurations.
+    original_channel_group = original_config.get('channel_group')
+    updated_channel_group = updated_config.get('channel_group')
+    if original_channel_group is None:
+        raise Exception('No channel group included for original config')
+    elif updated_channel_group is None:
+        raise Exception('No channel group included for updated config')
+    read_set, write_set, group_updated = _compute_group_update(original_channel_group, updated_channel_group)
+    if not group_updated:
+        return None
+    config_update = dict(channel_id=channel_id, read_set=read_set, write_set=write_set)
+    return decode_message('common.ConfigUpdate', encode_message('common.ConfigUpdate', config_update))
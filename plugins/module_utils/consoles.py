@@ -9,6 +9,7 @@ __metaclass__ = type
 
 
 import base64
+import concurrent.futures
 import json
 import re
 import ssl
@@ -16,7 +17,9 @@ import time
 import urllib.parse
 
 from ansible.module_utils.basic import missing_required_lib
-from ansible.module_utils.urls import open_url
+
+from .cache_utils import ComponentInventory, FileCache, hash_key
+from .http_utils import HTTPConnectionPool
 
 SEMANTIC_VERSION_IMPORT_ERR = None
 try:
@@ -29,26 +32,45 @@ except ImportError as e:
     SimpleSpec = object
     pass
 
+# IBM Cloud IAM access tokens are valid for an hour; stop using a cached
+# token this many seconds before it expires.
+IAM_TOKEN_EXPIRY_MARGIN = 300
+
 
 class Console:
 
-    def __init__(self, module, api_endpoint, api_timeout, api_token_endpoint, retries=5):
+    def __init__(self, module, api_endpoint, api_timeout, api_token_endpoint, retries=5, pool_size=4, pool_idle_timeout=30, cache_ttl=300):
         self.module = module
         self.api_endpoint = api_endpoint
         self.api_timeout = api_timeout
         self.api_token_endpoint = api_token_endpoint
         self.retries = retries
+        self.retry_policy = module.retry_policy
+        self.pool = HTTPConnectionPool(module, pool_size, pool_idle_timeout)
+        self.cache_ttl = cache_ttl
+        self.inventory = None
+        self.settings_cache = None
+        self.health_cache = None
+        self._settings = None
+        self._health = None
         self.authorization = None
+        self.authorization_cached = False
+        self.reauthenticate = None
         self.v1 = False
         self.logged_in = False
 
     def login(self, api_authtype, api_key, api_secret):
         if api_authtype == 'ibmcloud':
             self._login_ibmcloud(api_key)
+            self.reauthenticate = lambda: self._login_ibmcloud(api_key, use_cache=False)
         elif api_authtype == 'basic':
             self._login_basic(api_key, api_secret)
         else:
             raise Exception(f'invalid authentication type "{api_authtype}" specified, valid values are "ibmcloud" and "basic"')
+        credentials_hash = hash_key(self.api_endpoint, api_authtype, api_key, api_secret)
+        self.inventory = ComponentInventory(FileCache(f'inventory-{credentials_hash}', self.cache_ttl))
+        self.settings_cache = FileCache(f'settings-{credentials_hash}', self.cache_ttl)
+        self.health_cache = FileCache(f'health-{credentials_hash}', self.cache_ttl)
         try:
             self.logged_in = True
             return self._login_v3()
@@ -57,15 +79,56 @@ class Console:
             raise
 
     def _login_v3(self):
-        try:
-            self.v1 = False
-            self.api_base_url = urllib.parse.urljoin(self.api_endpoint, '/ak/api/v3/')
-            self.health = self.get_health()
-            self.settings = self.get_settings()
-        except Exception as e:
-            raise Exception(f'Failed to access the console: {e}')
+        # The console health and settings are not retrieved until they are
+        # needed, see the health and settings properties below.
+        self.v1 = False
+        self.api_base_url = urllib.parse.urljoin(self.api_endpoint, '/ak/api/v3/')
+
+    @property
+    def health(self):
+        if self._health is None:
+            self._health = self._get_cached(self.health_cache, self.get_health)
+        return self._health
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            self._settings = self._get_cached(self.settings_cache, self.get_settings)
+        return self._settings
+
+    def _get_cached(self, cache, loader):
+        value = cache.get()
+        if value is None:
+            try:
+                value = loader()
+            except Exception as e:
+                raise Exception(f'Failed to access the console: {e}')
+            cache.set(value)
+        return value
+
+    def _login_ibmcloud(self, api_key, use_cache=True):
+
+        # Access tokens are cached between tasks, keyed by the API key, so that
+        # we only log in to IBM Cloud when the cached access token is about to expire.
+        cache = FileCache(f'iam-token-{hash_key(self.api_token_endpoint, api_key)}', IAM_TOKEN_EXPIRY_MARGIN)
+        with cache.lock():
+            access_token = cache.get() if use_cache else None
+            if access_token:
+                self.module.json_log({'msg': 'using cached IBM Cloud access token', 'url': self.api_token_endpoint})
+                self.authorization = f'Bearer {access_token}'
+                self.authorization_cached = True
+                return
+            auth = self._get_ibmcloud_token(api_key)
+            access_token = auth['access_token']
+            self.authorization = f'Bearer {access_token}'
+            self.authorization_cached = False
+            ttl = int(auth.get('expires_in', 0)) - IAM_TOKEN_EXPIRY_MARGIN
+            if ttl > 0:
+                cache.set(access_token, ttl)
+            else:
+                cache.invalidate()
 
-    def _login_ibmcloud(self, api_key):
+    def _get_ibmcloud_token(self, api_key):
         data = urllib.parse.urlencode({
             'apikey': api_key,
             'grant_type': 'urn:ibm:params:oauth:grant-type:apikey'
@@ -76,11 +139,10 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to log in to IBM Cloud', 'url': self.api_token_endpoint, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                auth_response = open_url(url=self.api_token_endpoint, method='POST', headers=headers, data=data, timeout=self.api_timeout, follow_redirects='all')
+                auth_response = self._open_url(self.api_token_endpoint, data, headers, 'POST', validate_certs=True)
                 auth = json.load(auth_response)
-                access_token = auth['access_token']
-                self.authorization = f'Bearer {access_token}'
-                return
+                self.module.json_log({'msg': 'logged in to IBM Cloud', 'expires_in': auth.get('expires_in', None)})
+                return auth
             except Exception as e:
                 self.module.json_log({'msg': 'failed to log in to IBM Cloud', 'error': str(e)})
                 if self.should_retry_error(e, attempt):
@@ -91,6 +153,26 @@ class Console:
         credentials = f'{api_key}:{api_secret}'
         self.authorization = f'Basic {base64.b64encode(credentials.encode("utf8")).decode("utf8")}'
 
+    def _open_url(self, url, data, headers, method, validate_certs=False):
+        # All requests go through the connection pool, so that the TCP and TLS
+        # connections to the console are reused across requests.
+        try:
+            try:
+                return self.pool.open_url(url, data, headers, method, validate_certs=validate_certs, timeout=self.api_timeout)
+            except urllib.error.HTTPError as e:
+                # The cached IBM Cloud access token may have been revoked, so get a new one and try again.
+                if e.code != 401 or not self.authorization_cached or not url.startswith(self.api_endpoint):
+                    raise
+                self.module.json_log({'msg': 'cached IBM Cloud access token rejected by the console, logging in again', 'url': url})
+                self.reauthenticate()
+                headers['Authorization'] = self.authorization
+                return self.pool.open_url(url, data, headers, method, validate_certs=validate_certs, timeout=self.api_timeout)
+        finally:
+            # Any request that is not a GET may have created, updated, or deleted
+            # components, so the component inventory can no longer be trusted.
+            if method != 'GET' and self.inventory is not None and url.startswith(self.api_endpoint):
+                self.inventory.invalidate()
+
     def _ensure_loggedin(self):
         if not self.logged_in:
             raise Exception('Not logged in')
@@ -105,7 +187,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to get console health', 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, None, headers, 'GET', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'GET')
                 health = json.load(response)
                 self.module.json_log({'msg': 'got console health', 'health': health})
                 return health
@@ -125,7 +207,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to get console settings', 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, None, headers, 'GET', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'GET')
                 settings = json.load(response)
                 self.module.json_log({'msg': 'got console settings', 'settings': settings})
                 return settings
@@ -137,6 +219,14 @@ class Console:
 
     def get_all_components(self, deployment_attrs='included'):
         self._ensure_loggedin()
+        components = self._get_all_components(deployment_attrs)
+
+        # The details of the components are always returned from the console, but
+        # they can also be used to refresh the component inventory at no extra cost.
+        self.inventory.refresh(components)
+        return components
+
+    def _get_all_components(self, deployment_attrs):
         url = urllib.parse.urljoin(self.api_base_url, f'./components?deployment_attrs={deployment_attrs}&cache=skip')
         headers = {
             'Accepts': 'application/json',
@@ -145,7 +235,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to get all components', 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, None, headers, 'GET', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'GET')
                 parsed_response = json.load(response)
                 components = parsed_response.get('components', list())
                 self.module.json_log({'msg': 'got all components', 'components': components})
@@ -166,7 +256,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to get all components by type', 'type': type, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, None, headers, 'GET', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'GET')
                 parsed_response = json.load(response)
                 components = parsed_response.get('components', list())
                 self.module.json_log({'msg': 'got all components by type', 'type': type, 'components': components})
@@ -187,7 +277,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to get component by id', 'id': id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, None, headers, 'GET', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'GET')
                 component = json.load(response)
                 self.module.json_log({'msg': 'got component by id', 'component': component})
                 return component
@@ -215,28 +305,66 @@ class Console:
                 return self.handle_error('Failed to get component by ID', e)
 
     def get_component_by_display_name(self, component_type, display_name, deployment_attrs='included'):
-        components = self.get_all_components()
-        for component in components:
-            if component.get('display_name', None) == display_name and component.get('type', None) == component_type:
-                return self.get_component_by_id(component['id'], deployment_attrs)
-        return None
+        self._ensure_loggedin()
+
+        # The component inventory is only used to find the ID of the component, the
+        # component itself is always retrieved from the console. If the inventory came
+        # from the cache, it may be out of date, so if the component is not found, or
+        # it has been renamed or deleted, then reload the inventory and try again.
+        while True:
+            matches = self.inventory.find(lambda: self._get_all_components('included'), type=component_type, display_name=display_name)
+            if not matches:
+                if self.inventory.fresh:
+                    return None
+                self.inventory.invalidate()
+                continue
+            try:
+                component = self.get_component_by_id(matches[0]['id'], deployment_attrs)
+            except Exception:
+                if self.inventory.fresh:
+                    raise
+                self.inventory.invalidate()
+                continue
+            if self.inventory.fresh or (component.get('display_name', None) == display_name and component.get('type', None) == component_type):
+                return component
+            self.inventory.invalidate()
 
     def get_components_by_cluster_name(self, component_type, cluster_name, deployment_attrs='included'):
-        components = self.get_all_components()
-        results = list()
-        for component in components:
-            if component.get('cluster_name', None) == cluster_name and component.get('type', None) == component_type:
-                results.append(self.get_component_by_id(component['id'], deployment_attrs))
-        return results
+        return self._get_components_by_attribute(component_type, 'cluster_name', cluster_name, deployment_attrs)
 
     def get_components_by_msp_id(self, component_type, msp_id, deployment_attrs='included'):
-        components = self.get_all_components()
-        results = list()
-        for component in components:
-            if component.get('msp_id', None) == msp_id and component.get('type', None) == component_type:
-                results.append(self.get_component_by_id(component['id'], deployment_attrs))
+        return self._get_components_by_attribute(component_type, 'msp_id', msp_id, deployment_attrs)
+
+    def _get_components_by_attribute(self, component_type, attribute, value, deployment_attrs):
+
+        # Get all of the components of this type, including the deployment attributes,
+        # in a single request rather than one request per matching component.
+        try:
+            components = self.get_all_components_by_type(component_type, deployment_attrs)
+        except Exception as e:
+            self.module.json_log({'msg': 'failed to get components by type, falling back to get component by id', 'type': component_type, 'error': str(e)})
+            components = self.inventory.find(lambda: self._get_all_components('included'), type=component_type, **{attribute: value})
+            ids = [component['id'] for component in components]
+            return self._get_components_by_ids(ids, deployment_attrs)
+        results = [component for component in components if component.get(attribute, None) == value]
+
+        # A component that exists in the console, but not in Kubernetes, will not have
+        # any deployment attributes. Get those components by ID so that they are marked
+        # as missing their deployment attributes in the same way as for a single component.
+        if deployment_attrs == 'included':
+            missing_ids = [component['id'] for component in results if not component.get('imported', False) and 'resources' not in component]
+            if missing_ids:
+                refetched = dict(zip(missing_ids, self._get_components_by_ids(missing_ids, deployment_attrs)))
+                results = [refetched.get(component['id'], component) for component in results]
         return results
 
+    def _get_components_by_ids(self, ids, deployment_attrs):
+        if len(ids) <= 1:
+            return [self.get_component_by_id(id, deployment_attrs) for id in ids]
+        max_workers = min(len(ids), max(self.pool.pool_size, 1))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda id: self.get_component_by_id(id, deployment_attrs), ids))
+
     def create_ca(self, data):
         self._ensure_loggedin()
         url = urllib.parse.urljoin(self.api_base_url, './kubernetes/components/fabric-ca')
@@ -249,7 +377,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to create certificate authority', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 component = json.load(response)
                 self.module.json_log({'msg': 'created certificate authority', 'component': component})
                 return component
@@ -289,7 +417,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to update certificate authority', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, serialized_data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, serialized_data, headers, 'PUT')
                 component = json.load(response)
                 self.module.json_log({'msg': 'updated certificate authority', 'component': component})
                 return component
@@ -308,7 +436,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete certificate authority', 'id': id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, None, headers, 'DELETE')
                 self.module.json_log({'msg': 'deleted certificate authority'})
                 return
             except Exception as e:
@@ -330,7 +458,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to submit update to certificate authority', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'PUT')
                 result = json.load(response)
                 self.module.json_log({'msg': 'submitted update to certificate authority', 'result': result})
                 return result
@@ -353,7 +481,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to submit action to certificate authority', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 result = json.load(response)
                 self.module.json_log({'msg': 'submitted action to certificate authority', 'result': result})
                 return result
@@ -391,7 +519,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to create external certificate authority', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 component = json.load(response)
                 self.module.json_log({'msg': 'created external certificate authority', 'component': component})
                 return component
@@ -413,7 +541,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to update external certificate authority', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'PUT')
                 component = json.load(response)
                 self.module.json_log({'msg': 'updated external certificate authority', 'component': component})
                 return component
@@ -432,7 +560,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete external certificate authority', 'id': id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, None, headers, 'DELETE')
                 self.module.json_log({'msg': 'deleted external certificate authority'})
                 return
             except Exception as e:
@@ -453,7 +581,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to create peer', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 component = json.load(response)
                 self.module.json_log({'msg': 'created peer', 'component': component})
                 return component
@@ -497,7 +625,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to update peer', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, serialized_data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, serialized_data, headers, 'PUT')
                 component = json.load(response)
                 self.module.json_log({'msg': 'updated peer', 'component': component})
                 return component
@@ -520,7 +648,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to submit update to peer', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'PUT')
                 result = json.load(response)
                 self.module.json_log({'msg': 'submitted update to peer', 'result': result})
                 return result
@@ -543,7 +671,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to submit action to peer', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 result = json.load(response)
                 self.module.json_log({'msg': 'submitted action to peer', 'result': result})
                 return result
@@ -562,7 +690,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete peer', 'id': id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, None, headers, 'DELETE')
                 self.module.json_log({'msg': 'deleted peer'})
                 return
             except Exception as e:
@@ -599,7 +727,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to create external peer', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 component = json.load(response)
                 self.module.json_log({'msg': 'created external peer', 'component': component})
                 return component
@@ -621,7 +749,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to update external peer', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'PUT')
                 component = json.load(response)
                 self.module.json_log({'msg': 'updated external peer', 'component': component})
                 return component
@@ -640,7 +768,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete external peer', 'id': id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, None, headers, 'DELETE')
                 self.module.json_log({'msg': 'deleted external peer'})
                 return
             except Exception as e:
@@ -661,7 +789,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to create ordering service', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 components = json.load(response)
                 if 'created' in components:
                     components = components['created']
@@ -684,7 +812,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete ordering service', 'cluster_id': cluster_id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'DELETE')
                 if response.getcode() == 207:
                     json_response = json.load(response)
                     for deleted in json_response['deleted']:
@@ -697,7 +825,7 @@ class Console:
                             # Blockchain Platform console this time.
                             self.module.json_log({'msg': 'attempting to delete ordering service (not in kubernetes)', 'cluster_id': cluster_id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
                             new_url = urllib.parse.urljoin(self.api_endpoint, f'/ak/api/v2/components/tags/{cluster_id}')
-                            open_url(new_url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                            self._open_url(new_url, None, headers, 'DELETE')
                         else:
                             raise Exception(f'{deleted}')
                 self.module.json_log({'msg': 'deleted ordering service'})
@@ -725,7 +853,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete external ordering service', 'cluster_id': cluster_id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'DELETE')
                 if response.getcode() == 207:
                     json_response = json.load(response)
                     for deleted in json_response['deleted']:
@@ -759,7 +887,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to edit ordering service node', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, serialized_data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, serialized_data, headers, 'PUT')
                 component = json.load(response)
                 self.module.json_log({'msg': 'edited ordering service node', 'component': component})
                 return component
@@ -799,7 +927,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to update ordering service node', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, serialized_data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, serialized_data, headers, 'PUT')
                 component = json.load(response)
                 self.module.json_log({'msg': 'updated ordering service node', 'component': component})
                 return component
@@ -818,7 +946,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete ordering service node', 'id': id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, None, headers, 'DELETE')
                 self.module.json_log({'msg': 'deleted ordering service node'})
                 return
             except Exception as e:
@@ -840,7 +968,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to submit update to ordering service node', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'PUT')
                 result = json.load(response)
                 self.module.json_log({'msg': 'submitted update to ordering service node', 'result': result})
                 return result
@@ -863,7 +991,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to submit action to ordering service node', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 result = json.load(response)
                 self.module.json_log({'msg': 'submitted action to ordering service node', 'result': result})
                 return result
@@ -910,7 +1038,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to create external ordering service node', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 component = json.load(response)
                 self.module.json_log({'msg': 'created external ordering service node', 'component': component})
                 return component
@@ -932,7 +1060,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to update external ordering service node', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'PUT')
                 component = json.load(response)
                 self.module.json_log({'msg': 'updated external ordering service node', 'component': component})
                 return component
@@ -953,7 +1081,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete external ordering service node', 'id': id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, None, headers, 'DELETE')
                 self.module.json_log({'msg': 'deleted external ordering service node'})
                 return
             except Exception as e:
@@ -978,7 +1106,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to edit admin certificates', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, data, headers, 'PUT')
                 self.module.json_log({'msg': 'edited admin certificates'})
                 return
             except Exception as e:
@@ -999,7 +1127,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to create organization', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'POST')
                 component = json.load(response)
                 self.module.json_log({'msg': 'created organization', 'component': component})
                 return component
@@ -1021,7 +1149,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to update organization', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                response = open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, data, headers, 'PUT')
                 component = json.load(response)
                 self.module.json_log({'msg': 'updated organization', 'component': component})
                 return component
@@ -1040,7 +1168,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete organization', 'id': id, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, None, headers, 'DELETE')
                 self.module.json_log({'msg': 'deleted organization'})
                 return
             except Exception as e:
@@ -1077,7 +1205,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to submit config block', 'data': data, 'url': url, 'attempt': attempt, 'api_timeout': self.api_timeout})
-                open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, data, headers, 'PUT')
                 self.module.json_log({'msg': 'submitted config block'})
             except Exception as e:
                 self.module.json_log({'msg': 'failed to submit config block', 'error': str(e)})
@@ -1095,38 +1223,34 @@ class Console:
             # HTTP 502 - Bad Gateway
             # HTTP 503 - Service Unavailable
             # HTTP 504 - Gateway Timeout
+            # HTTP 503 Service Unavailable may also specify when to retry.
             transient = error.code in [502, 503, 504]
+            retry_after = error.headers.get('retry-after') if error.headers else None
             if transient:
-                self.module.json_log({'msg': 'Retrying due to http error code' + transient})
-                time.sleep(5)
-                return True
+                self.module.json_log({'msg': f'Retrying due to http error code {error.code}'})
+                return self.retry_policy.sleep(attempt, retry_after if error.code == 503 else None)
             # HTTP 429 Too Many Requests means we should sleep and retry
             # after the specified period of time because too many requests
             # were made at the same time, either by us or by other clients.
             ratelimited = error.code == 429
             if ratelimited:
-                retry_after = error.headers.get('retry-after')
                 self.module.json_log({'msg': f'Retrying after {retry_after} due to http error code 429 (rate limit)'})
-                time.sleep(int(retry_after))
-                return True
+                return self.retry_policy.sleep(attempt, retry_after)
         elif isinstance(error, urllib.error.URLError):
             # This catches a whole bunch of sins, including incorrect DNS
             # names and other user input errors, but also a whole bunch of
             # transient networking problems such as EOF, read timeouts, etc.
             self.module.json_log({'msg': 'Retrying to the URL Error'})
-            time.sleep(5)
-            return True
+            return self.retry_policy.sleep(attempt)
         elif isinstance(error, ssl.SSLError):
             # Catch any SSL/TLS errors; this can include read timeout errors.
             self.module.json_log({'msg': 'Retrying to the SSL Error'})
-            time.sleep(5)
-            return True
+            return self.retry_policy.sleep(attempt)
         # Catch any other errors based on error messages.
         other_errors = ['timed out', 'EOF']
         if any(x in str(error) for x in other_errors):
             self.module.json_log({'msg': f'Retrying to the error text including {str(error)}'})
-            time.sleep(5)
-            return True
+            return self.retry_policy.sleep(attempt)
         return False
 
     def handle_error(self, message, error):
@@ -1177,7 +1301,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to get all console users', 'url': url, 'attempt': attempt})
-                response = open_url(url, None, headers, 'GET', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'GET')
                 break
             except Exception as e:
                 self.module.json_log({'msg': 'failed to get all console users', 'error': str(e)})
@@ -1219,7 +1343,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to create console user', 'data': data, 'url': url, 'attempt': attempt})
-                open_url(url, data, headers, 'POST', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, data, headers, 'POST')
                 break
             except Exception as e:
                 self.module.json_log({'msg': 'failed to create console user', 'error': str(e)})
@@ -1251,7 +1375,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to update console user', 'data': data, 'url': url, 'attempt': attempt})
-                open_url(url, data, headers, 'PUT', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, data, headers, 'PUT')
                 break
             except Exception as e:
                 self.module.json_log({'msg': 'failed to update console user', 'error': str(e)})
@@ -1275,7 +1399,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to delete console user', 'email': email, 'url': url, 'attempt': attempt})
-                open_url(url, None, headers, 'DELETE', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                self._open_url(url, None, headers, 'DELETE')
                 self.module.json_log({'msg': 'deleted console user'})
                 return
             except Exception as e:
@@ -1294,7 +1418,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to get msps by msp id', 'url': url, 'attempt': attempt})
-                response = open_url(url, None, headers, 'GET', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'GET')
                 parsed_response = json.load(response)
                 msps = parsed_response.get('msps', list())
                 self.module.json_log({'msg': 'got msps by msp id', 'msps': msps})
@@ -1315,7 +1439,7 @@ class Console:
         for attempt in range(1, self.retries + 1):
             try:
                 self.module.json_log({'msg': 'attempting to get all available fabric versions', 'url': url, 'attempt': attempt})
-                response = open_url(url, None, headers, 'GET', validate_certs=False, timeout=self.api_timeout, follow_redirects='all')
+                response = self._open_url(url, None, headers, 'GET')
                 parsed_response = json.load(response)
                 versions = parsed_response.get('versions', dict())
                 self.module.json_log({'msg': 'got all available fabric versions', 'versions': versions})
@@ -6,6 +6,8 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+from .cache_utils import DirectoryCache, hash_key
+
 import os.path
 import tempfile
 
@@ -723,9 +725,24 @@ def get_core_yaml():
     return core_yaml
 
 
-def get_fabric_cfg_path():
-    fabric_cfg_path = tempfile.mkdtemp()
+def get_fabric_cfg_path(path='temp'):
+    if path == 'temp':
+        fabric_cfg_path = tempfile.mkdtemp()
+    else:
+        fabric_cfg_path = path
     core_yaml_path = os.path.join(fabric_cfg_path, 'core.yaml')
     with open(core_yaml_path, 'w') as file:
         file.write(core_yaml)
     return fabric_cfg_path
+
+
+def get_shared_fabric_cfg_path():
+
+    # The configuration never changes, so it is cached by the hash of its
+    # contents. The caller must pass the returned path and lock to
+    # release_directory.
+    cache = DirectoryCache('fabric-cfg', 4)
+    (fabric_cfg_path, lock) = cache.acquire(hash_key(core_yaml), get_fabric_cfg_path)
+    if fabric_cfg_path is None:
+        return (get_fabric_cfg_path(), None)
+    return (fabric_cfg_path, lock)
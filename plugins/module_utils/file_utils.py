@@ -10,6 +10,10 @@ import hashlib
 import os
 import tempfile
 
+from .cache_utils import LRUFileStore, hash_key
+
+CHUNK_SIZE = 1024 * 1024
+
 
 def get_temp_file():
     temp = tempfile.mkstemp()
@@ -17,9 +21,42 @@ def get_temp_file():
     return temp[1]
 
 
+def hash_stream(file, hasher, length=None):
+
+    # Hash the file in chunks, so that large files are never read into memory.
+    # If a length is specified, then only that many bytes are hashed.
+    while length is None or length > 0:
+        chunk = file.read(CHUNK_SIZE if length is None else min(CHUNK_SIZE, length))
+        if not chunk:
+            if length is not None:
+                raise EOFError('Unexpected end of file')
+            break
+        hasher.update(chunk)
+        if length is not None:
+            length -= len(chunk)
+    return hasher
+
+
+def sha256_file(path):
+    with open(path, 'rb') as file:
+        return hash_stream(file, hashlib.sha256()).hexdigest()
+
+
+def memoize_file(path, kind, func):
+
+    # Memoize the result of func(path), keyed by the path, size and modification
+    # time of the file, so that unchanged files are not read again by later tasks.
+    # The result must be JSON serializable.
+    max_entries = int(os.environ.get('IBP_ANSIBLE_FILE_DIGEST_CACHE_SIZE', 64))
+    store = LRUFileStore('file-digests', max_entries)
+    st = os.stat(path)
+    key = hash_key(kind, os.path.realpath(path), st.st_size, st.st_mtime_ns)
+    value = store.get(key)
+    if value is None:
+        value = func(path)
+        store.set(key, value)
+    return value
+
+
 def equal_files(file1, file2):
-    with open(file1, 'rb') as file:
-        hash1 = hashlib.sha256(file.read()).hexdigest()
-    with open(file2, 'rb') as file:
-        hash2 = hashlib.sha256(file.read()).hexdigest()
-    return hash1 == hash2
+    return sha256_file(file1) == sha256_file(file2)
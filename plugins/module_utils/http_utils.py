@@ -0,0 +1,182 @@
+#!/usr/bin/python
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import http.client
+import io
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from ansible.module_utils.urls import open_url
+
+# Errors that indicate an idle keep-alive connection was closed by the other
+# end (typically a load balancer) before we tried to reuse it.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+# Methods that can be sent again if the connection was closed after the request
+# was sent, as repeating them cannot change anything on the server.
+SAFE_METHODS = ['GET', 'HEAD', 'OPTIONS']
+
+REDIRECT_CODES = [301, 302, 303, 307, 308]
+
+MAX_REDIRECTS = 10
+
+
+class HTTPResponse(io.BytesIO):
+
+    # A fully read HTTP response, which behaves enough like the response
+    # returned by open_url for callers to use json.load(), getcode(), etc.
+
+    def __init__(self, url, code, reason, headers, body):
+        super().__init__(body)
+        self.url = url
+        self.code = code
+        self.status = code
+        self.reason = reason
+        self.headers = headers
+
+    def getcode(self):
+        return self.code
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+
+class HTTPConnectionPool:
+
+    def __init__(self, module, pool_size=4, idle_timeout=30):
+        self.module = module
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle_connections = dict()
+
+    def open_url(self, url, data=None, headers=None, method='GET', validate_certs=False, timeout=60):
+
+        # Requests that need to go through a proxy, or a disabled pool, use
+        # the standard Ansible implementation instead.
+        if not self._can_pool(url):
+            return open_url(url, data, headers, method, validate_certs=validate_certs, timeout=timeout, follow_redirects='all')
+
+        # Ansible allows the request body to be a string.
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        headers = dict(headers or dict())
+        headers.setdefault('User-Agent', 'ansible-httpget')
+        for redirect in range(0, MAX_REDIRECTS + 1):
+            response = self._request(url, data, headers, method, validate_certs, timeout)
+            if response.code not in REDIRECT_CODES:
+                break
+            location = response.headers.get('location')
+            if not location:
+                break
+            url = urllib.parse.urljoin(url, location)
+            if response.code == 303 or (response.code in [301, 302] and method == 'POST'):
+                method = 'GET'
+                data = None
+                headers.pop('Content-Type', None)
+        if response.code >= 400:
+            raise urllib.error.HTTPError(response.url, response.code, response.reason, response.headers, response)
+        return response
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle_connections.values():
+                for connection, last_used in connections:
+                    connection.close()
+            self.idle_connections = dict()
+
+    def _can_pool(self, url):
+        if self.pool_size <= 0:
+            return False
+        split_url = urllib.parse.urlsplit(url)
+        if split_url.scheme not in ['http', 'https']:
+            return False
+        proxies = urllib.request.getproxies()
+        if split_url.scheme in proxies and not urllib.request.proxy_bypass(split_url.hostname):
+            return False
+        return True
+
+    def _request(self, url, data, headers, method, validate_certs, timeout):
+        split_url = urllib.parse.urlsplit(url)
+        key = (split_url.scheme, split_url.hostname, split_url.port, validate_certs)
+        path = split_url.path or '/'
+        if split_url.query:
+            path = f'{path}?{split_url.query}'
+        while True:
+            (connection, reused) = self._get_connection(key, timeout)
+            started = time.monotonic()
+            sent = False
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                sent = True
+                response = connection.getresponse()
+                body = response.read()
+            except STALE_CONNECTION_ERRORS as e:
+                connection.close()
+                if reused and (not sent or method in SAFE_METHODS):
+                    # The server closed the idle connection; try again on a
+                    # new connection rather than consuming a retry attempt.
+                    # If the request was sent, the server may have acted on it,
+                    # so only requests that are safe to repeat are tried again.
+                    continue
+                raise urllib.error.URLError(e)
+            except (socket.timeout, ssl.SSLError):
+                connection.close()
+                raise
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise urllib.error.URLError(e)
+            elapsed = time.monotonic() - started
+            self.module.json_log({'msg': 'http request', 'method': method, 'url': url, 'status': response.status, 'reused_connection': reused, 'elapsed_ms': round(elapsed * 1000, 1)})
+            if response.will_close:
+                connection.close()
+            else:
+                self._put_connection(key, connection)
+            return HTTPResponse(url, response.status, response.reason, response.headers, body)
+
+    def _get_connection(self, key, timeout):
+        now = time.monotonic()
+        with self.lock:
+            connections = self.idle_connections.get(key, list())
+            while connections:
+                connection, last_used = connections.pop()
+                if now - last_used > self.idle_timeout:
+                    connection.close()
+                    continue
+                connection.timeout = timeout
+                if connection.sock:
+                    connection.sock.settimeout(timeout)
+                return (connection, True)
+        (scheme, host, port, validate_certs) = key
+        if scheme == 'https':
+            if validate_certs:
+                context = ssl.create_default_context()
+            else:
+                context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            connection = http.client.HTTPSConnection(host, port, timeout=timeout, context=context)
+        else:
+            connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        return (connection, False)
+
+    def _put_connection(self, key, connection):
+        with self.lock:
+            connections = self.idle_connections.setdefault(key, list())
+            if len(connections) >= self.pool_size:
+                connection.close()
+                return
+            connections.append((connection, time.monotonic()))
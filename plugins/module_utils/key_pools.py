@@ -0,0 +1,101 @@
+#!/usr/bin/python
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+import queue
+import threading
+
+
+def get_key_pool_size():
+    return max(int(os.environ.get('IBP_ANSIBLE_KEY_POOL_SIZE', 0)), 0)
+
+
+class KeyPool:
+
+    # A pool of private keys that are generated ahead of time by a background
+    # thread, so that an enrollment does not have to wait for a key to be generated.
+    # This matters most when the keys are generated on an HSM. If the pool is
+    # empty, a key is generated when it is taken instead.
+
+    def __init__(self, crypto, size):
+        self.crypto = crypto
+        self.keys = queue.Queue(maxsize=size)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._fill, daemon=True)
+        self.thread.start()
+
+    def take(self):
+        try:
+            return self.keys.get_nowait()
+        except queue.Empty:
+            return self.crypto.generate_private_key()
+
+    def close(self):
+
+        # Stop generating keys, and destroy any keys that were not used.
+        self.stopped.set()
+        self.thread.join()
+        while True:
+            try:
+                key = self.keys.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy(key)
+
+    def _fill(self):
+        while not self.stopped.is_set():
+            try:
+                key = self.crypto.generate_private_key()
+            except Exception:
+                # Keys will be generated when they are taken instead.
+                return
+            while True:
+                try:
+                    self.keys.put(key, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self.stopped.is_set():
+                        self._destroy(key)
+                        return
+
+    def _destroy(self, key):
+
+        # Keys that were generated on an HSM must be destroyed, so that they are
+        # not left on the token. Keys that were generated in software are discarded.
+        destroy_private_key = getattr(self.crypto, 'destroy_private_key', None)
+        if destroy_private_key:
+            destroy_private_key(key)
+
+
+class PooledCrypto:
+
+    # Wraps a crypto suite so that the private keys generated for enrollments,
+    # including the ones generated by the Fabric SDK, are taken from a key pool.
+    # The key pool is only created when the first key is generated, so that no
+    # keys are generated for connections that never enroll an identity.
+
+    def __init__(self, crypto, size):
+        self.crypto = crypto
+        self.size = size
+        self.key_pool = None
+        self.lock = threading.Lock()
+
+    def generate_private_key(self):
+        with self.lock:
+            if self.key_pool is None:
+                self.key_pool = KeyPool(self.crypto, self.size)
+        return self.key_pool.take()
+
+    def close(self):
+        with self.lock:
+            if self.key_pool is not None:
+                self.key_pool.close()
+                self.key_pool = None
+
+    def __getattr__(self, name):
+        return getattr(self.crypto, name)
@@ -5,16 +5,19 @@
 
 import json
 import logging
+import logging.handlers
 import os
 import platform
 import re
 import subprocess
+import sys
 from distutils.version import LooseVersion
-from inspect import getframeinfo, stack
 
 from ansible.module_utils._text import to_native
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
 
+from .retry_utils import RetryPolicy
+
 HFC_IMPORT_ERR = None
 try:
     import hfc  # noqa: F401
@@ -81,7 +84,9 @@ class BlockchainModule(AnsibleModule):
         self.check_for_missing_libs()
         self.check_for_missing_bins(min_fabric_version)
         self.logger = None
+        self.log_max_field_size = 0
         self.setup_logging()
+        self.retry_policy = RetryPolicy.from_environ(self)
 
     def check_for_missing_libs(self):
         url = 'https://ibm-blockchain.github.io/ansible-collection/installation.html#requirements'
@@ -123,14 +128,66 @@ class BlockchainModule(AnsibleModule):
                     filename = file.readline().strip()
         if not filename:
             return
-        logging.basicConfig(filename=filename, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.DEBUG)
+        level = logging.getLevelName(os.environ.get('IBP_ANSIBLE_LOG_LEVEL', 'DEBUG').upper())
+        if not isinstance(level, int):
+            level = logging.DEBUG
+        self.log_max_field_size = int(os.environ.get('IBP_ANSIBLE_LOG_MAX_FIELD_SIZE', 16384))
+
+        # Log records are buffered in memory and written to the file in batches, when
+        # an error is logged, or when the module exits and the logging module is shut down.
+        buffer_size = int(os.environ.get('IBP_ANSIBLE_LOG_BUFFER_SIZE', 256))
+        file_handler = logging.FileHandler(filename)
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        if buffer_size > 1:
+            handler = logging.handlers.MemoryHandler(buffer_size, flushLevel=logging.ERROR, target=file_handler)
+        else:
+            handler = file_handler
+        logging.basicConfig(handlers=[handler], level=level)
         self.logger = logging.getLogger(self._name)
 
-    def json_log(self, msg):
-        if not self.logger:
+    def exit_json(self, **kwargs):
+        self._log_retry_summary()
+        super().exit_json(**kwargs)
+
+    def fail_json(self, msg, **kwargs):
+        self._log_retry_summary()
+        super().fail_json(msg, **kwargs)
+
+    def _log_retry_summary(self):
+
+        # The retry policy is not created until after the checks for missing
+        # libraries and binaries, which can fail the module.
+        retry_policy = getattr(self, 'retry_policy', None)
+        if retry_policy and retry_policy.total_retries:
+            self.json_log({'msg': 'retry summary', 'retries': retry_policy.total_retries, 'slept': retry_policy.total_slept})
+
+    def json_log(self, msg, level=logging.DEBUG):
+
+        # Check the level first, so that nothing is serialized unless it is logged.
+        if not self.logger or not self.logger.isEnabledFor(level):
             return
-        caller = getframeinfo(stack()[1][0])
-        caller_str = f'{caller.filename}:{caller.lineno}'
-        msg['caller'] = caller_str
-        msg_str = json.dumps(msg, indent=4)
-        self.logger.debug(msg_str)
+        caller = sys._getframe(1)
+        msg = {key: self._cap_log_value(value) for (key, value) in msg.items()}
+        msg['caller'] = f'{caller.f_code.co_filename}:{caller.f_lineno}'
+        msg_str = json.dumps(msg, indent=4, default=str)
+        self.logger.log(level, msg_str)
+
+    def _cap_log_value(self, value):
+
+        # Large values, such as the list of all components in the console, are cut off
+        # after the maximum size. The value is encoded incrementally, so that only the
+        # part of the value that is logged is ever encoded.
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        elif isinstance(value, str):
+            if len(value) <= self.log_max_field_size:
+                return value
+            return f'{value[:self.log_max_field_size]}... ({len(value) - self.log_max_field_size} more characters)'
+        size = 0
+        chunks = list()
+        for chunk in json.JSONEncoder(default=str).iterencode(value):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > self.log_max_field_size:
+                return f'{"".join(chunks)[:self.log_max_field_size]}... (truncated)'
+        return value
@@ -6,6 +6,7 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+from .cache_utils import DirectoryCache, hash_key
 from .organizations import Organization
 
 import os
@@ -70,6 +71,21 @@ def convert_identity_to_msp_path(identity, path='temp'):
     return msp_path
 
 
+def get_msp_path(identity):
+
+    # If enabled, the MSP directory for an identity is cached, keyed by the hash
+    # of the identity, so that the same identity is only written once per host.
+    # Otherwise, a temporary MSP directory is used. The caller must pass the
+    # returned path and lock to release_directory.
+    max_entries = int(os.environ.get('IBP_ANSIBLE_MSP_CACHE_SIZE', 0))
+    cache = DirectoryCache('msps', max_entries)
+    key = hash_key(identity.cert, identity.private_key, identity.ca, identity.hsm)
+    (msp_path, lock) = cache.acquire(key, lambda path: convert_identity_to_msp_path(identity, path))
+    if msp_path is None:
+        return (convert_identity_to_msp_path(identity), None)
+    return (msp_path, lock)
+
+
 def get_default_admins_policy(organization):
     return dict(
         type=1,
@@ -8,18 +8,76 @@ from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
 import base64
+import concurrent.futures
 import json
 import os
-import shutil
+import signal
 import subprocess
 import tempfile
+import threading
 import time
 import urllib
 
 from ansible.module_utils.urls import open_url
 
-from .fabric_utils import get_fabric_cfg_path
-from .msp_utils import convert_identity_to_msp_path
+from .cache_utils import FileCache, release_directory
+from .fabric_utils import get_shared_fabric_cfg_path
+from .file_utils import get_temp_file
+from .http_utils import HTTPConnectionPool
+from .msp_utils import get_msp_path
+from .orderer_clients import (OrdererClient, OrdererClientUnavailableError,
+                              get_block_number)
+from .peer_clients import HAS_GRPC
+
+
+def get_node_health_cache():
+    ttl = int(os.environ.get('IBP_ANSIBLE_ORDERER_HEALTH_TTL', 300))
+    return FileCache('orderer-health', ttl)
+
+
+def get_node_health():
+
+    # The health of each ordering service node, keyed by the API URL of the node,
+    # with entries older than the TTL discarded.
+    cache = get_node_health_cache()
+    health = cache.get() or dict()
+    return {url: entry for (url, entry) in health.items() if entry['recorded'] + cache.ttl > time.time()}
+
+
+def record_node_health(node, latency):
+
+    # Record the latency of a successful health check, or None if the ordering
+    # service node is not healthy, so that later tasks can try the healthiest
+    # ordering service nodes first.
+    cache = get_node_health_cache()
+    with cache.lock():
+        health = get_node_health()
+        health[node.api_url] = dict(latency=latency, recorded=time.time())
+        cache.set(health)
+
+
+# The output of the peer CLI when it could not connect to an ordering service
+# node, or the ordering service node did not respond in time.
+UNAVAILABLE_MESSAGES = [
+    'could not send to orderer node',
+    'failed to create new connection',
+    'orderer client failed to connect',
+    'context deadline exceeded',
+    'connection refused',
+    'SERVICE_UNAVAILABLE',
+]
+
+
+class OrderingServiceNodeUnavailableError(Exception):
+    pass
+
+
+def is_unavailable(error):
+
+    # Accepts either the output of the peer CLI, or an exception.
+    if isinstance(error, (OrderingServiceNodeUnavailableError, OrdererClientUnavailableError)):
+        return True
+    return any(message in str(error) for message in UNAVAILABLE_MESSAGES)
 
 
 class OrderingServiceNode:
@@ -144,27 +202,38 @@ class OrderingServiceNode:
             imported=data['imported']
         )
 
-    def wait_for(self, timeout):
+    def wait_for(self, timeout, pool=None, cancelled=None):
         # If the ordering service node has been pre-created, then it will
         # not be running, so we do not want to wait for it.
         if not self.consenter_proposal_fin:
             return
-        started = False
+        deadline = time.monotonic() + timeout
         last_e = None
-        for x in range(timeout):
+        while True:
+            started = time.monotonic()
             try:
                 url = urllib.parse.urljoin(self.operations_url, '/healthz')
-                response = open_url(url, None, None, method='GET', validate_certs=False, follow_redirects='all')
+                request_timeout = min(max(deadline - started, 1), 10)
+                if pool:
+                    response = pool.open_url(url, None, None, method='GET', validate_certs=False, timeout=request_timeout)
+                else:
+                    response = open_url(url, None, None, method='GET', validate_certs=False, follow_redirects='all', timeout=request_timeout)
                 if response.code == 200:
                     healthz = json.load(response)
                     if healthz['status'] == 'OK':
-                        started = True
-                        break
+                        record_node_health(self, time.monotonic() - started)
+                        return
             except Exception as e:
                 last_e = e
-            time.sleep(1)
-        if not started:
-            raise Exception(f'Ordering service node failed to start within {timeout} seconds: {str(last_e)}')
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if cancelled is None:
+                time.sleep(min(1, remaining))
+            elif cancelled.wait(min(1, remaining)):
+                raise Exception('Ordering service node health check cancelled')
+        record_node_health(self, None)
+        raise Exception(f'Ordering service node failed to start within {timeout} seconds: {str(last_e)}')
 
     def connect(self, module, identity, msp_id, hsm, tls_handshake_time_shift=None):
         return OrderingServiceNodeConnection(module, self, identity, msp_id, hsm, tls_handshake_time_shift)
@@ -184,28 +253,31 @@ class OrderingServiceNodeConnection:
         self.hsm = hsm
         self.tls_handshake_time_shift = tls_handshake_time_shift
         self.retries = retries
+        self.retry_policy = module.retry_policy
 
     def __enter__(self):
         temp = tempfile.mkstemp()
         os.write(temp[0], base64.b64decode(self.ordering_service_node.pem))
         os.close(temp[0])
         self.pem_path = temp[1]
-        self.msp_path = convert_identity_to_msp_path(self.identity)
-        self.fabric_cfg_path = get_fabric_cfg_path()
+        (self.msp_path, self.msp_lock) = get_msp_path(self.identity)
+        (self.fabric_cfg_path, self.fabric_cfg_lock) = get_shared_fabric_cfg_path()
         return self
 
     def __exit__(self, type, value, tb):
         os.remove(self.pem_path)
-        shutil.rmtree(self.msp_path)
-        shutil.rmtree(self.fabric_cfg_path)
+        release_directory(self.msp_path, self.msp_lock)
+        release_directory(self.fabric_cfg_path, self.fabric_cfg_lock)
 
-    def fetch(self, channel, target, path):
+    def fetch(self, channel, target, path, cancelled=None):
         env = self._get_environ()
         args = ['peer', 'channel', 'fetch', target, path, '--channelID', channel]
         args.extend(self._get_ordering_service())
-        process = self._run_command(args, env)
+        process = self._run_command(args, env, cancelled)
         if process.returncode == 0:
             return
+        elif is_unavailable(process.stdout):
+            raise OrderingServiceNodeUnavailableError(f'Failed to fetch block from ordering service node: {process.stdout}')
         else:
             raise Exception(f'Failed to fetch block from ordering service node: {process.stdout}')
 
@@ -216,6 +288,8 @@ class OrderingServiceNodeConnection:
         process = self._run_command(args, env)
         if process.returncode == 0:
             return
+        elif is_unavailable(process.stdout):
+            raise OrderingServiceNodeUnavailableError(f'Failed to update channel on ordering service node: {process.stdout}')
         else:
             raise Exception(f'Failed to update channel on ordering service node: {process.stdout}')
 
@@ -241,24 +315,56 @@ class OrderingServiceNodeConnection:
             result.extend(['--tlsHandshakeTimeShift', self.tls_handshake_time_shift])
         return result
 
-    def _run_command(self, args, env):
+    def _run_command(self, args, env, cancelled=None):
         for attempt in range(1, self.retries + 1):
+            if cancelled is not None and cancelled.is_set():
+                raise Exception('Command cancelled')
             self.module.json_log({'msg': 'running command', 'args': args, 'env': env, 'attempt': attempt})
-            process = subprocess.run(args, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.PIPE, text=True, close_fds=True)
+            if cancelled is None:
+                process = subprocess.run(args, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.PIPE, text=True, close_fds=True)
+            else:
+                process = self._run_cancellable_command(args, env, cancelled)
             self.module.json_log({'msg': 'command finished', 'rc': process.returncode, 'stdout': process.stdout})
             if process.returncode == 0:
                 return process
             elif attempt >= self.retries:
                 return process
-            elif "could not send to orderer node" in process.stdout:
-                time.sleep(5)
-                continue
-            elif "failed to create new connection" in process.stdout:
-                time.sleep(5)
-                continue
+            elif "could not send to orderer node" in process.stdout or "failed to create new connection" in process.stdout:
+                if self.retry_policy.sleep(attempt, cancelled=cancelled):
+                    continue
+                if cancelled is not None and cancelled.is_set():
+                    raise Exception('Command cancelled')
+                return process
             else:
                 return process
 
+    def _run_cancellable_command(self, args, env, cancelled):
+
+        # Run the command, killing it if the event is set before it finishes. The
+        # command is run in a new process group so that any children are killed too.
+        process = subprocess.Popen(args, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.PIPE, text=True, close_fds=True, start_new_session=True)
+        while True:
+            try:
+                (stdout, _) = process.communicate(timeout=0.1)
+                break
+            except subprocess.TimeoutExpired:
+                if cancelled.is_set():
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.communicate()
+                    self.module.json_log({'msg': 'command cancelled', 'args': args})
+                    raise Exception('Command cancelled')
+        return subprocess.CompletedProcess(args, process.returncode, stdout)
+
+
+def get_hedge_delay():
+
+    # The delay, in seconds, before fetching from another ordering service node
+    # at the same time, or None if hedged fetches are disabled.
+    delay = os.environ.get('IBP_ANSIBLE_ORDERER_HEDGE_DELAY', '')
+    if not delay or float(delay) < 0:
+        return None
+    return float(delay)
+
 
 class OrderingService:
 
@@ -297,15 +403,70 @@ class OrderingService:
             nodes.append(OrderingServiceNode.from_json(node))
         return OrderingService(nodes=nodes)
 
-    def wait_for(self, timeout):
-        last_e = None
-        for node in self.nodes:
-            try:
-                node.wait_for(timeout)
-                return
-            except Exception as e:
-                last_e = e
-        raise Exception(f'Ordering service failed to start within {timeout} seconds: {str(last_e)}')
+    def wait_for(self, timeout, module=None, quorum=None):
+
+        # Check all of the ordering service nodes at the same time, and return as
+        # soon as enough of them are healthy: any of them, a majority of them, or all
+        # of them. The remaining health checks are cancelled.
+        if quorum is None:
+            quorum = os.environ.get('IBP_ANSIBLE_ORDERER_QUORUM', 'any')
+        if quorum == 'all':
+            required = len(self.nodes)
+        elif quorum == 'majority':
+            required = len(self.nodes) // 2 + 1
+        elif quorum == 'any':
+            required = min(len(self.nodes), 1)
+        else:
+            raise Exception(f'Invalid ordering service quorum {quorum}, must be one of any, majority, or all')
+        if required == 0:
+            return
+        pool = HTTPConnectionPool(module) if module else None
+        cancelled = threading.Event()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.nodes))
+        try:
+            futures = [executor.submit(node.wait_for, timeout, pool, cancelled) for node in self.nodes]
+            healthy = 0
+            failed = 0
+            last_e = None
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                    healthy += 1
+                except Exception as e:
+                    failed += 1
+                    last_e = e
+                if healthy >= required:
+                    return
+                elif failed > len(self.nodes) - required:
+                    break
+            raise Exception(f'Ordering service failed to start within {timeout} seconds: {str(last_e)}')
+        finally:
+
+            # Wait for the remaining health checks to see that they have been
+            # cancelled before closing the connection pool that they use. Each
+            # of them stops after at most one more request.
+            cancelled.set()
+            executor.shutdown(wait=True)
+            if pool:
+                pool.close()
+
+    def get_nodes_by_health(self):
+
+        # Return the ordering service nodes that are ready, with the nodes that
+        # were recently healthy first (fastest first), followed by the nodes with
+        # no recent health information, followed by the nodes that were recently
+        # unhealthy. Otherwise, the nodes are kept in their original order.
+        health = get_node_health()
+
+        def rank(node):
+            entry = health.get(node.api_url)
+            if entry is None:
+                return (1, 0)
+            elif entry['latency'] is None:
+                return (2, 0)
+            return (0, entry['latency'])
+        nodes = [node for node in self.nodes if node.consenter_proposal_fin]
+        return sorted(nodes, key=rank)
 
     def connect(self, module, identity, msp_id, hsm, tls_handshake_time_shift=None):
         return OrderingServiceConnection(module, self, identity, msp_id, hsm, tls_handshake_time_shift)
@@ -332,29 +493,144 @@ class OrderingServiceConnection:
         pass
 
     def fetch(self, channel, target, path):
+        nodes = self.ordering_service.get_nodes_by_health()
+        hedge_delay = get_hedge_delay()
+        if hedge_delay is not None and len(nodes) > 1:
+            return self._hedged_fetch(nodes, channel, target, path, hedge_delay)
         last_e = None
-        for node in self.ordering_service.nodes:
-            if not node.consenter_proposal_fin:
-                # Don't connect to ordering service nodes that are not ready.
-                continue
+        for node in nodes:
             try:
                 with node.connect(self.module, self.identity, self.msp_id, self.hsm, self.tls_handshake_time_shift) as connection:
                     connection.fetch(channel, target, path)
                 return
             except Exception as e:
+                if is_unavailable(e):
+                    record_node_health(node, None)
                 last_e = e
         raise Exception(f'Could not fetch block from any ordering service node: {last_e}')
 
+    def fetch_blocks(self, channel, start, end, write_block):
+
+        # Fetch the blocks from start to end inclusive, or to the newest block if no
+        # end is specified, calling write_block(number, block) for each block in order.
+        # Nothing is fetched if start is after the newest block.
+        # If an ordering service node fails part way through, for any reason, the
+        # remaining blocks are fetched from the next ordering service node.
+        next_number = start
+
+        def write_next_block(number, block):
+            nonlocal next_number
+            write_block(number, block)
+            next_number = number + 1
+
+        last_e = None
+        for node in self.ordering_service.get_nodes_by_health():
+            try:
+                if self._client_enabled():
+                    client = OrdererClient(self.module, node, self.identity, self.msp_id)
+                    try:
+                        if end is None:
+                            end = client.get_newest_block_number(channel)
+                        if next_number > end:
+                            return
+                        for (number, block) in client.deliver_blocks(channel, next_number, end):
+                            write_next_block(number, block)
+                        return
+                    except OrdererClientUnavailableError as e:
+
+                        # The ordering service node may still be reachable using the peer
+                        # CLI, so fetch the remaining blocks from it that way instead.
+                        self.module.json_log({'msg': 'falling back to peer CLI to fetch blocks', 'node': node.name, 'next_number': next_number, 'error': str(e)})
+                    finally:
+                        client.close()
+                with node.connect(self.module, self.identity, self.msp_id, self.hsm, self.tls_handshake_time_shift) as connection:
+                    self._fetch_blocks_with_cli(connection, channel, next_number, end, write_next_block)
+                return
+            except Exception as e:
+                self.module.json_log({'msg': 'failed to fetch blocks', 'node': node.name, 'next_number': next_number, 'error': str(e)})
+                if is_unavailable(e):
+                    record_node_health(node, None)
+                last_e = e
+        raise Exception(f'Could not fetch blocks from any ordering service node: {last_e}')
+
+    def _client_enabled(self):
+        return HAS_GRPC and not self.identity.hsm and not self.tls_handshake_time_shift and os.environ.get('IBP_ANSIBLE_PEER_CLIENT', 'grpc') == 'grpc'
+
+    def _fetch_blocks_with_cli(self, connection, channel, next_number, end, write_block):
+
+        # Fall back to running the peer CLI once for each block, in which case we need
+        # to find out the number of the newest block first if no end is specified.
+        temp_path = get_temp_file()
+        try:
+            if end is None:
+                connection.fetch(channel, 'newest', temp_path)
+                with open(temp_path, 'rb') as file:
+                    end = get_block_number(file.read())
+            while next_number <= end:
+                connection.fetch(channel, str(next_number), temp_path)
+                with open(temp_path, 'rb') as file:
+                    write_block(next_number, file.read())
+                next_number += 1
+            return next_number
+        finally:
+            os.remove(temp_path)
+
+    def _hedged_fetch(self, nodes, channel, target, path, hedge_delay):
+
+        # Start fetching from the first ordering service node. If it has not finished
+        # after the delay, or it fails, start fetching from the next ordering service
+        # node as well, and so on. The first fetch to finish wins, and the others are
+        # cancelled. Each fetch writes to its own file, so that the loser cannot
+        # overwrite the block fetched by the winner.
+        def fetch_from(node, temp_path):
+            with node.connect(self.module, self.identity, self.msp_id, self.hsm, self.tls_handshake_time_shift) as connection:
+                connection.fetch(channel, target, temp_path, cancelled)
+        cancelled = threading.Event()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(nodes))
+        remaining = list(nodes)
+        running = dict()
+        temp_paths = list()
+        last_e = None
+        try:
+            while True:
+                if remaining:
+                    node = remaining.pop(0)
+                    temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+                    os.close(temp[0])
+                    temp_paths.append(temp[1])
+                    self.module.json_log({'msg': 'fetching block from ordering service node', 'node': node.name, 'hedged': len(running) > 0})
+                    running[executor.submit(fetch_from, node, temp[1])] = (node, temp[1])
+                if not running:
+                    break
+                (done, _) = concurrent.futures.wait(running, timeout=hedge_delay if remaining else None, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    (node, temp_path) = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        if is_unavailable(e):
+                            record_node_health(node, None)
+                        last_e = e
+                        continue
+                    os.replace(temp_path, path)
+                    return
+        finally:
+            cancelled.set()
+            executor.shutdown(wait=True)
+            for temp_path in temp_paths:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        raise Exception(f'Could not fetch block from any ordering service node: {last_e}')
+
     def update(self, channel, path):
         last_e = None
-        for node in self.ordering_service.nodes:
-            if not node.consenter_proposal_fin:
-                # Don't connect to ordering service nodes that are not ready.
-                continue
+        for node in self.ordering_service.get_nodes_by_health():
             try:
                 with node.connect(self.module, self.identity, self.msp_id, self.hsm, self.tls_handshake_time_shift) as connection:
                     connection.update(channel, path)
                 return
             except Exception as e:
+                if is_unavailable(e):
+                    record_node_health(node, None)
                 last_e = e
         raise Exception(f'Could not update channel on any ordering service node: {last_e}')
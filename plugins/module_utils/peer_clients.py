@@ -0,0 +1,238 @@
+#!/usr/bin/python
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import base64
+import hashlib
+import os
+import time
+import urllib
+
+try:
+    import grpc
+    HAS_GRPC = True
+except ImportError:
+    HAS_GRPC = False
+
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+except ImportError:
+    # Missing dependencies are handled elsewhere.
+    pass
+
+from .proto_codec import decode_message, decode_struct, encode_message, format_timestamp
+
+# The orders of the elliptic curves used by Fabric identities, used to convert
+# signatures into the low S form that Fabric requires.
+CURVE_ORDERS = {
+    'secp256r1': 0xFFFFFFFF00000000FFFFFFFFFFFFFFFFBCE6FAADA7179E84F3B9CAC2FC632551,
+    'secp384r1': 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFC7634D81F4372DDF581A0DB248B0A77AECEC196ACCC52973,
+}
+
+
+def get_grpc_options():
+
+    # The maximum size, in bytes, of a gRPC message that can be received, where
+    # -1 means no limit. Blocks can be much larger than the default gRPC limit
+    # of 4 MB, so there is no limit by default.
+    max_receive_message_length = int(os.environ.get('IBP_ANSIBLE_GRPC_MAX_RECEIVE_MESSAGE_SIZE', -1))
+    return [('grpc.max_receive_message_length', max_receive_message_length)]
+
+
+def b64(value):
+    return base64.b64encode(value).decode('utf-8')
+
+
+def get_timestamp():
+    now = time.time()
+    return format_timestamp(int(now), int(now % 1 * 1000) * 1000000)
+
+
+def sign(private_key, message):
+    signature = private_key.sign(message, ec.ECDSA(hashes.SHA256()))
+    r, s = decode_dss_signature(signature)
+    order = CURVE_ORDERS[private_key.curve.name]
+    if s > order // 2:
+        s = order - s
+    return encode_dss_signature(r, s)
+
+
+def create_seek_envelope(private_key, creator, channel, start, stop, behavior):
+
+    # Build and sign a request for a range of blocks, for either the deliver
+    # service of a peer, or the deliver service of an ordering service node.
+    nonce = os.urandom(24)
+    payload = encode_message('common.Payload', dict(
+        header=dict(
+            channel_header=dict(
+                type=5,
+                timestamp=get_timestamp(),
+                channel_id=channel,
+                tx_id=hashlib.sha256(nonce + creator).hexdigest()
+            ),
+            signature_header=dict(
+                creator=b64(creator),
+                nonce=b64(nonce)
+            )
+        ),
+        data=dict(
+            start=start,
+            stop=stop,
+            behavior=behavior
+        )
+    ))
+    return encode_message('common.Envelope', dict(
+        payload=b64(payload),
+        signature=b64(sign(private_key, payload))
+    ))
+
+
+class PeerClientUnavailableError(Exception):
+    pass
+
+
+class PeerClient:
+
+    # A gRPC client for the queries that would otherwise require running the
+    # peer CLI. One gRPC channel, and therefore one TLS connection, is used for
+    # all of the requests made by the client.
+
+    def __init__(self, module, peer, identity, msp_id, timeout=60):
+        self.module = module
+        self.peer = peer
+        self.identity = identity
+        self.msp_id = msp_id
+        self.timeout = timeout
+        self.private_key = serialization.load_pem_private_key(identity.private_key, password=None, backend=default_backend())
+        self.creator = encode_message('msp.SerializedIdentity', dict(mspid=msp_id, id_bytes=b64(identity.cert)))
+        api_url_parsed = urllib.parse.urlparse(peer.api_url)
+        credentials = grpc.ssl_channel_credentials(root_certificates=base64.b64decode(peer.pem))
+        self.channel = grpc.secure_channel(api_url_parsed.netloc, credentials, options=get_grpc_options())
+        self.process_proposal = self.channel.unary_unary('/protos.Endorser/ProcessProposal')
+        self.deliver_filtered = self.channel.stream_stream('/protos.Deliver/DeliverFiltered')
+
+    def close(self):
+        self.channel.close()
+
+    def list_channels(self):
+        payload = self._query('', 'cscc', ['GetChannels'])
+        response = decode_struct('protos.ChannelQueryResponse', payload)
+        return [channel['channel_id'] for channel in response.get('channels', [])]
+
+    def list_instantiated_chaincodes(self, channel):
+        payload = self._query(channel, 'lscc', ['GetChaincodes'])
+        response = decode_struct('protos.ChaincodeQueryResponse', payload)
+        return [
+            dict(name=chaincode.get('name'), version=chaincode.get('version'), path=chaincode.get('path'), input=chaincode.get('input') or None, escc=chaincode.get('escc'), vscc=chaincode.get('vscc'))
+            for chaincode in response.get('chaincodes', [])
+        ]
+
+    def list_installed_chaincodes(self):
+        args = encode_message('lifecycle.QueryInstalledChaincodesArgs', dict())
+        payload = self._query('', '_lifecycle', ['QueryInstalledChaincodes', args])
+        return decode_struct('lifecycle.QueryInstalledChaincodesResult', payload).get('installed_chaincodes', [])
+
+    def query_committed_chaincodes(self, channel):
+        args = encode_message('lifecycle.QueryChaincodeDefinitionsArgs', dict())
+        payload = self._query(channel, '_lifecycle', ['QueryChaincodeDefinitions', args])
+        return decode_struct('lifecycle.QueryChaincodeDefinitionsResult', payload).get('chaincode_definitions', [])
+
+    def query_committed_chaincode(self, channel, name):
+        args = encode_message('lifecycle.QueryChaincodeDefinitionArgs', dict(name=name))
+        payload = self._query(channel, '_lifecycle', ['QueryChaincodeDefinition', args])
+        return decode_struct('lifecycle.QueryChaincodeDefinitionResult', payload)
+
+    def check_commit_readiness(self, channel, name, version, sequence, endorsement_policy_ref, endorsement_plugin, validation_plugin, init_required):
+        validation_parameter = None
+        if endorsement_policy_ref:
+            validation_parameter = b64(encode_message('protos.ApplicationPolicy', dict(channel_config_policy_reference=endorsement_policy_ref)))
+        args = encode_message('lifecycle.CheckCommitReadinessArgs', dict(
+            sequence=sequence,
+            name=name,
+            version=version,
+            endorsement_plugin=endorsement_plugin,
+            validation_plugin=validation_plugin,
+            validation_parameter=validation_parameter,
+            init_required=init_required
+        ))
+        payload = self._query(channel, '_lifecycle', ['CheckCommitReadiness', args])
+        return decode_struct('lifecycle.CheckCommitReadinessResult', payload).get('approvals', {})
+
+    def deliver_filtered_blocks(self, channel, timeout):
+
+        # Stream the filtered blocks committed to the channel by the peer, starting
+        # with the newest block, until the timeout expires. A filtered block only
+        # contains the ID, type, and validation code of each transaction.
+        envelope = create_seek_envelope(self.private_key, self.creator, channel, dict(newest=dict()), dict(specified=dict(number=str(2 ** 64 - 1))), 'BLOCK_UNTIL_READY')
+        self.module.json_log({'msg': 'requesting filtered blocks from peer', 'channel': channel, 'timeout': timeout})
+        responses = self.deliver_filtered(iter([envelope]), timeout=timeout)
+        try:
+            for response in responses:
+                response = decode_message('protos.DeliverResponse', response)
+                if 'filtered_block' not in response:
+                    raise Exception(f'Failed to receive blocks from peer, status {response.get("status")}')
+                yield response['filtered_block']
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+                return
+            raise PeerClientUnavailableError(f'Failed to receive blocks from peer: {e}')
+        finally:
+            responses.cancel()
+
+    def _query(self, channel, chaincode, args):
+
+        # Build and sign the proposal in the same way as the peer CLI.
+        nonce = os.urandom(24)
+        tx_id = hashlib.sha256(nonce + self.creator).hexdigest()
+        chaincode_id = dict(name=chaincode)
+        extension = encode_message('protos.ChaincodeHeaderExtension', dict(chaincode_id=chaincode_id))
+        proposal = encode_message('protos.Proposal', dict(
+            header=dict(
+                channel_header=dict(
+                    type=3,
+                    timestamp=get_timestamp(),
+                    channel_id=channel,
+                    tx_id=tx_id,
+                    extension=b64(extension)
+                ),
+                signature_header=dict(
+                    creator=b64(self.creator),
+                    nonce=b64(nonce)
+                )
+            ),
+            payload=dict(
+                input=dict(
+                    chaincode_spec=dict(
+                        type='GOLANG',
+                        chaincode_id=chaincode_id,
+                        input=dict(
+                            args=[b64(arg.encode('utf-8') if isinstance(arg, str) else arg) for arg in args]
+                        )
+                    )
+                )
+            )
+        ))
+        signed_proposal = encode_message('protos.SignedProposal', dict(
+            proposal_bytes=b64(proposal),
+            signature=b64(sign(self.private_key, proposal))
+        ))
+
+        # Send the proposal to the peer.
+        self.module.json_log({'msg': 'sending proposal to peer', 'channel': channel, 'chaincode': chaincode, 'function': args[0], 'tx_id': tx_id})
+        try:
+            proposal_response = self.process_proposal(signed_proposal, timeout=self.timeout)
+        except grpc.RpcError as e:
+            raise PeerClientUnavailableError(f'Failed to send proposal to peer: {e}')
+        response = decode_message('protos.ProposalResponse', proposal_response)['response'] or dict()
+        status = response.get('status', 0)
+        self.module.json_log({'msg': 'received proposal response from peer', 'tx_id': tx_id, 'status': status})
+        if status != 200:
+            raise Exception(f'Proposal failed with status {status}: {response.get("message", "")}')
+        return base64.b64decode(response.get('payload') or '')
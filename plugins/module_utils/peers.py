@@ -8,11 +8,11 @@ from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
 import base64
+import hashlib
 import json
 import os
 import random
 import re
-import shutil
 import subprocess
 import tempfile
 import time
@@ -20,8 +20,10 @@ import urllib
 
 from ansible.module_utils.urls import open_url
 
-from .fabric_utils import get_fabric_cfg_path
-from .msp_utils import convert_identity_to_msp_path
+from .cache_utils import FileCache, LRUFileStore, hash_key, release_directory
+from .fabric_utils import get_shared_fabric_cfg_path
+from .msp_utils import get_msp_path
+from .peer_clients import HAS_GRPC, PeerClient, PeerClientUnavailableError
 from .proto_utils import proto_to_json
 
 
@@ -137,25 +139,36 @@ class PeerConnection:
         self.msp_id = msp_id
         self.hsm = hsm
         self.retries = retries
+        self.retry_policy = module.retry_policy
+        self.config_blocks = dict()
+        self.client = None
+        self.client_enabled = HAS_GRPC and not identity.hsm and os.environ.get('IBP_ANSIBLE_PEER_CLIENT', 'grpc') == 'grpc'
 
     def __enter__(self):
         temp = tempfile.mkstemp()
         os.write(temp[0], base64.b64decode(self.peer.pem))
         os.close(temp[0])
         self.pem_path = temp[1]
-        self.msp_path = convert_identity_to_msp_path(self.identity)
+        (self.msp_path, self.msp_lock) = get_msp_path(self.identity)
         self.other_paths = list()
-        self.fabric_cfg_path = get_fabric_cfg_path()
+        (self.fabric_cfg_path, self.fabric_cfg_lock) = get_shared_fabric_cfg_path()
         return self
 
     def __exit__(self, type, value, tb):
+        if self.client:
+            self.client.close()
         for other_path in self.other_paths:
             os.remove(other_path)
         os.remove(self.pem_path)
-        shutil.rmtree(self.msp_path)
-        shutil.rmtree(self.fabric_cfg_path)
+        release_directory(self.msp_path, self.msp_lock)
+        release_directory(self.fabric_cfg_path, self.fabric_cfg_lock)
 
     def list_channels(self):
+        if self._get_client():
+            try:
+                return self.client.list_channels()
+            except PeerClientUnavailableError as e:
+                self._disable_client(e)
         env = self._get_environ()
         args = ['peer', 'channel', 'list']
         process = self._run_command(args, env)
@@ -220,6 +233,11 @@ class PeerConnection:
             raise Exception(f'Failed to install chaincode on peer: {process.stdout} {process.stderr}')
 
     def list_instantiated_chaincodes(self, channel):
+        if self._get_client():
+            try:
+                return self.client.list_instantiated_chaincodes(channel)
+            except PeerClientUnavailableError as e:
+                self._disable_client(e)
         env = self._get_environ()
         args = ['peer', 'chaincode', 'list', '--instantiated', '-C', channel]
         process = self._run_command(args, env)
@@ -288,20 +306,54 @@ class PeerConnection:
         else:
             raise Exception(f'Failed to upgrade chaincode on channel: {process.stdout} {process.stderr}')
 
-    def wait_for_chaincode(self, channel, name, version):
+    def wait_for_chaincode(self, channel, name, version, timeout=30):
         # The commands for instantiating and upgrading chaincode do not
         # support the --waitForEvent options, which means that if the
         # transactions are lost in the ordering service or fail validation,
-        # we will not know about it.
-        for attempt in range(0, 30):
-            time.sleep(1)
-            chaincodes = self.list_instantiated_chaincodes(channel)
-            for chaincode in chaincodes:
-                if chaincode['name'] == name and chaincode['version'] == version:
-                    return True
+        # we will not know about it. The commands do not tell us the ID of
+        # the transaction either, so we check the instantiated chaincode
+        # each time the peer commits a new block.
+        deadline = time.time() + timeout
+        if self._get_client():
+            try:
+                return self._wait_for_chaincode_blocks(channel, name, version, deadline)
+            except PeerClientUnavailableError as e:
+                self._disable_client(e)
+
+        # Otherwise, poll with exponential backoff.
+        delay = 0.5
+        while True:
+            if self._is_chaincode_instantiated(channel, name, version):
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 8)
+
+    def _wait_for_chaincode_blocks(self, channel, name, version, deadline):
+
+        # The first block received is the newest block, so the chaincode is always
+        # checked at least once, even if the transaction has already been committed.
+        for block in self.client.deliver_filtered_blocks(channel, max(deadline - time.time(), 0)):
+            self.module.json_log({'msg': 'received filtered block from peer', 'channel': channel, 'number': block['number']})
+            if self._is_chaincode_instantiated(channel, name, version):
+                return True
+        return self._is_chaincode_instantiated(channel, name, version)
+
+    def _is_chaincode_instantiated(self, channel, name, version):
+        chaincodes = self.list_instantiated_chaincodes(channel)
+        for chaincode in chaincodes:
+            if chaincode['name'] == name and chaincode['version'] == version:
+                return True
         return False
 
     def list_installed_chaincodes_newlc(self):
+        if self._get_client():
+            try:
+                return self.client.list_installed_chaincodes()
+            except PeerClientUnavailableError as e:
+                self._disable_client(e)
         env = self._get_environ()
         args = ['peer', 'lifecycle', 'chaincode', 'queryinstalled', '-O', 'json']
         process = self._run_command(args, env)
@@ -321,6 +373,14 @@ class PeerConnection:
             raise Exception(f'Failed to install chaincode on peer: {process.stdout} {process.stderr}')
 
     def check_commit_readiness(self, channel, name, version, package_id, sequence, endorsement_policy_ref, endorsement_policy, endorsement_plugin, validation_plugin, init_required, collections_config):
+
+        # Signature policies and collections configuration need to be parsed
+        # by the peer CLI, so only use the client without them.
+        if not endorsement_policy and not collections_config and self._get_client():
+            try:
+                return self.client.check_commit_readiness(channel, name, version, sequence, endorsement_policy_ref, endorsement_plugin, validation_plugin, init_required)
+            except PeerClientUnavailableError as e:
+                self._disable_client(e)
         env = self._get_environ()
         args = ['peer', 'lifecycle', 'chaincode', 'checkcommitreadiness', '-C', channel, '-n', name, '-v', version, '--sequence', str(sequence), '-O', 'json']
         if endorsement_policy_ref:
@@ -365,6 +425,11 @@ class PeerConnection:
             raise Exception(f'Failed to approve chaincode on peer: {process.stdout} {process.stderr}')
 
     def query_committed_chaincodes(self, channel):
+        if self._get_client():
+            try:
+                return self.client.query_committed_chaincodes(channel)
+            except PeerClientUnavailableError as e:
+                self._disable_client(e)
         env = self._get_environ()
         args = ['peer', 'lifecycle', 'chaincode', 'querycommitted', '-C', channel, '-O', 'json']
         process = self._run_command(args, env)
@@ -375,6 +440,11 @@ class PeerConnection:
             raise Exception(f'Failed to query committed chaincodes on peer: {process.stdout} {process.stderr}')
 
     def query_committed_chaincode(self, channel, name):
+        if self._get_client():
+            try:
+                return self.client.query_committed_chaincode(channel, name)
+            except PeerClientUnavailableError as e:
+                self._disable_client(e)
         env = self._get_environ()
         args = ['peer', 'lifecycle', 'chaincode', 'querycommitted', '-C', channel, '-n', name, '-O', 'json']
         process = self._run_command(args, env)
@@ -417,6 +487,21 @@ class PeerConnection:
         else:
             raise Exception(f'Failed to init legacy chaincode on peer: {process.stdout} {process.stderr}')
 
+    def _get_client(self):
+
+        # Queries are sent to the peer over gRPC where possible, and the peer
+        # CLI is used for everything else, or if the peer cannot be reached.
+        if self.client is None and self.client_enabled:
+            self.client = PeerClient(self.module, self.peer, self.identity, self.msp_id)
+        return self.client
+
+    def _disable_client(self, e):
+        self.module.json_log({'msg': 'falling back to peer CLI', 'error': str(e)})
+        if self.client:
+            self.client.close()
+        self.client = None
+        self.client_enabled = False
+
     def _get_environ(self):
         api_url_parsed = urllib.parse.urlparse(self.peer.api_url)
         env = os.environ.copy()
@@ -436,87 +521,105 @@ class PeerConnection:
             env['CORE_PEER_BCCSP_PKCS11_FILEKEYSTORE_KEYSTORE'] = os.path.join(self.msp_path, 'keystore')
         return env
 
-    def _get_anchor_peers(self, channel, msp_ids):
-        temp = tempfile.mkstemp()
-        os.close(temp[0])
-        block_path = temp[1]
-        try:
-            self.fetch_channel(channel, 'config', block_path)
-            with open(block_path, 'rb') as file:
-                block = proto_to_json('common.Block', file.read())
-            channel_group = block['data']['data'][0]['payload']['data']['config']['channel_group']
-            application_groups = channel_group['groups']['Application']['groups']
-            args = []
-            for msp_id in msp_ids:
-                msp = application_groups.get(msp_id, None)
-                if msp is None:
-                    raise Exception(f'Organization {msp_id} is not a member of the channel {channel}')
-                msp_value = msp['values']['MSP']
-                msp_config = msp_value['value']['config']
-                tls_root_certs = msp_config['tls_root_certs']
-                if tls_root_certs is None:
-                    tls_root_certs = []
-                tls_intermediate_certs = msp_config['tls_intermediate_certs']
-                if tls_intermediate_certs is None:
-                    tls_intermediate_certs = []
-                tls_certs = tls_root_certs + tls_intermediate_certs
-                temp = tempfile.mkstemp()
-                for tls_cert in tls_certs:
-                    decoded_tls_cert = base64.b64decode(tls_cert)
-                    os.write(temp[0], decoded_tls_cert)
-                    if not decoded_tls_cert.endswith(b'\n'):
-                        os.write(temp[0], b'\n')
-                os.close(temp[0])
-                pem_path = temp[1]
-                self.other_paths.append(pem_path)
-                anchor_peers_value = msp['values'].get('AnchorPeers', None)
-                if anchor_peers_value is None:
-                    raise Exception(f'Organization {msp_id} has no anchor peers defined for channel {channel}')
-                anchor_peers = anchor_peers_value['value']['anchor_peers']
-                if not anchor_peers:
-                    raise Exception(f'Organization {msp_id} has no anchor peers defined for channel {channel}')
-                anchor_peer = random.choice(anchor_peers)
-                host = anchor_peer['host']
-                port = anchor_peer['port']
-                address = f'{host}:{port}'
-                args.extend(['--peerAddresses', address, '--tlsRootCertFiles', pem_path])
-            return args
-        finally:
-            os.remove(block_path)
-
-    def _get_ordering_service(self, channel, orderer):
-        temp = tempfile.mkstemp()
-        os.close(temp[0])
-        block_path = temp[1]
-        try:
-
-            if orderer:
-                ordererNode = random.choice(orderer.nodes)
-                tlsCert = ordererNode.tls_ca_root_cert
-                apiUrl = urllib.parse.urlparse(ordererNode.api_url)
-                address = f'{apiUrl.hostname}:{apiUrl.port}'
-                self.module.json_log({"msg": "using task specified orderer", "tls_cert": tlsCert, "api_url": address})
-            else:
+    def _get_config_block(self, channel):
+
+        # The config block is kept for the lifetime of this connection, and can
+        # optionally be reused across tasks for a short time. The decoded block
+        # is also stored on disk by the hash of its contents, so that a block
+        # that has not changed since the last task is not decoded again.
+        block = self.config_blocks.get(channel, None)
+        if block is not None:
+            return block
+        ttl = float(os.environ.get('IBP_ANSIBLE_CONFIG_BLOCK_CACHE_TTL', 0))
+        max_entries = int(os.environ.get('IBP_ANSIBLE_CONFIG_BLOCK_CACHE_SIZE', 16))
+        latest = FileCache(f'config-block-{hash_key(self.peer.api_url, channel)}', ttl)
+        store = LRUFileStore('config-blocks', max_entries)
+        block_hash = latest.get()
+        if block_hash is not None:
+            block = store.get(block_hash)
+        if block is None:
+            temp = tempfile.mkstemp()
+            os.close(temp[0])
+            block_path = temp[1]
+            try:
                 self.fetch_channel(channel, 'config', block_path)
                 with open(block_path, 'rb') as file:
-                    block = proto_to_json('common.Block', file.read())
-
-                channel_group = block['data']['data'][0]['payload']['data']['config']['channel_group']
-                orderer_group = channel_group['groups']['Orderer']
-                consenters = orderer_group['values']['ConsensusType']['value']['metadata']['consenters']
-                consenter = random.choice(consenters)
-                tlsCert = consenter['server_tls_cert']
-                address = f'{consenter["host"]}:{consenter["port"]}'
-                self.module.json_log({"msg": "using orderer from channel", "tls_cert": tlsCert, "api_url": address})
+                    block_proto = file.read()
+            finally:
+                os.remove(block_path)
+            block_hash = hashlib.sha256(block_proto).hexdigest()
+            block = store.get(block_hash)
+            if block is None:
+                block = proto_to_json('common.Block', block_proto)
+                store.set(block_hash, block)
+            latest.set(block_hash)
+        self.module.json_log({'msg': 'using config block', 'channel': channel, 'hash': block_hash})
+        self.config_blocks[channel] = block
+        return block
 
+    def _get_anchor_peers(self, channel, msp_ids):
+        block = self._get_config_block(channel)
+        channel_group = block['data']['data'][0]['payload']['data']['config']['channel_group']
+        application_groups = channel_group['groups']['Application']['groups']
+        args = []
+        for msp_id in msp_ids:
+            msp = application_groups.get(msp_id, None)
+            if msp is None:
+                raise Exception(f'Organization {msp_id} is not a member of the channel {channel}')
+            msp_value = msp['values']['MSP']
+            msp_config = msp_value['value']['config']
+            tls_root_certs = msp_config['tls_root_certs']
+            if tls_root_certs is None:
+                tls_root_certs = []
+            tls_intermediate_certs = msp_config['tls_intermediate_certs']
+            if tls_intermediate_certs is None:
+                tls_intermediate_certs = []
+            tls_certs = tls_root_certs + tls_intermediate_certs
             temp = tempfile.mkstemp()
-            os.write(temp[0], base64.b64decode(tlsCert))
+            for tls_cert in tls_certs:
+                decoded_tls_cert = base64.b64decode(tls_cert)
+                os.write(temp[0], decoded_tls_cert)
+                if not decoded_tls_cert.endswith(b'\n'):
+                    os.write(temp[0], b'\n')
             os.close(temp[0])
             pem_path = temp[1]
             self.other_paths.append(pem_path)
-            return ['-o', address, '--tls', '--cafile', pem_path]
-        finally:
-            os.remove(block_path)
+            anchor_peers_value = msp['values'].get('AnchorPeers', None)
+            if anchor_peers_value is None:
+                raise Exception(f'Organization {msp_id} has no anchor peers defined for channel {channel}')
+            anchor_peers = anchor_peers_value['value']['anchor_peers']
+            if not anchor_peers:
+                raise Exception(f'Organization {msp_id} has no anchor peers defined for channel {channel}')
+            anchor_peer = random.choice(anchor_peers)
+            host = anchor_peer['host']
+            port = anchor_peer['port']
+            address = f'{host}:{port}'
+            args.extend(['--peerAddresses', address, '--tlsRootCertFiles', pem_path])
+        return args
+
+    def _get_ordering_service(self, channel, orderer):
+        if orderer:
+            ordererNode = random.choice(orderer.nodes)
+            tlsCert = ordererNode.tls_ca_root_cert
+            apiUrl = urllib.parse.urlparse(ordererNode.api_url)
+            address = f'{apiUrl.hostname}:{apiUrl.port}'
+            self.module.json_log({"msg": "using task specified orderer", "tls_cert": tlsCert, "api_url": address})
+        else:
+            block = self._get_config_block(channel)
+            channel_group = block['data']['data'][0]['payload']['data']['config']['channel_group']
+            orderer_group = channel_group['groups']['Orderer']
+            consenters = orderer_group['values']['ConsensusType']['value']['metadata']['consenters']
+            consenter = random.choice(consenters)
+            tlsCert = consenter['server_tls_cert']
+            address = f'{consenter["host"]}:{consenter["port"]}'
+            self.module.json_log({"msg": "using orderer from channel", "tls_cert": tlsCert, "api_url": address})
+
+        temp = tempfile.mkstemp()
+        os.write(temp[0], base64.b64decode(tlsCert))
+        os.close(temp[0])
+        pem_path = temp[1]
+        self.other_paths.append(pem_path)
+        return ['-o', address, '--tls', '--cafile', pem_path]
 
     def _run_command(self, args, env):
         for attempt in range(1, self.retries + 1):
@@ -528,11 +631,9 @@ class PeerConnection:
                 return process
             elif attempt >= self.retries:
                 return process
-            elif "could not send to orderer node" in process.stdout:
-                time.sleep(5)
-                continue
-            elif "failed to create new connection" in process.stdout:
-                time.sleep(5)
-                continue
+            elif "could not send to orderer node" in process.stdout or "failed to create new connection" in process.stdout:
+                if self.retry_policy.sleep(attempt):
+                    continue
+                return process
             else:
                 return process
@@ -25,14 +25,67 @@ except ImportError:
     Crypto = object
     pass
 
+import atexit
 import hashlib
+import hmac
+import threading
+
+# The PKCS #11 sessions that are open in this process, keyed by library and token label.
+sessions = dict()
+sessions_lock = threading.Lock()
+
+
+class PKCS11Session:
+
+    # A logged in session with a token, shared by all of the users of the token in
+    # this process. A session must not be used by more than one thread at the same
+    # time, so all operations must hold the lock. The key pairs that have been found
+    # or generated are cached by subject key identifier (SKI), as finding a key can
+    # require several round trips to a network HSM.
+
+    def __init__(self, pkcs11library, label, pin):
+        self.pin = pin
+        lib = pkcs11.lib(pkcs11library)
+        self.token = lib.get_token(token_label=label)
+        self.session = self.token.open(rw=True, user_pin=pin)
+        self.lock = threading.RLock()
+        self.key_pairs = dict()
+
+    def close(self):
+        with self.lock:
+            self.session.close()
+
+
+def get_session(pkcs11library, label, pin):
+    key = (pkcs11library, label)
+    with sessions_lock:
+        session = sessions.get(key)
+        if session is None:
+            if not sessions:
+                atexit.register(close_sessions)
+            session = PKCS11Session(pkcs11library, label, pin)
+            sessions[key] = session
+        elif not hmac.compare_digest(session.pin, pin):
+            raise Exception(f'HSM pin does not match the pin for the open session with token {label}')
+        return session
+
+
+def close_sessions():
+    with sessions_lock:
+        for session in sessions.values():
+            try:
+                session.close()
+            except Exception:
+                pass
+        sessions.clear()
 
 
 class PKCS11KeyPair:
 
-    def __init__(self, public_key, private_key):
+    def __init__(self, public_key, private_key, ski=None):
         self.public_key = public_key
         self.private_key = private_key
+        self.ski = ski
 
 
 class PKCS11Crypto(Crypto):
@@ -41,16 +94,23 @@ class PKCS11Crypto(Crypto):
         self.pkcs11library = pkcs11library
         self.label = label
         self.pin = pin
-        lib = pkcs11.lib(pkcs11library)
-        self.token = lib.get_token(token_label=self.label)
-        self.session = self.token.open(rw=True, user_pin=self.pin)
+        self.pkcs11_session = get_session(pkcs11library, label, pin)
+        self.session = self.pkcs11_session.session
+        self.lock = self.pkcs11_session.lock
         self.order = int("115792089210356248762697446949407573529996955224135760342422259061068512044369")
         self.half_order = self.order >> 1
 
     def close(self):
-        self.session.close()
+        # The session is shared by the process, and is closed when the process exits.
+        pass
 
     def generate_private_key(self):
+        with self.lock:
+            key_pair = self._generate_private_key()
+            self.pkcs11_session.key_pairs[key_pair.ski] = key_pair
+            return key_pair
+
+    def _generate_private_key(self):
         parameters = self.session.create_domain_parameters(KeyType.EC, {
             Attribute.EC_PARAMS: encode_named_curve_parameters('secp256r1')
         }, local=True)
@@ -78,13 +138,24 @@ class PKCS11Crypto(Crypto):
         public_key[Attribute.LABEL] = hexski
         private_key[Attribute.ID] = ski
         private_key[Attribute.LABEL] = hexski
-        return PKCS11KeyPair(public_key, private_key)
+        return PKCS11KeyPair(public_key, private_key, ski)
 
     def get_private_key(self, ski):
-        ski = ski.hex()
-        public_key = self.session.get_key(object_class=ObjectClass.PUBLIC_KEY, key_type=KeyType.EC, label=ski)
-        private_key = self.session.get_key(object_class=ObjectClass.PRIVATE_KEY, key_type=KeyType.EC, label=ski)
-        return PKCS11KeyPair(public_key, private_key)
+        with self.lock:
+            key_pair = self.pkcs11_session.key_pairs.get(ski)
+            if key_pair is None:
+                hexski = ski.hex()
+                public_key = self.session.get_key(object_class=ObjectClass.PUBLIC_KEY, key_type=KeyType.EC, label=hexski)
+                private_key = self.session.get_key(object_class=ObjectClass.PRIVATE_KEY, key_type=KeyType.EC, label=hexski)
+                key_pair = PKCS11KeyPair(public_key, private_key, ski)
+                self.pkcs11_session.key_pairs[ski] = key_pair
+            return key_pair
+
+    def destroy_private_key(self, key_pair):
+        with self.lock:
+            self.pkcs11_session.key_pairs.pop(key_pair.ski, None)
+            key_pair.private_key.destroy()
+            key_pair.public_key.destroy()
 
     def encrypt(self, public_key, message):
         raise Exception('not implemented')
@@ -94,7 +165,8 @@ class PKCS11Crypto(Crypto):
 
     def sign(self, private_key, message):
         hash = hashlib.sha256(message).digest()
-        signature = private_key.private_key.sign(hash, mechanism=Mechanism.ECDSA)
+        with self.lock:
+            signature = private_key.private_key.sign(hash, mechanism=Mechanism.ECDSA)
         encoded_signature = encode_ecdsa_signature(signature)
         r, s = decode_dss_signature(encoded_signature)
         if s > self.half_order:
@@ -106,6 +178,8 @@ class PKCS11Crypto(Crypto):
 
     def generate_csr(self, private_key, subject_name, extensions=None):
         common_name = subject_name.get_attributes_for_oid(NameOID.COMMON_NAME)[0].value
+        with self.lock:
+            public_key = encode_ec_public_key(private_key.public_key)
         info = CertificationRequestInfo({
             'version': 0,
             'subject': Name.build({
@@ -115,11 +189,12 @@ class PKCS11Crypto(Crypto):
                 'organizational_unit_name': 'Fabric',
                 'common_name': common_name
             }),
-            'subject_pk_info': PublicKeyInfo.load(encode_ec_public_key(private_key.public_key)),
+            'subject_pk_info': PublicKeyInfo.load(public_key),
             'attributes': CRIAttributes([])
         })
         hash = hashlib.sha256(info.dump()).digest()
-        signature = private_key.private_key.sign(hash, mechanism=Mechanism.ECDSA)
+        with self.lock:
+            signature = private_key.private_key.sign(hash, mechanism=Mechanism.ECDSA)
         csr = CertificationRequest({
             'certification_request_info': info,
             'signature_algorithm': {
@@ -0,0 +1,918 @@
+#!/usr/bin/python
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import base64
+import collections
+import datetime
+import re
+
+# This module converts the Hyperledger Fabric channel configuration messages
+# between the protobuf wire format and the JSON format used by configtxlator,
+# without starting a configtxlator process. The JSON format is the one produced
+# by the protolator package in Hyperledger Fabric: original field names, default
+# values included, 64-bit integers as strings, enums as names, and the opaque
+# bytes fields that contain other messages decoded in place.
+#
+# Only the messages that make up channel configuration blocks and updates, and
+# the peer proposals and lifecycle queries used by the peer client, are described
+# here. Anything else, including fields that are not described, raises an
+# UnsupportedProtoError so that the caller can fall back to configtxlator.
+
+
+class UnsupportedProtoError(Exception):
+    pass
+
+
+Field = collections.namedtuple('Field', ['number', 'name', 'kind', 'type_name', 'repeated', 'oneof'])
+
+
+def field(number, name, kind, type_name=None, repeated=False, oneof=None):
+    return Field(number, name, kind, type_name, repeated, oneof)
+
+
+ENUMS = {
+    'common.Rule': ['ANY', 'ALL', 'MAJORITY'],
+    'msp.Classification': ['ROLE', 'ORGANIZATION_UNIT', 'IDENTITY', 'ANONYMITY', 'COMBINED'],
+    'msp.MSPRoleType': ['MEMBER', 'ADMIN', 'CLIENT', 'PEER', 'ORDERER'],
+    'msp.MSPIdentityAnonymityType': ['NOMINAL', 'ANONYMOUS'],
+    'orderer.State': ['STATE_NORMAL', 'STATE_MAINTENANCE'],
+    'protos.ChaincodeSpec.Type': ['UNDEFINED', 'GOLANG', 'NODE', 'CAR', 'JAVA'],
+    'orderer.SeekInfo.SeekBehavior': ['BLOCK_UNTIL_READY', 'FAIL_IF_NOT_READY'],
+}
+
+MESSAGES = {
+    'google.protobuf.Empty': [],
+    'google.protobuf.Timestamp': [
+        field(1, 'seconds', 'int64'),
+        field(2, 'nanos', 'int32'),
+    ],
+    'common.Block': [
+        field(1, 'header', 'message', 'common.BlockHeader'),
+        field(2, 'data', 'message', 'common.BlockData'),
+        field(3, 'metadata', 'message', 'common.BlockMetadata'),
+    ],
+    'common.BlockHeader': [
+        field(1, 'number', 'uint64'),
+        field(2, 'previous_hash', 'bytes'),
+        field(3, 'data_hash', 'bytes'),
+    ],
+    'common.BlockData': [
+        field(1, 'data', 'opaque', 'common.Envelope', repeated=True),
+    ],
+    'common.BlockMetadata': [
+        field(1, 'metadata', 'bytes', repeated=True),
+    ],
+    'common.Envelope': [
+        field(1, 'payload', 'opaque', 'common.Payload'),
+        field(2, 'signature', 'bytes'),
+    ],
+    'common.Payload': [
+        field(1, 'header', 'message', 'common.Header'),
+        field(2, 'data', 'opaque', lambda message, context: resolve_payload_data(message)),
+    ],
+    'common.Header': [
+        field(1, 'channel_header', 'opaque', 'common.ChannelHeader'),
+        field(2, 'signature_header', 'opaque', 'common.SignatureHeader'),
+    ],
+    'common.ChannelHeader': [
+        field(1, 'type', 'int32'),
+        field(2, 'version', 'int32'),
+        field(3, 'timestamp', 'timestamp'),
+        field(4, 'channel_id', 'string'),
+        field(5, 'tx_id', 'string'),
+        field(6, 'epoch', 'uint64'),
+        field(7, 'extension', 'bytes'),
+        field(8, 'tls_cert_hash', 'bytes'),
+    ],
+    'common.SignatureHeader': [
+        field(1, 'creator', 'opaque', 'msp.SerializedIdentity'),
+        field(2, 'nonce', 'bytes'),
+    ],
+    'common.ConfigEnvelope': [
+        field(1, 'config', 'message', 'common.Config'),
+        field(2, 'last_update', 'message', 'common.Envelope'),
+    ],
+    'common.Config': [
+        field(1, 'sequence', 'uint64'),
+        field(2, 'channel_group', 'message', 'common.ConfigGroup'),
+    ],
+    'common.ConfigUpdateEnvelope': [
+        field(1, 'config_update', 'opaque', 'common.ConfigUpdate'),
+        field(2, 'signatures', 'message', 'common.ConfigSignature', repeated=True),
+    ],
+    'common.ConfigUpdate': [
+        field(1, 'channel_id', 'string'),
+        field(2, 'read_set', 'message', 'common.ConfigGroup'),
+        field(3, 'write_set', 'message', 'common.ConfigGroup'),
+        field(5, 'isolated_data', 'map', 'bytes'),
+    ],
+    'common.ConfigGroup': [
+        field(1, 'version', 'uint64'),
+        field(2, 'groups', 'map', 'common.ConfigGroup'),
+        field(3, 'values', 'map', 'common.ConfigValue'),
+        field(4, 'policies', 'map', 'common.ConfigPolicy'),
+        field(5, 'mod_policy', 'string'),
+    ],
+    'common.ConfigValue': [
+        field(1, 'version', 'uint64'),
+        field(2, 'value', 'opaque', lambda message, context: CONFIG_VALUE_TYPES.get(context)),
+        field(3, 'mod_policy', 'string'),
+    ],
+    'common.ConfigPolicy': [
+        field(1, 'version', 'uint64'),
+        field(2, 'policy', 'message', 'common.Policy'),
+        field(3, 'mod_policy', 'string'),
+    ],
+    'common.ConfigSignature': [
+        field(1, 'signature_header', 'opaque', 'common.SignatureHeader'),
+        field(2, 'signature', 'bytes'),
+    ],
+    'common.Policy': [
+        field(1, 'type', 'int32'),
+        field(2, 'value', 'opaque', lambda message, context: POLICY_TYPES.get(message.get('type') or 0)),
+    ],
+    'common.SignaturePolicyEnvelope': [
+        field(1, 'version', 'int32'),
+        field(2, 'rule', 'message', 'common.SignaturePolicy'),
+        field(3, 'identities', 'message', 'msp.MSPPrincipal', repeated=True),
+    ],
+    'common.SignaturePolicy': [
+        field(1, 'signed_by', 'int32', oneof='Type'),
+        field(2, 'n_out_of', 'message', 'common.SignaturePolicy.NOutOf', oneof='Type'),
+    ],
+    'common.SignaturePolicy.NOutOf': [
+        field(1, 'n', 'int32'),
+        field(2, 'rules', 'message', 'common.SignaturePolicy', repeated=True),
+    ],
+    'common.ImplicitMetaPolicy': [
+        field(1, 'sub_policy', 'string'),
+        field(2, 'rule', 'enum', 'common.Rule'),
+    ],
+    'common.HashingAlgorithm': [
+        field(1, 'name', 'string'),
+    ],
+    'common.BlockDataHashingStructure': [
+        field(1, 'width', 'uint32'),
+    ],
+    'common.OrdererAddresses': [
+        field(1, 'addresses', 'string', repeated=True),
+    ],
+    'common.Consortium': [
+        field(1, 'name', 'string'),
+    ],
+    'common.Capabilities': [
+        field(1, 'capabilities', 'map', 'common.Capability'),
+    ],
+    'common.Capability': [],
+    'msp.SerializedIdentity': [
+        field(1, 'mspid', 'string'),
+        field(2, 'id_bytes', 'bytes'),
+    ],
+    'msp.MSPPrincipal': [
+        field(1, 'principal_classification', 'enum', 'msp.Classification'),
+        field(2, 'principal', 'opaque', lambda message, context: PRINCIPAL_TYPES.get(enum_value('msp.Classification', message.get('principal_classification') or 0))),
+    ],
+    'msp.OrganizationUnit': [
+        field(1, 'msp_identifier', 'string'),
+        field(2, 'organizational_unit_identifier', 'string'),
+        field(3, 'certifiers_identifier', 'bytes'),
+    ],
+    'msp.MSPRole': [
+        field(1, 'msp_identifier', 'string'),
+        field(2, 'role', 'enum', 'msp.MSPRoleType'),
+    ],
+    'msp.MSPIdentityAnonymity': [
+        field(1, 'anonymity_type', 'enum', 'msp.MSPIdentityAnonymityType'),
+    ],
+    'msp.CombinedPrincipal': [
+        field(1, 'principals', 'message', 'msp.MSPPrincipal', repeated=True),
+    ],
+    'msp.MSPConfig': [
+        field(1, 'type', 'int32'),
+        field(2, 'config', 'opaque', lambda message, context: MSP_CONFIG_TYPES.get(message.get('type') or 0)),
+    ],
+    'msp.FabricMSPConfig': [
+        field(1, 'name', 'string'),
+        field(2, 'root_certs', 'bytes', repeated=True),
+        field(3, 'intermediate_certs', 'bytes', repeated=True),
+        field(4, 'admins', 'bytes', repeated=True),
+        field(5, 'revocation_list', 'bytes', repeated=True),
+        field(6, 'signing_identity', 'message', 'msp.SigningIdentityInfo'),
+        field(7, 'organizational_unit_identifiers', 'message', 'msp.FabricOUIdentifier', repeated=True),
+        field(8, 'crypto_config', 'message', 'msp.FabricCryptoConfig'),
+        field(9, 'tls_root_certs', 'bytes', repeated=True),
+        field(10, 'tls_intermediate_certs', 'bytes', repeated=True),
+        field(11, 'fabric_node_ous', 'message', 'msp.FabricNodeOUs'),
+    ],
+    'msp.FabricCryptoConfig': [
+        field(1, 'signature_hash_family', 'string'),
+        field(2, 'identity_identifier_hash_function', 'string'),
+    ],
+    'msp.SigningIdentityInfo': [
+        field(1, 'public_signer', 'bytes'),
+        field(2, 'private_signer', 'message', 'msp.KeyInfo'),
+    ],
+    'msp.KeyInfo': [
+        field(1, 'key_identifier', 'string'),
+        field(2, 'key_material', 'bytes'),
+    ],
+    'msp.FabricOUIdentifier': [
+        field(1, 'certificate', 'bytes'),
+        field(2, 'organizational_unit_identifier', 'string'),
+    ],
+    'msp.FabricNodeOUs': [
+        field(1, 'enable', 'bool'),
+        field(2, 'client_ou_identifier', 'message', 'msp.FabricOUIdentifier'),
+        field(3, 'peer_ou_identifier', 'message', 'msp.FabricOUIdentifier'),
+        field(4, 'admin_ou_identifier', 'message', 'msp.FabricOUIdentifier'),
+        field(5, 'orderer_ou_identifier', 'message', 'msp.FabricOUIdentifier'),
+    ],
+    'orderer.ConsensusType': [
+        field(1, 'type', 'string'),
+        field(2, 'metadata', 'opaque', lambda message, context: CONSENSUS_METADATA_TYPES.get(message.get('type'), 'google.protobuf.Empty')),
+        field(3, 'state', 'enum', 'orderer.State'),
+    ],
+    'orderer.BatchSize': [
+        field(1, 'max_message_count', 'uint32'),
+        field(2, 'absolute_max_bytes', 'uint32'),
+        field(3, 'preferred_max_bytes', 'uint32'),
+    ],
+    'orderer.BatchTimeout': [
+        field(1, 'timeout', 'string'),
+    ],
+    'orderer.KafkaBrokers': [
+        field(1, 'brokers', 'string', repeated=True),
+    ],
+    'orderer.ChannelRestrictions': [
+        field(1, 'max_count', 'uint64'),
+    ],
+    'etcdraft.ConfigMetadata': [
+        field(1, 'consenters', 'message', 'etcdraft.Consenter', repeated=True),
+        field(2, 'options', 'message', 'etcdraft.Options'),
+    ],
+    'etcdraft.Consenter': [
+        field(1, 'host', 'string'),
+        field(2, 'port', 'uint32'),
+        field(3, 'client_tls_cert', 'bytes'),
+        field(4, 'server_tls_cert', 'bytes'),
+    ],
+    'etcdraft.Options': [
+        field(1, 'tick_interval', 'string'),
+        field(2, 'election_tick', 'uint32'),
+        field(3, 'heartbeat_tick', 'uint32'),
+        field(4, 'max_inflight_blocks', 'uint32'),
+        field(5, 'snapshot_interval_size', 'uint32'),
+    ],
+    'protos.AnchorPeers': [
+        field(1, 'anchor_peers', 'message', 'protos.AnchorPeer', repeated=True),
+    ],
+    'protos.AnchorPeer': [
+        field(1, 'host', 'string'),
+        field(2, 'port', 'int32'),
+    ],
+    'protos.ACLs': [
+        field(1, 'acls', 'map', 'protos.APIResource'),
+    ],
+    'protos.APIResource': [
+        field(1, 'policy_ref', 'string'),
+    ],
+    'protos.SignedProposal': [
+        field(1, 'proposal_bytes', 'opaque', 'protos.Proposal'),
+        field(2, 'signature', 'bytes'),
+    ],
+    'protos.Proposal': [
+        field(1, 'header', 'opaque', 'common.Header'),
+        field(2, 'payload', 'opaque', 'protos.ChaincodeProposalPayload'),
+        field(3, 'extension', 'bytes'),
+    ],
+    'protos.ChaincodeHeaderExtension': [
+        field(2, 'chaincode_id', 'message', 'protos.ChaincodeID'),
+    ],
+    'protos.ChaincodeProposalPayload': [
+        field(1, 'input', 'opaque', 'protos.ChaincodeInvocationSpec'),
+        field(2, 'TransientMap', 'map', 'bytes'),
+    ],
+    'protos.ChaincodeInvocationSpec': [
+        field(1, 'chaincode_spec', 'message', 'protos.ChaincodeSpec'),
+    ],
+    'protos.ChaincodeSpec': [
+        field(1, 'type', 'enum', 'protos.ChaincodeSpec.Type'),
+        field(2, 'chaincode_id', 'message', 'protos.ChaincodeID'),
+        field(3, 'input', 'message', 'protos.ChaincodeInput'),
+        field(4, 'timeout', 'int32'),
+    ],
+    'protos.ChaincodeID': [
+        field(1, 'path', 'string'),
+        field(2, 'name', 'string'),
+        field(3, 'version', 'string'),
+    ],
+    'protos.ChaincodeInput': [
+        field(1, 'args', 'bytes', repeated=True),
+        field(2, 'decorations', 'map', 'bytes'),
+        field(3, 'is_init', 'bool'),
+    ],
+    'protos.ProposalResponse': [
+        field(1, 'version', 'int32'),
+        field(2, 'timestamp', 'timestamp'),
+        field(4, 'response', 'message', 'protos.Response'),
+        field(5, 'payload', 'bytes'),
+        field(6, 'endorsement', 'message', 'protos.Endorsement'),
+        field(7, 'interest', 'bytes'),
+    ],
+    'protos.Response': [
+        field(1, 'status', 'int32'),
+        field(2, 'message', 'string'),
+        field(3, 'payload', 'bytes'),
+    ],
+    'protos.Endorsement': [
+        field(1, 'endorser', 'bytes'),
+        field(2, 'signature', 'bytes'),
+    ],
+    'protos.ChannelQueryResponse': [
+        field(1, 'channels', 'message', 'protos.ChannelInfo', repeated=True),
+    ],
+    'protos.ChannelInfo': [
+        field(1, 'channel_id', 'string'),
+    ],
+    'protos.ChaincodeQueryResponse': [
+        field(1, 'chaincodes', 'message', 'protos.ChaincodeInfo', repeated=True),
+    ],
+    'protos.ChaincodeInfo': [
+        field(1, 'name', 'string'),
+        field(2, 'version', 'string'),
+        field(3, 'path', 'string'),
+        field(4, 'input', 'string'),
+        field(5, 'escc', 'string'),
+        field(6, 'vscc', 'string'),
+        field(7, 'id', 'bytes'),
+    ],
+    'protos.DeliverResponse': [
+        field(1, 'status', 'int32', oneof='Type'),
+        field(2, 'block', 'message', 'common.Block', oneof='Type'),
+        field(3, 'filtered_block', 'message', 'protos.FilteredBlock', oneof='Type'),
+    ],
+    'protos.FilteredBlock': [
+        field(1, 'channel_id', 'string'),
+        field(2, 'number', 'uint64'),
+        field(4, 'filtered_transactions', 'message', 'protos.FilteredTransaction', repeated=True),
+    ],
+    'protos.FilteredTransaction': [
+        field(1, 'txid', 'string'),
+        field(2, 'type', 'int32'),
+        field(3, 'tx_validation_code', 'int32'),
+        field(4, 'transaction_actions', 'message', 'protos.FilteredTransactionActions', oneof='Data'),
+    ],
+    'protos.FilteredTransactionActions': [
+        field(1, 'chaincode_actions', 'message', 'protos.FilteredChaincodeAction', repeated=True),
+    ],
+    'protos.FilteredChaincodeAction': [
+        field(1, 'chaincode_event', 'message', 'protos.ChaincodeEvent'),
+    ],
+    'protos.ChaincodeEvent': [
+        field(1, 'chaincode_id', 'string'),
+        field(2, 'tx_id', 'string'),
+        field(3, 'event_name', 'string'),
+        field(4, 'payload', 'bytes'),
+    ],
+    'orderer.SeekInfo': [
+        field(1, 'start', 'message', 'orderer.SeekPosition'),
+        field(2, 'stop', 'message', 'orderer.SeekPosition'),
+        field(3, 'behavior', 'enum', 'orderer.SeekInfo.SeekBehavior'),
+    ],
+    'orderer.SeekPosition': [
+        field(1, 'newest', 'message', 'google.protobuf.Empty', oneof='Type'),
+        field(2, 'oldest', 'message', 'google.protobuf.Empty', oneof='Type'),
+        field(3, 'specified', 'message', 'orderer.SeekSpecified', oneof='Type'),
+    ],
+    'orderer.SeekSpecified': [
+        field(1, 'number', 'uint64'),
+    ],
+    'protos.ApplicationPolicy': [
+        field(1, 'signature_policy', 'message', 'common.SignaturePolicyEnvelope', oneof='Type'),
+        field(2, 'channel_config_policy_reference', 'string', oneof='Type'),
+    ],
+    'protos.CollectionConfigPackage': [
+        field(1, 'config', 'message', 'protos.CollectionConfig', repeated=True),
+    ],
+    'protos.CollectionConfig': [
+        field(1, 'static_collection_config', 'message', 'protos.StaticCollectionConfig', oneof='Payload'),
+    ],
+    'protos.StaticCollectionConfig': [
+        field(1, 'name', 'string'),
+        field(2, 'member_orgs_policy', 'message', 'protos.CollectionPolicyConfig'),
+        field(3, 'required_peer_count', 'int32'),
+        field(4, 'maximum_peer_count', 'int32'),
+        field(5, 'block_to_live', 'uint64'),
+        field(6, 'member_only_read', 'bool'),
+        field(7, 'member_only_write', 'bool'),
+        field(8, 'endorsement_policy', 'message', 'protos.ApplicationPolicy'),
+    ],
+    'protos.CollectionPolicyConfig': [
+        field(1, 'signature_policy', 'message', 'common.SignaturePolicyEnvelope', oneof='Payload'),
+    ],
+    'lifecycle.QueryInstalledChaincodesArgs': [],
+    'lifecycle.QueryInstalledChaincodesResult': [
+        field(1, 'installed_chaincodes', 'message', 'lifecycle.QueryInstalledChaincodesResult.InstalledChaincode', repeated=True),
+    ],
+    'lifecycle.QueryInstalledChaincodesResult.InstalledChaincode': [
+        field(1, 'package_id', 'string'),
+        field(2, 'label', 'string'),
+        field(3, 'references', 'map', 'lifecycle.QueryInstalledChaincodesResult.References'),
+    ],
+    'lifecycle.QueryInstalledChaincodesResult.References': [
+        field(1, 'chaincodes', 'message', 'lifecycle.QueryInstalledChaincodesResult.Chaincode', repeated=True),
+    ],
+    'lifecycle.QueryInstalledChaincodesResult.Chaincode': [
+        field(1, 'name', 'string'),
+        field(2, 'version', 'string'),
+    ],
+    'lifecycle.CheckCommitReadinessArgs': [
+        field(1, 'sequence', 'int64'),
+        field(2, 'name', 'string'),
+        field(3, 'version', 'string'),
+        field(4, 'endorsement_plugin', 'string'),
+        field(5, 'validation_plugin', 'string'),
+        field(6, 'validation_parameter', 'bytes'),
+        field(7, 'collections', 'message', 'protos.CollectionConfigPackage'),
+        field(8, 'init_required', 'bool'),
+    ],
+    'lifecycle.CheckCommitReadinessResult': [
+        field(1, 'approvals', 'map', 'bool'),
+    ],
+    'lifecycle.QueryChaincodeDefinitionArgs': [
+        field(1, 'name', 'string'),
+    ],
+    'lifecycle.QueryChaincodeDefinitionResult': [
+        field(1, 'sequence', 'int64'),
+        field(2, 'version', 'string'),
+        field(3, 'endorsement_plugin', 'string'),
+        field(4, 'validation_plugin', 'string'),
+        field(5, 'validation_parameter', 'bytes'),
+        field(6, 'collections', 'message', 'protos.CollectionConfigPackage'),
+        field(7, 'init_required', 'bool'),
+        field(8, 'approvals', 'map', 'bool'),
+    ],
+    'lifecycle.QueryChaincodeDefinitionsArgs': [],
+    'lifecycle.QueryChaincodeDefinitionsResult': [
+        field(1, 'chaincode_definitions', 'message', 'lifecycle.QueryChaincodeDefinitionsResult.ChaincodeDefinition', repeated=True),
+    ],
+    'lifecycle.QueryChaincodeDefinitionsResult.ChaincodeDefinition': [
+        field(1, 'name', 'string'),
+        field(2, 'sequence', 'int64'),
+        field(3, 'version', 'string'),
+        field(4, 'endorsement_plugin', 'string'),
+        field(5, 'validation_plugin', 'string'),
+        field(6, 'validation_parameter', 'bytes'),
+        field(7, 'collections', 'message', 'protos.CollectionConfigPackage'),
+        field(8, 'init_required', 'bool'),
+    ],
+}
+
+# The message types that can be converted by this module.
+SUPPORTED_TYPES = ['common.Block', 'common.Envelope', 'common.Config', 'common.ConfigUpdate', 'common.ConfigEnvelope', 'common.ConfigUpdateEnvelope', 'common.Payload']
+
+# The message types for the payload data, by channel header type.
+PAYLOAD_DATA_TYPES = {
+    1: 'common.ConfigEnvelope',
+    2: 'common.ConfigUpdateEnvelope',
+    5: 'orderer.SeekInfo',
+}
+
+# The message types for configuration values, by configuration value key.
+CONFIG_VALUE_TYPES = {
+    'HashingAlgorithm': 'common.HashingAlgorithm',
+    'BlockDataHashingStructure': 'common.BlockDataHashingStructure',
+    'OrdererAddresses': 'common.OrdererAddresses',
+    'Endpoints': 'common.OrdererAddresses',
+    'Consortium': 'common.Consortium',
+    'Capabilities': 'common.Capabilities',
+    'ChannelCreationPolicy': 'common.Policy',
+    'MSP': 'msp.MSPConfig',
+    'ConsensusType': 'orderer.ConsensusType',
+    'BatchSize': 'orderer.BatchSize',
+    'BatchTimeout': 'orderer.BatchTimeout',
+    'KafkaBrokers': 'orderer.KafkaBrokers',
+    'ChannelRestrictions': 'orderer.ChannelRestrictions',
+    'AnchorPeers': 'protos.AnchorPeers',
+    'ACLs': 'protos.ACLs',
+}
+
+# The message types for policies, by policy type.
+POLICY_TYPES = {
+    1: 'common.SignaturePolicyEnvelope',
+    3: 'common.ImplicitMetaPolicy',
+}
+
+# The message types for MSP principals, by principal classification.
+PRINCIPAL_TYPES = {
+    0: 'msp.MSPRole',
+    1: 'msp.OrganizationUnit',
+    2: 'msp.SerializedIdentity',
+    3: 'msp.MSPIdentityAnonymity',
+    4: 'msp.CombinedPrincipal',
+}
+
+# The message types for MSP configurations, by MSP type.
+MSP_CONFIG_TYPES = {
+    0: 'msp.FabricMSPConfig',
+}
+
+# The message types for consensus metadata, by consensus type.
+CONSENSUS_METADATA_TYPES = {
+    'etcdraft': 'etcdraft.ConfigMetadata',
+}
+
+WIRE_VARINT = 0
+WIRE_LENGTH_DELIMITED = 2
+
+VARINT_KINDS = ['bool', 'int32', 'uint32', 'int64', 'uint64', 'enum']
+
+
+def enum_value(enum_name, value):
+    if isinstance(value, str):
+        try:
+            return ENUMS[enum_name].index(value)
+        except ValueError:
+            raise UnsupportedProtoError(f'Unknown value {value} for enum {enum_name}')
+    return int(value)
+
+
+def resolve_payload_data(message):
+    channel_header = (message.get('header') or dict()).get('channel_header') or dict()
+    return PAYLOAD_DATA_TYPES.get(int(channel_header.get('type') or 0))
+
+
+def resolve_type(f, message, context):
+    if callable(f.type_name):
+        type_name = f.type_name(message, context)
+    else:
+        type_name = f.type_name
+    if type_name is None:
+        raise UnsupportedProtoError(f'Cannot determine the message type for field {f.name}')
+    return type_name
+
+
+def get_fields(type_name):
+    fields = MESSAGES.get(type_name, None)
+    if fields is None:
+        raise UnsupportedProtoError(f'Unsupported message type {type_name}')
+    return fields
+
+
+# Decoding (protobuf wire format to JSON).
+
+def read_varint(data, offset):
+    result = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError('Truncated varint')
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return (result, offset)
+        shift += 7
+        if shift >= 70:
+            raise ValueError('Varint too long')
+
+
+def read_stream_varint(file):
+
+    # Read a varint from a file, returning None at the end of the file.
+    result = 0
+    shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            if shift:
+                raise ValueError('Truncated varint')
+            return None
+        result |= (byte[0] & 0x7f) << shift
+        if not byte[0] & 0x80:
+            return result
+        shift += 7
+        if shift >= 70:
+            raise ValueError('Varint too long')
+
+
+def read_fields(data):
+    offset = 0
+    while offset < len(data):
+        (key, offset) = read_varint(data, offset)
+        number = key >> 3
+        wire_type = key & 0x7
+        if wire_type == WIRE_VARINT:
+            (value, offset) = read_varint(data, offset)
+        elif wire_type == WIRE_LENGTH_DELIMITED:
+            (length, offset) = read_varint(data, offset)
+            if offset + length > len(data):
+                raise ValueError('Truncated length delimited field')
+            value = data[offset:offset + length]
+            offset += length
+        else:
+            raise UnsupportedProtoError(f'Unsupported wire type {wire_type} for field {number}')
+        yield (number, wire_type, value)
+
+
+def to_signed(value, bits):
+    value &= (1 << 64) - 1
+    if value >= 1 << 63:
+        value -= 1 << 64
+    if bits == 32:
+        value = (value + (1 << 31)) % (1 << 32) - (1 << 31)
+    return value
+
+
+def format_timestamp(seconds, nanos):
+    timestamp = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=seconds)
+    result = timestamp.strftime('%Y-%m-%dT%H:%M:%S')
+    if nanos % 1000000 == 0 and nanos:
+        result += '.%03d' % (nanos // 1000000)
+    elif nanos % 1000 == 0 and nanos:
+        result += '.%06d' % (nanos // 1000)
+    elif nanos:
+        result += '.%09d' % nanos
+    return result + 'Z'
+
+
+def decode_scalar(f, value):
+    if f.kind == 'string':
+        return bytes(value).decode('utf-8')
+    elif f.kind == 'bytes':
+        return base64.b64encode(bytes(value)).decode('utf-8')
+    elif f.kind == 'bool':
+        return bool(value)
+    elif f.kind == 'int32':
+        return to_signed(value, 32)
+    elif f.kind == 'uint32':
+        return value & 0xffffffff
+    elif f.kind == 'int64':
+        return str(to_signed(value, 64))
+    elif f.kind == 'uint64':
+        return str(value)
+    elif f.kind == 'enum':
+        value = to_signed(value, 32)
+        names = ENUMS[f.type_name]
+        return names[value] if 0 <= value < len(names) else value
+    raise UnsupportedProtoError(f'Unsupported field kind {f.kind}')
+
+
+def default_value(f):
+    if f.repeated:
+        return list()
+    elif f.kind == 'map':
+        return dict()
+    elif f.kind == 'string':
+        return ''
+    elif f.kind == 'bool':
+        return False
+    elif f.kind in ['int32', 'uint32']:
+        return 0
+    elif f.kind in ['int64', 'uint64']:
+        return '0'
+    elif f.kind == 'enum':
+        return ENUMS[f.type_name][0]
+    return None
+
+
+def read_message(type_name, data):
+    fields = get_fields(type_name)
+    fields_by_number = {f.number: f for f in fields}
+    raw = dict()
+    for (number, wire_type, value) in read_fields(data):
+        f = fields_by_number.get(number, None)
+        if f is None:
+            raise UnsupportedProtoError(f'Unknown field {number} in message type {type_name}')
+        expected_wire_type = WIRE_VARINT if f.kind in VARINT_KINDS else WIRE_LENGTH_DELIMITED
+        if wire_type != expected_wire_type:
+            raise UnsupportedProtoError(f'Unexpected wire type {wire_type} for field {f.name} in message type {type_name}')
+        if f.kind == 'map':
+            entry = {entry_number: entry_value for (entry_number, entry_wire_type, entry_value) in read_fields(value)}
+            key = bytes(entry.get(1, b'')).decode('utf-8')
+            raw.setdefault(f.name, dict())[key] = entry.get(2, 0 if f.type_name == 'bool' else b'')
+        elif f.repeated:
+            raw.setdefault(f.name, list()).append(value)
+        else:
+            raw[f.name] = value
+    return (fields, raw)
+
+
+def decode_map_value(f, value, decoder):
+    if f.type_name == 'bytes':
+        return base64.b64encode(bytes(value)).decode('utf-8')
+    elif f.type_name == 'bool':
+        return bool(value)
+    return decoder(f.type_name, value)
+
+
+def decode_message(type_name, data, context=None):
+    (fields, raw) = read_message(type_name, data)
+
+    # Convert everything apart from the opaque fields first, as the opaque
+    # fields may need the other fields to determine their message types.
+    result = dict()
+    for f in fields:
+        if f.kind == 'opaque':
+            continue
+        elif f.name not in raw:
+            if not f.oneof:
+                result[f.name] = default_value(f)
+        elif f.kind == 'map':
+            result[f.name] = {key: decode_map_value(f, value, lambda type_name, value: decode_message(type_name, value, key)) for (key, value) in raw[f.name].items()}
+        elif f.kind == 'message':
+            if f.repeated:
+                result[f.name] = [decode_message(f.type_name, value) for value in raw[f.name]]
+            else:
+                result[f.name] = decode_message(f.type_name, raw[f.name])
+        elif f.kind == 'timestamp':
+            timestamp = decode_message('google.protobuf.Timestamp', raw[f.name])
+            result[f.name] = format_timestamp(int(timestamp['seconds']), timestamp['nanos'])
+        elif f.repeated:
+            result[f.name] = [decode_scalar(f, value) for value in raw[f.name]]
+        elif f.kind == 'bytes' and not raw[f.name]:
+            result[f.name] = None
+        else:
+            result[f.name] = decode_scalar(f, raw[f.name])
+    for f in fields:
+        if f.kind != 'opaque':
+            continue
+        if f.repeated:
+            result[f.name] = [decode_message(resolve_type(f, result, context), value) for value in raw.get(f.name, list())]
+        else:
+            result[f.name] = decode_message(resolve_type(f, result, context), raw.get(f.name, b''))
+    return result
+
+
+def decode_struct(type_name, data):
+
+    # Decode a message into the JSON that the peer CLI prints for it, which is
+    # the Go structs for the message encoded by the encoding/json package:
+    # default values omitted, 64-bit integers and enums as numbers, opaque
+    # fields left as bytes, and oneof fields wrapped in an object.
+    (fields, raw) = read_message(type_name, data)
+    result = dict()
+    for f in fields:
+        if f.name not in raw:
+            continue
+        elif f.kind == 'map':
+            value = {key: decode_map_value(f, value, decode_struct) for (key, value) in raw[f.name].items()}
+        elif f.kind == 'message' and f.repeated:
+            value = [decode_struct(f.type_name, value) for value in raw[f.name]]
+        elif f.kind in ['message', 'timestamp']:
+            value = decode_struct(f.type_name or 'google.protobuf.Timestamp', raw[f.name])
+        elif f.kind == 'opaque':
+            value = [base64.b64encode(bytes(value)).decode('utf-8') for value in raw[f.name]] if f.repeated else base64.b64encode(bytes(raw[f.name])).decode('utf-8')
+        elif f.repeated:
+            value = [decode_struct_scalar(f, value) for value in raw[f.name]]
+        else:
+            value = decode_struct_scalar(f, raw[f.name])
+        if f.oneof:
+            result[f.oneof] = {f.name: value}
+        elif value not in [0, '', False, None, [], {}] or isinstance(value, dict) and f.kind != 'map':
+            result[f.name] = value
+    return result
+
+
+def decode_struct_scalar(f, value):
+    if f.kind == 'enum':
+        return to_signed(value, 32)
+    value = decode_scalar(f, value)
+    if f.kind in ['int64', 'uint64']:
+        return int(value)
+    return value
+
+
+# Encoding (JSON to protobuf wire format).
+
+def write_varint(out, value):
+    value &= (1 << 64) - 1
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def write_key(out, number, wire_type):
+    write_varint(out, (number << 3) | wire_type)
+
+
+def write_bytes(out, number, value):
+    write_key(out, number, WIRE_LENGTH_DELIMITED)
+    write_varint(out, len(value))
+    out.extend(value)
+
+
+def decode_base64(value):
+    # Accept both the standard and URL safe alphabets, with or without padding.
+    value = value.strip()
+    value += '=' * (-len(value) % 4)
+    if '-' in value or '_' in value:
+        return base64.urlsafe_b64decode(value)
+    return base64.b64decode(value)
+
+
+def parse_timestamp(value):
+    m = re.match(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d{1,9}))?(Z|[+-]\d{2}:\d{2})$', value)
+    if m is None:
+        raise ValueError(f'Invalid timestamp {value}')
+    (date_time, fraction, zone) = m.groups()
+    timestamp = datetime.datetime.strptime(date_time, '%Y-%m-%dT%H:%M:%S')
+    seconds = int((timestamp - datetime.datetime(1970, 1, 1)).total_seconds())
+    if zone != 'Z':
+        offset = int(zone[1:3]) * 3600 + int(zone[4:6]) * 60
+        seconds -= offset if zone[0] == '+' else -offset
+    nanos = int((fraction or '0').ljust(9, '0'))
+    return dict(seconds=seconds, nanos=nanos)
+
+
+def encode_scalar(f, value):
+    if f.kind == 'string':
+        return str(value).encode('utf-8')
+    elif f.kind == 'bytes':
+        return decode_base64(value)
+    elif f.kind == 'bool':
+        return 1 if value else 0
+    elif f.kind == 'enum':
+        return enum_value(f.type_name, value)
+    elif f.kind in ['int32', 'uint32', 'int64', 'uint64']:
+        return int(value)
+    raise UnsupportedProtoError(f'Unsupported field kind {f.kind}')
+
+
+def write_scalar(out, f, value, always=False):
+    encoded = encode_scalar(f, value)
+    if f.kind in VARINT_KINDS:
+        if encoded or always:
+            write_key(out, f.number, WIRE_VARINT)
+            write_varint(out, encoded)
+    elif encoded or always:
+        write_bytes(out, f.number, encoded)
+
+
+def encode_opaque(f, message, value, context):
+    # Opaque fields are normally provided as JSON objects, but also accept the
+    # already encoded bytes as a base64 string.
+    if isinstance(value, str):
+        return decode_base64(value)
+    return encode_message(resolve_type(f, message, context), value)
+
+
+def encode_message(type_name, message, context=None):
+    fields = get_fields(type_name)
+    if message is None:
+        message = dict()
+    if not isinstance(message, dict):
+        raise ValueError(f'Expected an object for message type {type_name}')
+    names = set(f.name for f in fields)
+    for name in message:
+        if name not in names:
+            raise UnsupportedProtoError(f'Unknown field {name} in message type {type_name}')
+    out = bytearray()
+    for f in sorted(fields, key=lambda f: f.number):
+        value = message.get(f.name, None)
+        if value is None:
+            continue
+        if f.kind == 'map':
+            for key in sorted(value):
+                entry = bytearray()
+                write_bytes(entry, 1, str(key).encode('utf-8'))
+                if f.type_name == 'bytes':
+                    write_bytes(entry, 2, decode_base64(value[key] or ''))
+                elif f.type_name == 'bool':
+                    write_key(entry, 2, WIRE_VARINT)
+                    write_varint(entry, 1 if value[key] else 0)
+                else:
+                    write_bytes(entry, 2, encode_message(f.type_name, value[key], key))
+                write_bytes(out, f.number, entry)
+        elif f.kind == 'message':
+            if f.repeated:
+                for item in value:
+                    write_bytes(out, f.number, encode_message(f.type_name, item))
+            else:
+                write_bytes(out, f.number, encode_message(f.type_name, value))
+        elif f.kind == 'timestamp':
+            write_bytes(out, f.number, encode_message('google.protobuf.Timestamp', parse_timestamp(value)))
+        elif f.kind == 'opaque':
+            if f.repeated:
+                for item in value:
+                    write_bytes(out, f.number, encode_opaque(f, message, item, context))
+            else:
+                encoded = encode_opaque(f, message, value, context)
+                if encoded:
+                    write_bytes(out, f.number, encoded)
+        elif f.repeated:
+            for item in value:
+                write_scalar(out, f, item, always=True)
+        else:
+            write_scalar(out, f, value, always=f.oneof)
+    return bytes(out)
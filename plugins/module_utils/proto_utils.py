@@ -6,14 +6,187 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+from .cache_utils import FileCache
 from .file_utils import get_temp_file
+from .proto_codec import SUPPORTED_TYPES, UnsupportedProtoError, decode_message, encode_message
 
+import http.client
 import json
 import os
+import socket
 import subprocess
+import sys
+import time
+
+# The watchdog stops a configtxlator server once the state file that records
+# it has expired, been removed, or been replaced by a different server.
+CONFIGTXLATOR_WATCHDOG = '''
+import json, os, signal, sys, time
+(pid, state_path, interval) = (int(sys.argv[1]), sys.argv[2], float(sys.argv[3]))
+while True:
+    time.sleep(interval)
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        break
+    try:
+        with open(state_path, 'r') as file:
+            entry = json.load(file)
+    except (OSError, ValueError):
+        entry = dict()
+    if entry.get('expires', 0) <= time.time() or entry.get('value', dict()).get('pid') != pid:
+        os.kill(pid, signal.SIGTERM)
+        break
+'''
+
+
+def get_codec():
+
+    # The native codec handles the channel configuration messages in process,
+    # and falls back to configtxlator for anything it does not support. The
+    # verify mode runs both and fails if they disagree. The native codec is
+    # opt-in until it has been checked against configtxlator output.
+    codec = os.environ.get('IBP_ANSIBLE_PROTO_CODEC', 'configtxlator')
+    if codec not in ['native', 'configtxlator', 'verify']:
+        raise Exception(f'Invalid value {codec} for IBP_ANSIBLE_PROTO_CODEC, must be native, configtxlator, or verify')
+    return codec
+
+
+def find_difference(expected, actual, path='$'):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual)):
+            if key not in expected or key not in actual:
+                return f'{path}.{key}'
+            difference = find_difference(expected[key], actual[key], f'{path}.{key}')
+            if difference:
+                return difference
+        return None
+    elif isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return path
+        for i, (expected_item, actual_item) in enumerate(zip(expected, actual)):
+            difference = find_difference(expected_item, actual_item, f'{path}[{i}]')
+            if difference:
+                return difference
+        return None
+    return None if expected == actual else path
 
 
 def proto_to_json(proto_type, proto_input):
+    codec = get_codec()
+    if codec == 'configtxlator' or proto_type not in SUPPORTED_TYPES:
+        return _configtxlator_proto_to_json(proto_type, proto_input)
+    try:
+        result = decode_message(proto_type, proto_input)
+    except UnsupportedProtoError:
+        return _configtxlator_proto_to_json(proto_type, proto_input)
+    if codec == 'verify':
+        expected = _configtxlator_proto_to_json(proto_type, proto_input)
+        difference = find_difference(expected, result)
+        if difference:
+            raise Exception(f'Native decoding of {proto_type} differs from configtxlator at {difference}')
+    return result
+
+
+def json_to_proto(proto_type, json_input):
+    codec = get_codec()
+    if codec == 'configtxlator' or proto_type not in SUPPORTED_TYPES:
+        return _configtxlator_json_to_proto(proto_type, json_input)
+    try:
+        result = encode_message(proto_type, json_input)
+    except UnsupportedProtoError:
+        return _configtxlator_json_to_proto(proto_type, json_input)
+    if codec == 'verify':
+
+        # Field ordering within the encoded bytes is not significant, so compare
+        # the decoded forms of the two encodings instead of the bytes.
+        expected = _configtxlator_json_to_proto(proto_type, json_input)
+        difference = find_difference(_configtxlator_proto_to_json(proto_type, expected), _configtxlator_proto_to_json(proto_type, result))
+        if difference:
+            raise Exception(f'Native encoding of {proto_type} differs from configtxlator at {difference}')
+    return result
+
+
+def get_configtxlator_server():
+
+    # Optionally, run a configtxlator server on the loopback interface that is
+    # shared by all of the module invocations on this host, so that each
+    # conversion does not have to start a new configtxlator process.
+    if os.environ.get('IBP_ANSIBLE_CONFIGTXLATOR_SERVER', 'false').lower() not in ['true', 'yes', '1']:
+        return None
+    idle_timeout = float(os.environ.get('IBP_ANSIBLE_CONFIGTXLATOR_SERVER_IDLE_TIMEOUT', 300))
+    cache = FileCache('configtxlator-server', idle_timeout)
+    if not cache.path:
+        return None
+    with cache.lock():
+        server = cache.get()
+        if server is None or not _is_configtxlator_server_running(server):
+            server = _start_configtxlator_server(cache.path, idle_timeout)
+            if server is None:
+                return None
+
+        # Every use extends the lifetime of the server.
+        cache.set(server)
+    return server
+
+
+def _is_configtxlator_server_running(server):
+    try:
+        os.kill(server['pid'], 0)
+        with socket.create_connection(('127.0.0.1', server['port']), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def _start_configtxlator_server(state_path, idle_timeout):
+
+    # Ask the operating system for a free port to listen on.
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    try:
+        process = subprocess.Popen([
+            'configtxlator', 'start', '--hostname=127.0.0.1', f'--port={port}'
+        ], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=True, start_new_session=True)
+    except OSError:
+        return None
+    server = dict(pid=process.pid, port=port)
+
+    # Wait for the server to start listening.
+    started = time.time()
+    while not _is_configtxlator_server_running(server):
+        if process.poll() is not None or time.time() - started > 10:
+            if process.poll() is None:
+                process.kill()
+            return None
+        time.sleep(0.05)
+    subprocess.Popen([
+        sys.executable, '-c', CONFIGTXLATOR_WATCHDOG, str(process.pid), state_path, str(min(idle_timeout, 5))
+    ], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=True, start_new_session=True)
+    return server
+
+
+def _configtxlator_server_request(server, path, body):
+    connection = http.client.HTTPConnection('127.0.0.1', server['port'], timeout=60)
+    try:
+        connection.request('POST', path, body=body)
+        response = connection.getresponse()
+        data = response.read()
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise Exception(f'configtxlator server request {path} failed with status {response.status}: {data.decode("utf-8", "replace")}')
+    return data
+
+
+def _configtxlator_proto_to_json(proto_type, proto_input):
+    server = get_configtxlator_server()
+    if server is not None:
+        try:
+            return json.loads(_configtxlator_server_request(server, f'/protolator/decode/{proto_type}', proto_input))
+        except (OSError, http.client.HTTPException):
+            pass
     temp_file = get_temp_file()
     try:
         subprocess.run([
@@ -25,8 +198,14 @@ def proto_to_json(proto_type, proto_input):
         os.remove(temp_file)
 
 
-def json_to_proto(proto_type, json_input):
+def _configtxlator_json_to_proto(proto_type, json_input):
     json_data = json.dumps(json_input).encode('utf-8')
+    server = get_configtxlator_server()
+    if server is not None:
+        try:
+            return _configtxlator_server_request(server, f'/protolator/encode/{proto_type}', json_data)
+        except (OSError, http.client.HTTPException):
+            pass
     temp_file = get_temp_file()
     try:
         subprocess.run([
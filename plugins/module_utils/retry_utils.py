@@ -0,0 +1,83 @@
+#!/usr/bin/python
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import email.utils
+import os
+import random
+import threading
+import time
+
+
+def parse_retry_after(retry_after):
+
+    # The Retry-After header is either a number of seconds, or a HTTP date.
+    if retry_after is None:
+        return None
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0)
+
+
+class RetryPolicy:
+
+    def __init__(self, module, base_delay=2, max_delay=30, budget=120):
+        self.module = module
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.total_retries = 0
+        self.total_slept = 0
+
+    @staticmethod
+    def from_environ(module):
+        base_delay = float(os.environ.get('IBP_ANSIBLE_RETRY_BASE_DELAY', 2))
+        max_delay = float(os.environ.get('IBP_ANSIBLE_RETRY_MAX_DELAY', 30))
+        budget = float(os.environ.get('IBP_ANSIBLE_RETRY_BUDGET', 120))
+        return RetryPolicy(module, base_delay, max_delay, budget)
+
+    def get_delay(self, attempt):
+        # Exponential backoff with full jitter, so that many processes
+        # retrying against the same server do not retry at the same time.
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def sleep(self, attempt, retry_after=None, cancelled=None):
+
+        # Each call starts with attempt 1, and the budget applies to the total
+        # time that a single call spends sleeping between its attempts. If the
+        # cancelled event is set, either before or while sleeping, then the
+        # call should not be retried.
+        if cancelled is not None and cancelled.is_set():
+            return False
+        if attempt == 1 or not hasattr(self.local, 'slept'):
+            self.local.slept = 0
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = self.get_delay(attempt)
+        remaining = self.budget - self.local.slept
+        if delay > remaining:
+            self.module.json_log({'msg': 'not retrying, retry budget exhausted', 'attempt': attempt, 'delay': delay, 'slept': self.local.slept, 'budget': self.budget})
+            return False
+        self.module.json_log({'msg': 'retrying after delay', 'attempt': attempt, 'delay': delay, 'slept': self.local.slept, 'budget': self.budget})
+        if cancelled is None:
+            time.sleep(delay)
+        elif cancelled.wait(delay):
+            self.module.json_log({'msg': 'not retrying, cancelled', 'attempt': attempt})
+            return False
+        self.local.slept += delay
+        with self.lock:
+            self.total_retries += 1
+            self.total_slept += delay
+        return True
@@ -8,7 +8,9 @@ from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
 import base64
+import concurrent.futures
 import json
+import os
 
 from .certificate_authorities import CertificateAuthority
 from .consoles import Console
@@ -28,7 +30,10 @@ def get_console(module):
     api_secret = module.params['api_secret']
     api_timeout = module.params['api_timeout']
     api_token_endpoint = module.params['api_token_endpoint']
-    console = Console(module, api_endpoint, api_timeout, api_token_endpoint)
+    pool_size = int(os.environ.get('IBP_ANSIBLE_CONSOLE_POOL_SIZE', 4))
+    pool_idle_timeout = int(os.environ.get('IBP_ANSIBLE_CONSOLE_POOL_IDLE_TIMEOUT', 30))
+    cache_ttl = int(os.environ.get('IBP_ANSIBLE_CONSOLE_CACHE_TTL', 300))
+    console = Console(module, api_endpoint, api_timeout, api_token_endpoint, pool_size=pool_size, pool_idle_timeout=pool_idle_timeout, cache_ttl=cache_ttl)
     console.login(api_authtype, api_key, api_secret)
     if console.is_v1():
         module.warn('Console only supports v1 APIs, only limited functionality will be available')
@@ -159,10 +164,13 @@ def get_peer_by_name(console, name, fail_on_missing=True):
 
 
 def get_peer_by_module(console, module, parameter_name='peer'):
+    return get_peer_by_value(console, module.params[parameter_name])
+
+
+def get_peer_by_value(console, peer):
 
     # If the peer is a dict, then we assume that
     # it contains all of the required keys/values.
-    peer = module.params[parameter_name]
     if isinstance(peer, dict):
         return Peer.from_json(peer)
 
@@ -203,6 +211,26 @@ def get_peers_by_module(console, module, parameter_name='peers'):
     return peers
 
 
+def map_concurrently(func, items, max_workers=None):
+
+    # Call the function for each item using a bounded pool of worker threads,
+    # and return a list of (result, exception) tuples in the same order as the
+    # items, so that one failure does not hide the results for the others.
+    # The caller can lower the bound for work that cannot be run in parallel.
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+    if max_workers is None:
+        max_workers = int(os.environ.get('IBP_ANSIBLE_MAX_WORKERS', 8))
+    max_workers = min(len(items), max(max_workers, 1))
+    if max_workers <= 1:
+        return [call(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(call, items))
+
+
 def get_all_peers(console):
 
     # Go over each peer.
@@ -391,10 +419,13 @@ def get_certs_from_certificate_authority(console, module):
 
 
 def get_identity_by_module(module, parameter_name='identity'):
+    return get_identity_by_value(module.params[parameter_name])
+
+
+def get_identity_by_value(identity):
 
     # If the identity is a dictionary, then we assume that
     # it contains all of the required keys/values.
-    identity = module.params[parameter_name]
     if isinstance(identity, dict):
         return EnrolledIdentity.from_json(identity)
 
@@ -7,12 +7,16 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import time
+
 from ansible.module_utils._text import to_native
 
 from ..module_utils.module import BlockchainModule
 from ..module_utils.utils import (get_console, get_identity_by_module,
+                                  get_identity_by_value,
                                   get_ordering_service_by_name,
-                                  get_peer_by_module, resolve_identity)
+                                  get_peer_by_module, get_peer_by_value,
+                                  map_concurrently, resolve_identity)
 
 ANSIBLE_METADATA = {
     'metadata_version': '1.1',
@@ -75,8 +79,8 @@ options:
               with the Fabric operations console.
             - You can also pass a dict, which must match the result format of one of the
               M(peer_info) or M(peer) modules.
+            - Required unless I(approvers) is specified.
         type: raw
-        required: true
     identity:
         description:
             - The identity to use when interacting with the peer.
@@ -84,13 +88,13 @@ options:
               identity is stored.
             - You can also pass a dict, which must match the result format of one of the
               M(enrolled_identity_info) or M(enrolled_identity) modules.
+            - Required unless I(approvers) is specified.
         type: raw
-        required: true
     msp_id:
         description:
             - The MSP ID to use for interacting with the peer.
+            - Required unless I(approvers) is specified.
         type: str
-        required: true
     hsm:
         description:
             - "The PKCS #11 compliant HSM configuration to use for digital signatures."
@@ -109,6 +113,60 @@ options:
                 description:
                     - The HSM pin that should be used for digital signatures.
                 type: str
+    approvers:
+        description:
+            - The organizations to approve the chaincode definition for, instead of I(peer),
+              I(identity), I(msp_id) and I(hsm).
+            - The approvals for all of the organizations are checked using a single query, and
+              the chaincode definition is then approved concurrently for the organizations that
+              have not already approved it. The task then waits, for up to I(api_timeout) seconds,
+              until all of the new approvals are visible.
+            - The maximum number of organizations that approve at the same time can be set using
+              the C(IBP_ANSIBLE_MAX_WORKERS) environment variable, and defaults to 8.
+        type: list
+        elements: dict
+        suboptions:
+            peer:
+                description:
+                    - The peer to use to approve the chaincode definition for this organization.
+                    - You can pass a string, which is the display name of a peer registered
+                      with the Fabric operations console.
+                    - You can also pass a dict, which must match the result format of one of the
+                      M(peer_info) or M(peer) modules.
+                type: raw
+                required: true
+            identity:
+                description:
+                    - The identity to use when interacting with the peer.
+                    - You can pass a string, which is the path to the JSON file where the enrolled
+                      identity is stored.
+                    - You can also pass a dict, which must match the result format of one of the
+                      M(enrolled_identity_info) or M(enrolled_identity) modules.
+                type: raw
+                required: true
+            msp_id:
+                description:
+                    - The MSP ID of the organization.
+                type: str
+                required: true
+            hsm:
+                description:
+                    - "The PKCS #11 compliant HSM configuration to use for digital signatures."
+                    - Only required if the identity specified in I(identity) was enrolled using an HSM.
+                type: dict
+                suboptions:
+                    pkcs11library:
+                        description:
+                            - "The PKCS #11 library that should be used for digital signatures."
+                        type: str
+                    label:
+                        description:
+                            - The HSM label that should be used for digital signatures.
+                        type: str
+                    pin:
+                        description:
+                            - The HSM pin that should be used for digital signatures.
+                        type: str
     channel:
         description:
             - The name of the channel.
@@ -220,6 +278,26 @@ EXAMPLES = '''
     version: 1.0.0
     sequence: 1
     package_id: fabcar@1.0.0:eb4bd64f7014f7d42e9d358035802242741b974e8dfcd37c59f9c21ce29d781e
+
+- name: Approve the chaincode definition on the channel for multiple organizations
+  hyperledger.fabric_ansible_collection.approved_chaincode:
+    state: present
+    api_endpoint: https://console.example.org:32000
+    api_authtype: basic
+    api_key: xxxxxxxx
+    api_secret: xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx
+    approvers:
+      - peer: Org1 Peer
+        identity: Org1 Admin.json
+        msp_id: Org1MSP
+      - peer: Org2 Peer
+        identity: Org2 Admin.json
+        msp_id: Org2MSP
+    channel: mychannel
+    name: fabcar
+    version: 1.0.0
+    sequence: 1
+    package_id: fabcar@1.0.0:eb4bd64f7014f7d42e9d358035802242741b974e8dfcd37c59f9c21ce29d781e
 '''
 
 RETURN = '''
@@ -281,9 +359,220 @@ approved_chaincode:
             description:
                 - The path to the collections configuration file for the chaincode definition.
             type: str
+approvers:
+    description:
+        - The outcome for each organization.
+    type: list
+    elements: dict
+    returned: when I(approvers) is specified
+    contains:
+        msp_id:
+            description:
+                - The MSP ID of the organization.
+            type: str
+            sample: Org1MSP
+        changed:
+            description:
+                - True if the chaincode definition was approved for the organization.
+            type: bool
+            sample: true
+        failed:
+            description:
+                - True if the chaincode definition could not be approved for the organization.
+            type: bool
+            sample: false
+        msg:
+            description:
+                - The error message, if the chaincode definition could not be approved for the organization.
+            type: str
+            returned: when I(failed) is true
 '''
 
 
+def get_approvals(module, peer_connection, chaincode):
+
+    # We have to find out if it's already approved. To do this, we have to:
+    # - Find out if a chaincode definition with the specified name, version, and sequence number exists.
+    # - If it exists, get the details of that chaincode definition.
+    # - Check that the name, version, and sequence number match and that it has been approved by this organization.
+    # - If not, check the commit readiness for the name, version, and sequence number.
+    # The approvals returned are for all of the organizations in the channel.
+    channel = chaincode['channel']
+    name = chaincode['name']
+    version = chaincode['version']
+    sequence = chaincode['sequence']
+    committed_chaincodes = peer_connection.query_committed_chaincodes(channel)
+    found = False
+    highest_sequence = 0
+
+    # search committed for any definitions that match exact name/version/sequence
+    # also note if the name matches what is the highest sequence number we get to
+    for committed_chaincode in committed_chaincodes:
+        if committed_chaincode['name'] == name:
+            module.json_log({
+                'msg': 'found name match',
+                'sequence': committed_chaincode['sequence']
+            })
+            int_sequence = int(committed_chaincode['sequence'])
+            if int_sequence > highest_sequence:
+                highest_sequence = int_sequence
+        if committed_chaincode['name'] == name and committed_chaincode[
+                'version'] == version and committed_chaincode[
+                    'sequence'] == sequence:
+            found = True
+            break
+
+    if found:
+        # there is a committed chaincode that matches the name/version/sequence so has
+        # had sufficient approvals, but it might be that this msp_id hasn't done the approval
+        # yet, which it is still permitted to do
+        committed_chaincode = peer_connection.query_committed_chaincode(
+            channel, name)
+
+        # Any organization listed in the approvals of a committed chaincode is
+        # treated as having approved it.
+        approvals = committed_chaincode.get('approvals', dict())
+        return sequence, {msp_id: True for msp_id in approvals}
+
+    # Nothing committed yet, so one of two cases. This name/version/sequence needs to be approved for this msp_id
+    # and it hasn't been yet. Or sequence number needs to be higher
+    module.json_log({
+        'msg': 'Nothing committed for this version/name/sequence',
+        'highest_sequence': highest_sequence
+    })
+
+    # optional automatic update
+    # if the highest_sequence = 0 then nothing was found in the committed
+    # so the implication is that this first time this has been approved therefore sequence ==1
+    if sequence == 0:
+        if highest_sequence == 0:
+            sequence = 1
+        else:
+            sequence = highest_sequence + 1
+
+    commit_readiness = peer_connection.check_commit_readiness(
+        channel, name, version, chaincode['package_id'], sequence,
+        chaincode['endorsement_policy_ref'], chaincode['endorsement_policy'],
+        chaincode['endorsement_plugin'], chaincode['validation_plugin'],
+        chaincode['init_required'], chaincode['collections_config'])
+    return sequence, commit_readiness
+
+
+def approve_chaincode(module, approver, chaincode, orderer):
+
+    # Approve the chaincode for the organization of the approver.
+    timeout = module.params['api_timeout']
+    with approver['peer'].connect(module, approver['identity'],
+                                  approver['msp_id'],
+                                  approver['hsm']) as peer_connection:
+        peer_connection.approve_chaincode(
+            chaincode['channel'], chaincode['name'], chaincode['version'],
+            chaincode['package_id'], chaincode['sequence'],
+            chaincode['endorsement_policy_ref'],
+            chaincode['endorsement_policy'], chaincode['endorsement_plugin'],
+            chaincode['validation_plugin'], chaincode['init_required'],
+            chaincode['collections_config'], timeout, orderer)
+
+
+def wait_for_approvals(module, approver, chaincode, msp_ids):
+
+    # Wait for the approvals to be visible in the commit readiness of the
+    # chaincode definition, using one poll loop for all of the organizations.
+    timeout = module.params['api_timeout']
+    deadline = time.time() + timeout
+    delay = 1
+    with approver['peer'].connect(module, approver['identity'],
+                                  approver['msp_id'],
+                                  approver['hsm']) as peer_connection:
+        while True:
+            _, approvals = get_approvals(module, peer_connection, chaincode)
+            pending = [
+                msp_id for msp_id in msp_ids
+                if not approvals.get(msp_id, False)
+            ]
+            remaining = deadline - time.time()
+            if not pending or remaining <= 0:
+                return pending
+            module.json_log({
+                'msg': 'waiting for approvals',
+                'pending': pending,
+                'delay': delay
+            })
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 10)
+
+
+def get_approvers(console, module):
+
+    # Get the peer, identity, and MSP ID for each organization.
+    if module.params['approvers'] is None:
+        peer = get_peer_by_module(console, module)
+        identity = get_identity_by_module(module)
+        msp_id = module.params['msp_id']
+        hsm = module.params['hsm']
+        identity = resolve_identity(console, module, identity, msp_id)
+        return [dict(peer=peer, identity=identity, msp_id=msp_id, hsm=hsm)]
+    approvers = list()
+    for approver in module.params['approvers']:
+        peer = get_peer_by_value(console, approver['peer'])
+        identity = get_identity_by_value(approver['identity'])
+        msp_id = approver['msp_id']
+        identity = resolve_identity(console, module, identity, msp_id)
+        approvers.append(
+            dict(peer=peer, identity=identity, msp_id=msp_id,
+                 hsm=approver['hsm']))
+    return approvers
+
+
+def do_approvers(module, approvers, chaincode, orderer):
+
+    # Approve the chaincode for all of the organizations that have not
+    # already approved it, concurrently, and report the outcome for each.
+    state = module.params['state']
+    with approvers[0]['peer'].connect(module, approvers[0]['identity'],
+                                      approvers[0]['msp_id'],
+                                      approvers[0]['hsm']) as peer_connection:
+        sequence, approvals = get_approvals(module, peer_connection, chaincode)
+    chaincode['sequence'] = sequence
+    results = dict()
+    pending = list()
+    for approver in approvers:
+        msp_id = approver['msp_id']
+        approval_exists = approvals.get(msp_id, False)
+        if state == 'absent' and approval_exists:
+            results[msp_id] = dict(
+                msp_id=msp_id,
+                changed=False,
+                failed=True,
+                msg=f'cannot remove approved chaincode {chaincode["name"]}@{chaincode["version"]} from channel')
+        elif state == 'absent' or approval_exists:
+            results[msp_id] = dict(msp_id=msp_id, changed=False, failed=False)
+        else:
+            pending.append(approver)
+    outcomes = map_concurrently(
+        lambda approver: approve_chaincode(module, approver, chaincode,
+                                           orderer), pending)
+    submitted = list()
+    for approver, (_, error) in zip(pending, outcomes):
+        msp_id = approver['msp_id']
+        if error is not None:
+            results[msp_id] = dict(msp_id=msp_id,
+                                   changed=False,
+                                   failed=True,
+                                   msg=to_native(error))
+        else:
+            results[msp_id] = dict(msp_id=msp_id, changed=True, failed=False)
+            submitted.append(msp_id)
+    if submitted:
+        for msp_id in wait_for_approvals(module, approvers[0], chaincode,
+                                         submitted):
+            results[msp_id].update(
+                failed=True,
+                msg=f'approval for {msp_id} was not visible before the timeout'
+            )
+    return [results[approver['msp_id']] for approver in approvers]
+
+
 def main():
 
     # Create the module.
@@ -300,9 +589,9 @@ def main():
         api_timeout=dict(type='int', default=60),
         api_token_endpoint=dict(
             type='str', default='https://iam.cloud.ibm.com/identity/token'),
-        peer=dict(type='raw', required=True),
-        identity=dict(type='raw', required=True),
-        msp_id=dict(type='str', required=True),
+        peer=dict(type='raw'),
+        identity=dict(type='raw'),
+        msp_id=dict(type='str'),
         hsm=dict(type='dict',
                  options=dict(pkcs11library=dict(type='str', required=True),
                               label=dict(type='str',
@@ -321,17 +610,40 @@ def main():
         validation_plugin=dict(type='str'),
         init_required=dict(type='bool'),
         collections_config=dict(type='str'),
-        orderer_name=dict(type='str'))
+        orderer_name=dict(type='str'),
+        approvers=dict(
+            type='list',
+            elements='dict',
+            options=dict(peer=dict(type='raw', required=True),
+                         identity=dict(type='raw', required=True),
+                         msp_id=dict(type='str', required=True),
+                         hsm=dict(type='dict',
+                                  options=dict(
+                                      pkcs11library=dict(type='str',
+                                                         required=True),
+                                      label=dict(type='str',
+                                                 required=True,
+                                                 no_log=True),
+                                      pin=dict(type='str',
+                                               required=True,
+                                               no_log=True))))))
     required_if = [('api_authtype', 'basic', ['api_secret'])]
-    mutually_exclusive = [['endorsement_policy_ref', 'endorsement_policy']]
+    required_one_of = [['peer', 'approvers'], ['identity', 'approvers'],
+                       ['msp_id', 'approvers']]
+    mutually_exclusive = [['endorsement_policy_ref', 'endorsement_policy'],
+                          ['peer', 'approvers'], ['identity', 'approvers'],
+                          ['msp_id', 'approvers'], ['hsm', 'approvers']]
     module = BlockchainModule(min_fabric_version='2.1.1',
                               argument_spec=argument_spec,
                               supports_check_mode=True,
                               required_if=required_if,
+                              required_one_of=required_one_of,
                               mutually_exclusive=mutually_exclusive)
 
     # Validate HSM requirements if HSM is specified.
-    if module.params['hsm']:
+    if module.params['hsm'] or any(
+            approver['hsm']
+            for approver in module.params['approvers'] or list()):
         module.check_for_missing_hsm_libs()
 
     # Ensure all exceptions are caught.
@@ -340,12 +652,8 @@ def main():
         # Log in to the console.
         console = get_console(module)
 
-        # Get the peer, identity, and MSP ID.
-        peer = get_peer_by_module(console, module)
-        identity = get_identity_by_module(module)
-        msp_id = module.params['msp_id']
-        hsm = module.params['hsm']
-        identity = resolve_identity(console, module, identity, msp_id)
+        # Get the peer, identity, and MSP ID for each organization.
+        approvers = get_approvers(console, module)
 
         if module.params['orderer_name']:
             orderer = get_ordering_service_by_name(
@@ -354,79 +662,44 @@ def main():
             orderer = None
 
         # Extract the chaincode information.
-        channel = module.params['channel']
-        name = module.params['name']
-        version = module.params['version']
-        package_id = module.params['package_id']
-        sequence = module.params['sequence']
-        endorsement_policy_ref = module.params['endorsement_policy_ref']
-        endorsement_policy = module.params['endorsement_policy']
-        endorsement_plugin = module.params['endorsement_plugin']
-        validation_plugin = module.params['validation_plugin']
-        init_required = module.params['init_required']
-        collections_config = module.params['collections_config']
-        timeout = module.params['api_timeout']
-
-        # We have to find out if it's already approved. To do this, we have to:
-        # - Find out if a chaincode definition with the specified name, version, and sequence number exists.
-        # - If it exists, get the details of that chaincode definition.
-        # - Check that the name, version, and sequence number match and that it has been approved by this organization.
-        # - If not, check the commit readiness for the name, version, and sequence number.
-        approval_exists = False
-        with peer.connect(module, identity, msp_id, hsm) as peer_connection:
-            committed_chaincodes = peer_connection.query_committed_chaincodes(
-                channel)
-            found = False
-            highest_sequence = 0
-
-            # search committed for any definitions that match exact name/version/sequence
-            # also note if the name matches what is the highest sequence number we get to
-            for committed_chaincode in committed_chaincodes:
-                if committed_chaincode['name'] == name:
-                    module.json_log({
-                        'msg': 'found name match',
-                        'sequence': committed_chaincode['sequence']
-                    })
-                    int_sequence = int(committed_chaincode['sequence'])
-                    if int_sequence > highest_sequence:
-                        highest_sequence = int_sequence
-                if committed_chaincode['name'] == name and committed_chaincode[
-                        'version'] == version and committed_chaincode[
-                            'sequence'] == sequence:
-                    found = True
-                    break
-
-            if found:
-                # there is a committed chaincode that matches the name/version/sequence so has
-                # had sufficient approvals, but it might be that this msp_id hasn't done the approval
-                # yet, which it is still permitted to do
-                committed_chaincode = peer_connection.query_committed_chaincode(
-                    channel, name)
-                approval_exists = msp_id in committed_chaincode.get(
-                    'approvals', dict())
-            else:
-                # Nothing committed yet, so one of two cases. This name/version/sequence needs to be approved for this msp_id
-                # and it hasn't been yet. Or sequence number needs to be higher
-                module.json_log({
-                    'msg': 'Nothing committed for this version/name/sequence',
-                    'highest_sequence': highest_sequence
-                })
-
-                # optional automatic update
-                # if the highest_sequence = 0 then nothing was found in the committed
-                # so the implication is that this first time this has been approved therefore sequence ==1
-                if sequence == 0:
-                    if highest_sequence == 0:
-                        sequence = 1
-                    else:
-                        sequence = highest_sequence + 1
-
-                commit_readiness = peer_connection.check_commit_readiness(
-                    channel, name, version, package_id, sequence,
-                    endorsement_policy_ref, endorsement_policy,
-                    endorsement_plugin, validation_plugin, init_required,
-                    collections_config)
-                approval_exists = commit_readiness.get(msp_id, False)
+        chaincode = dict(
+            channel=module.params['channel'],
+            name=module.params['name'],
+            version=module.params['version'],
+            package_id=module.params['package_id'],
+            sequence=module.params['sequence'],
+            endorsement_policy_ref=module.params['endorsement_policy_ref'],
+            endorsement_policy=module.params['endorsement_policy'],
+            endorsement_plugin=module.params['endorsement_plugin'],
+            validation_plugin=module.params['validation_plugin'],
+            init_required=module.params['init_required'],
+            collections_config=module.params['collections_config'])
+
+        # If multiple organizations were specified, approve for all of them.
+        if module.params['approvers'] is not None:
+            results = do_approvers(module, approvers, chaincode, orderer)
+            changed = any(result['changed'] for result in results)
+            failed = [result['msp_id'] for result in results if result['failed']]
+            if failed:
+                return module.fail_json(
+                    msg=f'Failed to approve chaincode for organizations: {", ".join(failed)}',
+                    changed=changed,
+                    approvers=results)
+            if module.params['state'] == 'absent':
+                return module.exit_json(changed=changed, approvers=results)
+            return module.exit_json(changed=changed,
+                                    approved_chaincode=chaincode,
+                                    approvers=results)
+
+        # Find out if it's already approved.
+        approver = approvers[0]
+        with approver['peer'].connect(module, approver['identity'],
+                                      approver['msp_id'],
+                                      approver['hsm']) as peer_connection:
+            sequence, approvals = get_approvals(module, peer_connection,
+                                                chaincode)
+        chaincode['sequence'] = sequence
+        approval_exists = approvals.get(approver['msp_id'], False)
 
         # Handle the cases when the approval should be absent.
         state = module.params['state']
@@ -435,7 +708,7 @@ def main():
             # The chaincode should not be approved, but it is.
             # We can't remove it, so throw an exception.
             raise Exception(
-                f'cannot remove approved chaincode {name}@{version} from channel'
+                f'cannot remove approved chaincode {chaincode["name"]}@{chaincode["version"]} from channel'
             )
 
         elif state == 'absent':
@@ -448,30 +721,11 @@ def main():
         if not approval_exists:
 
             # Approve the chaincode.
-            with peer.connect(module, identity, msp_id,
-                              hsm) as peer_connection:
-                peer_connection.approve_chaincode(
-                    channel, name, version, package_id, sequence,
-                    endorsement_policy_ref, endorsement_policy,
-                    endorsement_plugin, validation_plugin, init_required,
-                    collections_config, timeout, orderer)
-                changed = True
+            approve_chaincode(module, approver, chaincode, orderer)
+            changed = True
 
         # Return the approved chaincode.
-        return module.exit_json(
-            changed=changed,
-            approved_chaincode=dict(
-                channel=channel,
-                name=name,
-                version=version,
-                package_id=package_id,
-                sequence=sequence,
-                endorsement_policy_ref=endorsement_policy_ref,
-                endorsement_policy=endorsement_policy,
-                endorsement_plugin=endorsement_plugin,
-                validation_plugin=validation_plugin,
-                init_required=init_required,
-                collections_config=collections_config))
+        return module.exit_json(changed=changed, approved_chaincode=chaincode)
 
     # Notify Ansible of the exception.
     except Exception as e:
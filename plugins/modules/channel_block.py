@@ -7,19 +7,24 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import json
 import os
 import shutil
+import struct
+import tempfile
 
 from ansible.module_utils._text import to_native
 from ansible.module_utils.basic import _load_params, env_fallback
 
 from ..module_utils.file_utils import equal_files, get_temp_file
 from ..module_utils.module import BlockchainModule
+from ..module_utils.orderer_clients import get_block_number
 from ..module_utils.ordering_services import OrderingService
+from ..module_utils.proto_utils import proto_to_json
 from ..module_utils.utils import (get_console, get_identity_by_module,
                                   get_ordering_service_by_module,
                                   get_ordering_service_nodes_by_module,
-                                  resolve_identity)
+                                  map_concurrently, resolve_identity)
 
 ANSIBLE_METADATA = {'metadata_version': '1.1',
                     'status': ['preview'],
@@ -134,12 +139,56 @@ options:
         description:
             - The target block to fetch.
             - Can be the number of the block to fetch, or one of C(newest), C(oldest) or C(config).
+            - Cannot be specified with I(start) or I(end).
         type: str
-        required: true
+    start:
+        description:
+            - The number of the first block in a range of blocks to fetch.
+            - When a range of blocks is fetched, the blocks are streamed from the ordering service
+              using a single request, and are stored according to I(format).
+            - Cannot be specified with I(target).
+        type: int
+    end:
+        description:
+            - The number of the last block in a range of blocks to fetch.
+            - If not specified, all blocks up to and including the newest block are fetched.
+            - Only used when I(start) is specified.
+        type: int
+    format:
+        description:
+            - How a range of blocks is stored at I(path).
+            - C(directory) - Each block is stored in the directory I(path), in a file named after
+              the number of the block, for example C(5.block).
+            - C(archive) - The blocks are appended to the file I(path) in order, each one preceded
+              by its length in bytes as an 8 byte big-endian unsigned integer.
+            - Only used when I(start) is specified.
+        type: str
+        default: directory
+        choices:
+            - directory
+            - archive
+    decode:
+        description:
+            - True if each block in a range of blocks should also be decoded to JSON, and stored
+              in the directory I(path) in a file named after the number of the block, for example
+              C(5.json).
+            - The blocks are decoded concurrently, and the maximum number of blocks that are decoded
+              at the same time can be set using the C(IBP_ANSIBLE_MAX_WORKERS) environment variable.
+            - Only used when I(start) is specified and I(format) is C(directory).
+        type: bool
+        default: false
+    resume:
+        description:
+            - True if a range of blocks should resume from the last block already stored at I(path),
+              false if all of the blocks in the range should be fetched again.
+            - Only used when I(start) is specified.
+        type: bool
+        default: true
     path:
         description:
-            - The path to the file where the channel configuration or the channel configuration
-              update transaction will be stored.
+            - The path to the file where the block will be stored.
+            - When a range of blocks is fetched, the path to the directory or archive file where
+              the blocks will be stored.
         type: str
         required: true
     tls_handshake_time_shift:
@@ -166,6 +215,22 @@ EXAMPLES = '''
     name: mychannel
     target: "0"
     path: channel_genesis_block.bin
+
+- name: Fetch and decode the first 100 blocks for the channel
+  hyperledger.fabric_ansible_collection.channel_block:
+    state: present
+    api_endpoint: https://console.example.org:32000
+    api_authtype: basic
+    api_key: xxxxxxxx
+    api_secret: xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx
+    ordering_service: Ordering Service
+    identity: Org1 Admin.json
+    msp_id: Org1MSP
+    name: mychannel
+    start: 0
+    end: 99
+    decode: true
+    path: mychannel_blocks
 '''
 
 RETURN = '''
@@ -175,9 +240,132 @@ path:
         - The path to the file where the channel block is stored.
     type: str
     returned: always
+blocks:
+    description:
+        - The number of blocks that were fetched.
+    type: int
+    returned: when I(start) is specified
+last_block:
+    description:
+        - The number of the last block stored at I(path), or null if no blocks are stored.
+    type: int
+    returned: when I(start) is specified
 '''
 
 
+def write_file_atomic(path, data):
+    (fd, temp_path) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+def get_directory_blocks(path):
+    numbers = set()
+    for entry in os.listdir(path):
+        (number, ext) = os.path.splitext(entry)
+        if ext == '.block' and number.isdigit():
+            numbers.add(int(number))
+    return numbers
+
+
+def decode_block(path, number):
+    with open(os.path.join(path, f'{number}.block'), 'rb') as file:
+        block = proto_to_json('common.Block', file.read())
+    write_file_atomic(os.path.join(path, f'{number}.json'), json.dumps(block, indent=4).encode('utf-8'))
+
+
+def scan_archive(path):
+
+    # Return the numbers of the first and last complete blocks in the archive,
+    # and the length of the archive up to the end of the last complete block.
+    first = last = None
+    valid_length = 0
+    with open(path, 'rb') as file:
+        while True:
+            header = file.read(8)
+            if len(header) < 8:
+                break
+            (length,) = struct.unpack('>Q', header)
+            block = file.read(length)
+            if len(block) < length:
+                break
+            number = get_block_number(block)
+            if first is None:
+                first = number
+            last = number
+            valid_length = file.tell()
+    return (first, last, valid_length)
+
+
+def fetch_directory(module, connection, name, path, start, end):
+
+    # Work out where to start from, skipping the blocks that are already stored.
+    os.makedirs(path, exist_ok=True)
+    stored = get_directory_blocks(path)
+    next_number = start
+    if module.params['resume']:
+        while next_number in stored and (end is None or next_number <= end):
+            next_number += 1
+    written = list()
+
+    def write_block(number, block):
+        write_file_atomic(os.path.join(path, f'{number}.block'), block)
+        written.append(number)
+    if end is None or next_number <= end:
+        connection.fetch_blocks(name, next_number, end, write_block)
+    stored.update(written)
+    if end is None:
+        end = max(written, default=next_number - 1)
+    in_range = [number for number in sorted(stored) if start <= number <= end]
+
+    # Decode the blocks that were fetched, and any blocks that have not already been decoded.
+    decoded = list()
+    if module.params['decode']:
+        decoded = [
+            number for number in in_range
+            if number in written or not os.path.exists(os.path.join(path, f'{number}.json'))
+        ]
+        results = map_concurrently(lambda number: decode_block(path, number), decoded)
+        for (number, (_, error)) in zip(decoded, results):
+            if error is not None:
+                raise Exception(f'Failed to decode block {number}: {to_native(error)}')
+    last_block = in_range[-1] if in_range else None
+    return (written, len(decoded) > 0, last_block)
+
+
+def fetch_archive(module, connection, name, path, start, end):
+
+    # Work out where to start from, discarding any partially written block.
+    next_number = start
+    valid_length = 0
+    last_block = None
+    if module.params['resume'] and os.path.exists(path):
+        (first, last_block, valid_length) = scan_archive(path)
+        if first is not None and first != start:
+            raise Exception(f'Cannot resume archive {path}, which starts at block {first} instead of block {start}')
+        if last_block is not None:
+            next_number = last_block + 1
+    written = list()
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as file:
+        file.truncate(valid_length)
+        file.seek(valid_length)
+
+        def write_block(number, block):
+            file.write(struct.pack('>Q', len(block)))
+            file.write(block)
+            written.append(number)
+        if end is None or next_number <= end:
+            connection.fetch_blocks(name, next_number, end, write_block)
+    if written:
+        last_block = written[-1]
+    return (written, False, last_block)
+
+
 def main():
 
     # Create the module.
@@ -202,11 +390,21 @@ def main():
         )),
         name=dict(type='str'),
         path=dict(type='str', required=True),
-        target=dict(type='str')
+        target=dict(type='str'),
+        start=dict(type='int'),
+        end=dict(type='int'),
+        format=dict(type='str', default='directory', choices=['directory', 'archive']),
+        decode=dict(type='bool', default=False),
+        resume=dict(type='bool', default=True)
     )
     required_if = [
         ('api_authtype', 'basic', ['api_secret']),
-        ('state', 'present', ['identity', 'msp_id', 'name', 'target']),
+        ('state', 'present', ['identity', 'msp_id', 'name']),
+        ('state', 'present', ['target', 'start'], True),
+    ]
+    mutually_exclusive = [
+        ['target', 'start'],
+        ['target', 'end']
     ]
     # Ansible doesn't allow us to say "require one of X and Y only if condition A is true",
     # so we need to handle this ourselves by seeing what was passed in.
@@ -217,7 +415,7 @@ def main():
         ]
     else:
         required_one_of = []
-    module = BlockchainModule(argument_spec=argument_spec, supports_check_mode=True, required_if=required_if, required_one_of=required_one_of)
+    module = BlockchainModule(argument_spec=argument_spec, supports_check_mode=True, required_if=required_if, required_one_of=required_one_of, mutually_exclusive=mutually_exclusive)
 
     # Validate HSM requirements if HSM is specified.
     if module.params['hsm']:
@@ -258,6 +456,21 @@ def main():
         name = module.params['name']
         target = module.params['target']
 
+        # Handle fetching a range of blocks.
+        start = module.params['start']
+        if start is not None:
+            end = module.params['end']
+            if end is not None and end < start:
+                raise Exception(f'The end block {end} is before the start block {start}')
+            if module.params['format'] == 'archive' and module.params['decode']:
+                raise Exception('Blocks can only be decoded when format is directory')
+            with ordering_service.connect(module, identity, msp_id, hsm, tls_handshake_time_shift) as connection:
+                if module.params['format'] == 'directory':
+                    (written, decoded, last_block) = fetch_directory(module, connection, name, path, start, end)
+                else:
+                    (written, decoded, last_block) = fetch_archive(module, connection, name, path, start, end)
+            return module.exit_json(changed=len(written) > 0 or decoded, path=path, blocks=len(written), last_block=last_block)
+
         # Create a temporary file to hold the block.
         block_proto_path = get_temp_file()
         try:
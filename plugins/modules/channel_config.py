@@ -9,7 +9,6 @@ __metaclass__ = type
 
 import json
 import os
-import shutil
 import subprocess
 import urllib.parse
 from subprocess import CalledProcessError
@@ -19,13 +18,17 @@ from ansible.module_utils.basic import _load_params, env_fallback
 
 from pathlib import Path
 
+from ..module_utils.cache_utils import release_directory
+from ..module_utils.channel_utils import compute_config_update
 from ..module_utils.dict_utils import diff_dicts
-from ..module_utils.fabric_utils import get_fabric_cfg_path
+from ..module_utils.fabric_utils import get_shared_fabric_cfg_path
 from ..module_utils.file_utils import get_temp_file
 from ..module_utils.module import BlockchainModule
-from ..module_utils.msp_utils import convert_identity_to_msp_path
+from ..module_utils.msp_utils import get_msp_path
 from ..module_utils.ordering_services import OrderingService
-from ..module_utils.proto_utils import json_to_proto, proto_to_json
+from ..module_utils.proto_codec import UnsupportedProtoError, decode_message
+from ..module_utils.proto_utils import (find_difference, get_codec,
+                                        json_to_proto, proto_to_json)
 from ..module_utils.utils import (get_console, get_identity_by_module,
                                   get_ordering_service_by_module,
                                   get_ordering_service_nodes_by_module,
@@ -647,13 +650,7 @@ def fetch(module):
         os.remove(block_proto_path)
 
 
-def compute_update(module):
-
-    # Get the channel and target path.
-    name = module.params['name']
-    path = module.params['path']
-    original = module.params['original']
-    updated = module.params['updated']
+def compute_update_with_configtxlator(name, original, updated):
 
     # Create a temporary file to hold the block.
     config_update_proto_path = get_temp_file()
@@ -666,54 +663,86 @@ def compute_update(module):
             ], text=True, close_fds=True, check=True, capture_output=True)
         except CalledProcessError as e:
             if e.stderr.find('no differences detected') != -1:
-                if os.path.exists(path):
-                    os.remove(path)
-                    return module.exit_json(changed=True, path=None)
-                else:
-                    return module.exit_json(changed=False, path=None)
+                return None
             raise
 
         # Convert it into JSON.
         with open(config_update_proto_path, 'rb') as file:
-            config_update_json = proto_to_json('common.ConfigUpdate', file.read())
-
-        # Build the config envelope.
-        config_update_envelope_json = dict(
-            payload=dict(
-                header=dict(
-                    channel_header=dict(
-                        channel_id=name,
-                        type=2
-                    )
-                ),
-                data=dict(
-                    config_update=config_update_json
+            return proto_to_json('common.ConfigUpdate', file.read())
+
+    # Ensure the temporary file is cleaned up.
+    finally:
+        os.remove(config_update_proto_path)
+
+
+def compute_update(module):
+
+    # Get the channel and target path.
+    name = module.params['name']
+    path = module.params['path']
+    original = module.params['original']
+    updated = module.params['updated']
+
+    # Compute the update in process if the native codec has been enabled, unless
+    # the configurations contain something that the native codec does not support.
+    codec = get_codec()
+    native = codec in ['native', 'verify']
+    if native:
+        try:
+            with open(original, 'rb') as file:
+                original_config_json = decode_message('common.Config', file.read())
+            with open(updated, 'rb') as file:
+                updated_config_json = decode_message('common.Config', file.read())
+            config_update_json = compute_config_update(name, original_config_json, updated_config_json)
+        except UnsupportedProtoError:
+            native = False
+    if not native:
+        config_update_json = compute_update_with_configtxlator(name, original, updated)
+    elif codec == 'verify':
+        expected = compute_update_with_configtxlator(name, original, updated)
+        difference = find_difference(expected, config_update_json)
+        if difference:
+            raise Exception(f'Native computation of the config update differs from configtxlator at {difference}')
+    if config_update_json is None:
+        if os.path.exists(path):
+            os.remove(path)
+            return module.exit_json(changed=True, path=None)
+        else:
+            return module.exit_json(changed=False, path=None)
+
+    # Build the config envelope.
+    config_update_envelope_json = dict(
+        payload=dict(
+            header=dict(
+                channel_header=dict(
+                    channel_id=name,
+                    type=2
                 )
+            ),
+            data=dict(
+                config_update=config_update_json
             )
         )
-        config_update_envelope_proto = json_to_proto('common.Envelope', config_update_envelope_json)
+    )
+    config_update_envelope_proto = json_to_proto('common.Envelope', config_update_envelope_json)
 
-        # Compare and copy if needed.
-        if os.path.exists(path):
-            changed = False
-            try:
-                with open(path, 'rb') as file:
-                    original_config_update_envelope_json = proto_to_json('common.Envelope', file.read())
-                changed = diff_dicts(original_config_update_envelope_json, config_update_envelope_json)
-            except Exception:
-                changed = True
-            if changed:
-                with open(path, 'wb') as file:
-                    file.write(config_update_envelope_proto)
-            module.exit_json(changed=changed, path=path)
-        else:
+    # Compare and copy if needed.
+    if os.path.exists(path):
+        changed = False
+        try:
+            with open(path, 'rb') as file:
+                original_config_update_envelope_json = proto_to_json('common.Envelope', file.read())
+            changed = diff_dicts(original_config_update_envelope_json, config_update_envelope_json)
+        except Exception:
+            changed = True
+        if changed:
             with open(path, 'wb') as file:
                 file.write(config_update_envelope_proto)
-            module.exit_json(changed=True, path=path)
-
-    # Ensure the temporary file is cleaned up.
-    finally:
-        os.remove(config_update_proto_path)
+        module.exit_json(changed=changed, path=path)
+    else:
+        with open(path, 'wb') as file:
+            file.write(config_update_envelope_proto)
+        module.exit_json(changed=True, path=path)
 
 
 def sign_update(module):
@@ -739,8 +768,8 @@ def sign_update(module):
             return module.exit_json(changed=False, path=path)
 
     # Need to sign it.
-    msp_path = convert_identity_to_msp_path(identity)
-    fabric_cfg_path = get_fabric_cfg_path()
+    (msp_path, msp_lock) = get_msp_path(identity)
+    (fabric_cfg_path, fabric_cfg_lock) = get_shared_fabric_cfg_path()
     try:
         env = os.environ.copy()
         env['CORE_PEER_MSPCONFIGPATH'] = msp_path
@@ -759,8 +788,8 @@ def sign_update(module):
         ], env=env, text=True, close_fds=True, check=True, capture_output=True)
         module.exit_json(changed=True, path=path)
     finally:
-        shutil.rmtree(msp_path)
-        shutil.rmtree(fabric_cfg_path)
+        release_directory(msp_path, msp_lock)
+        release_directory(fabric_cfg_path, fabric_cfg_lock)
 
 
 def sign_update_organizations(module):
@@ -792,7 +821,7 @@ def sign_update_organizations(module):
 
         # Need to sign it.
         msp_path = os.path.join(organizations_dir, msp_id, "msp")
-        fabric_cfg_path = get_fabric_cfg_path()
+        (fabric_cfg_path, fabric_cfg_lock) = get_shared_fabric_cfg_path()
 
         module.json_log({
             'msg': 'Adding signature to change',
@@ -819,7 +848,7 @@ def sign_update_organizations(module):
             ], env=env, text=True, close_fds=True, check=True, capture_output=True)
 
         finally:
-            shutil.rmtree(fabric_cfg_path)
+            release_directory(fabric_cfg_path, fabric_cfg_lock)
 
     module.exit_json(changed=True, path=path)
 
@@ -7,19 +7,21 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import contextlib
 import json
 import os
 import os.path
 from datetime import datetime
 
 from ansible.module_utils._text import to_native
+from ansible.module_utils.basic import _load_params
 
 from ..module_utils.certificate_authorities import \
     CertificateAuthorityException
 from ..module_utils.enrolled_identities import EnrolledIdentity
 from ..module_utils.module import BlockchainModule
 from ..module_utils.utils import (get_certificate_authority_by_module,
-                                  get_console)
+                                  get_console, map_concurrently)
 
 try:
     from cryptography import x509
@@ -108,7 +110,8 @@ options:
     path:
         description:
             - The path to the JSON file where the enrolled identity will be stored.
-        required: true
+            - Required unless I(identities) is specified.
+        type: str
     hsm:
         description:
             - "The PKCS #11 compliant HSM configuration to use for generating and storing the private key."
@@ -138,6 +141,43 @@ options:
             - Can only be specified when enrolling the identity against the TLS certificate authority.
         type: list
         elements: str
+    identities:
+        description:
+            - The identities to enroll, re-enroll, or delete, instead of I(name), I(enrollment_id),
+              I(enrollment_secret), I(path) and I(hosts).
+            - All of the identities are handled according to I(state), I(tls), I(force_reenroll) and
+              I(reenroll_before_expiry) using a single connection to the certificate authority.
+            - The maximum number of identities that are handled at the same time can be set using
+              the C(IBP_ANSIBLE_MAX_WORKERS) environment variable, and defaults to 8.
+        type: list
+        elements: dict
+        suboptions:
+            name:
+                description:
+                    - The name of the enrolled identity.
+                    - Only required when I(state) is C(present).
+                type: str
+            enrollment_id:
+                description:
+                    - The enrollment ID, or user name, of an identity registered on the certificate authority.
+                    - Only required when I(state) is C(present).
+                type: str
+            enrollment_secret:
+                description:
+                    - The enrollment secret, or password, of an identity registered on the certificate authority.
+                    - Only required when I(state) is C(present).
+                type: str
+            path:
+                description:
+                    - The path to the JSON file where the enrolled identity will be stored.
+                type: str
+                required: true
+            hosts:
+                description:
+                    - The list of host names to add to the certificate as X.509 Subject Alternative Names.
+                    - Can only be specified when enrolling the identity against the TLS certificate authority.
+                type: list
+                elements: str
     force_reenroll:
         description:
             - True if the identity should be re-enrolled, false otherwise.
@@ -170,6 +210,24 @@ EXAMPLES = '''
     enrollment_secret: org1adminpw
     path: Org1 Admin.json
 
+- name: Enroll many identities
+  hyperledger.fabric_ansible_collection.enrolled_identity:
+    state: present
+    api_endpoint: https://console.example.org:32000
+    api_authtype: basic
+    api_key: xxxxxxxx
+    api_secret: xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx
+    certificate_authority: Org1 CA
+    identities:
+      - name: Org1 App 1
+        enrollment_id: org1app1
+        enrollment_secret: org1app1pw
+        path: Org1 App 1.json
+      - name: Org1 App 2
+        enrollment_id: org1app2
+        enrollment_secret: org1app2pw
+        path: Org1 App 2.json
+
 - name: Remove an enrolled identity
   hyperledger.fabric_ansible_collection.enrolled_identity:
     state: absent
@@ -208,9 +266,140 @@ enrolled_identity:
                 - The base64 encoded CA certificate chain of the enrolled identity.
             type: str
             sample: LS0tLS1CRUdJTiBDRVJUSUZJQ0FURS0t...
+enrolled_identities:
+    description:
+        - The outcome for each identity.
+    type: list
+    elements: dict
+    returned: when I(identities) is specified
+    contains:
+        path:
+            description:
+                - The path to the JSON file where the enrolled identity is stored.
+            type: str
+            sample: Org1 App 1.json
+        changed:
+            description:
+                - True if the identity was enrolled, re-enrolled, or deleted.
+            type: bool
+            sample: true
+        failed:
+            description:
+                - True if the identity could not be enrolled, re-enrolled, or deleted.
+            type: bool
+            sample: false
+        msg:
+            description:
+                - The error message, if the identity could not be enrolled, re-enrolled, or deleted.
+            type: str
+            returned: when I(failed) is true
+        enrolled_identity:
+            description:
+                - The enrolled identity, in the same format as I(enrolled_identity).
+            type: dict
+            returned: when I(state) is C(present) and I(failed) is false
 '''
 
 
+def get_expected_enrollment(params):
+
+    # The options for a single identity are the same, whether they are passed
+    # as module options or as an item in the list of identities.
+    return dict(
+        name=params['name'],
+        enrollment_id=params['enrollment_id'],
+        enrollment_secret=params['enrollment_secret'],
+        path=params['path'],
+        hosts=params['hosts']
+    )
+
+
+def do_enrollment(module, connection, state, enrollment):
+
+    # Determine if the identity exists.
+    path = enrollment['path']
+    path_exists = os.path.isfile(path)
+
+    # Handle appropriately based on state.
+    if state == 'present' and not path_exists:
+
+        # Enroll the identity.
+        name = enrollment['name']
+        enrollment_id = enrollment['enrollment_id']
+        enrollment_secret = enrollment['enrollment_secret']
+        hosts = enrollment['hosts']
+        identity = connection.enroll(name, enrollment_id, enrollment_secret, hosts)
+        with open(path, 'w') as file:
+            json.dump(identity.to_json(), file, indent=4)
+        return True, identity.to_json()
+
+    elif state == 'present' and path_exists:
+
+        # Load the identity.
+        with open(path, 'r') as file:
+            identity = EnrolledIdentity.from_json(json.load(file))
+
+        # Update it.
+        name = enrollment['name']
+        new_identity = identity.clone()
+        new_identity.name = name
+
+        # The certificate may no longer be valid (revoked, expired, new certificate authority).
+        # If this is the case, we want to try re-enrolling it.
+
+        # Determine if the certificate is valid.
+        enrollment_id = enrollment['enrollment_id']
+        certificate_valid = False
+        try:
+            connection.get_certificates(new_identity, enrollment_id)
+            certificate_valid = True
+        except CertificateAuthorityException as e:
+            if e.code == 71:
+                # This means that the user is authenticated (certificate is valid), but the user is not authorized to get certificates.
+                certificate_valid = True
+            elif e.code == 20:
+                # This means that the user is not authenticated (certificate is invalid).
+                pass
+            else:
+                # This is some other problem that we should not ignore.
+                raise
+
+        # Are we going to re-enroll the certificate?
+        reenroll_required = not certificate_valid
+        force_reenroll = module.params['force_reenroll']
+        if force_reenroll:
+            reenroll_required = True
+        reenroll_before_expiry = module.params['reenroll_before_expiry']
+        if reenroll_before_expiry > -1:
+            certificate = x509.load_pem_x509_certificate(new_identity.cert, default_backend())
+            remaining_period_delta = certificate.not_valid_after - datetime.utcnow()
+            remaining_period_secs = remaining_period_delta.total_seconds()
+            if remaining_period_secs < reenroll_before_expiry:
+                reenroll_required = True
+
+        # If we need to re-enroll the certificate, do it now.
+        if reenroll_required:
+            new_identity = connection.reenroll(name, identity)
+
+        # Check if it has changed.
+        changed = not new_identity.equals(identity)
+        if changed:
+            with open(path, 'w') as file:
+                json.dump(new_identity.to_json(), file, indent=4)
+        return changed, new_identity.to_json()
+
+    elif state == 'absent' and path_exists:
+
+        # The enrolled identity should not exist, so delete it.
+        os.remove(path)
+        return True, None
+
+    else:
+
+        # The enrolled identity should not exist and doesn't.
+        return False, None
+
+
 def main():
 
     # Create the module.
@@ -226,7 +415,7 @@ def main():
         name=dict(type='str'),
         enrollment_id=dict(type='str'),
         enrollment_secret=dict(type='str', no_log=True),
-        path=dict(type='str', required=True),
+        path=dict(type='str'),
         hsm=dict(type='dict', options=dict(
             pkcs11library=dict(type='str', required=True),
             label=dict(type='str', required=True, no_log=True),
@@ -234,25 +423,71 @@ def main():
         )),
         tls=dict(type='bool', default=False),
         hosts=dict(type='list', elements='str'),
+        identities=dict(type='list', elements='dict', options=dict(
+            name=dict(type='str'),
+            enrollment_id=dict(type='str'),
+            enrollment_secret=dict(type='str', no_log=True),
+            path=dict(type='str', required=True),
+            hosts=dict(type='list', elements='str')
+        )),
         force_reenroll=dict(type='bool', default=False),
         reenroll_before_expiry=dict(type='int', default=-1)
     )
-    required_if = [
-        ('api_authtype', 'basic', ['api_secret']),
-        ('state', 'present', ['certificate_authority', 'name', 'enrollment_id', 'enrollment_secret'])
+    # Ansible doesn't allow us to say "require X only if condition A is true" for
+    # each item in a list, so we need to handle this ourselves by seeing what was passed in.
+    actual_params = _load_params()
+    if actual_params.get('identities') is None:
+        required_if = [
+            ('api_authtype', 'basic', ['api_secret']),
+            ('state', 'present', ['certificate_authority', 'name', 'enrollment_id', 'enrollment_secret'])
+        ]
+    else:
+        required_if = [
+            ('api_authtype', 'basic', ['api_secret']),
+            ('state', 'present', ['certificate_authority'])
+        ]
+    required_one_of = [
+        ['path', 'identities']
+    ]
+    mutually_exclusive = [
+        ['path', 'identities'],
+        ['name', 'identities'],
+        ['enrollment_id', 'identities'],
+        ['enrollment_secret', 'identities'],
+        ['hosts', 'identities']
     ]
-    module = BlockchainModule(argument_spec=argument_spec, supports_check_mode=True, required_if=required_if)
+    module = BlockchainModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+        required_if=required_if,
+        required_one_of=required_one_of,
+        mutually_exclusive=mutually_exclusive)
 
     # Validate HSM requirements if HSM is specified.
     hsm = module.params['hsm']
     if hsm:
         module.check_for_missing_hsm_libs()
 
+    # Get the identities to handle.
+    identities = module.params['identities']
+    if identities is None:
+        enrollments = [get_expected_enrollment(module.params)]
+    else:
+        enrollments = [get_expected_enrollment(identity) for identity in identities]
+
+    # Validate each identity when enrolling a list of identities.
+    state = module.params['state']
+    if identities is not None and state == 'present':
+        for enrollment in enrollments:
+            missing = [key for key in ['name', 'enrollment_id', 'enrollment_secret'] if not enrollment[key]]
+            if missing:
+                module.fail_json(msg=f'state is present but all of the following are missing for identity {enrollment["path"]}: {", ".join(missing)}')
+
     # Reject HSM + TLS, or hosts without TLS.
     tls = module.params['tls']
     if hsm and tls:
         raise Exception('Cannot specify HSM configuration and enroll against TLS certificate authority')
-    hosts = module.params['hosts']
+    hosts = any(enrollment['hosts'] for enrollment in enrollments)
     if hosts and not tls:
         raise Exception('Can only specify hosts when enrolling against TLS certificate authority')
 
@@ -262,93 +497,43 @@ def main():
         # Log in to the console.
         console = get_console(module)
 
-        # Determine if the identity exists.
-        path = module.params['path']
-        path_exists = os.path.isfile(path)
-
-        # Handle appropriately based on state.
-        state = module.params['state']
-        if state == 'present' and not path_exists:
-
-            # Enroll the identity.
+        # Connect to the certificate authority, which is only required if the
+        # identities should be enrolled. The same connection is used for all of them.
+        if state == 'present':
             certificate_authority = get_certificate_authority_by_module(console, module)
-            name = module.params['name']
-            enrollment_id = module.params['enrollment_id']
-            enrollment_secret = module.params['enrollment_secret']
-            with certificate_authority.connect(module, hsm, tls) as connection:
-                identity = connection.enroll(name, enrollment_id, enrollment_secret, hosts)
-            with open(path, 'w') as file:
-                json.dump(identity.to_json(), file, indent=4)
-            module.exit_json(changed=True, enrolled_identity=identity.to_json())
-
-        elif state == 'present' and path_exists:
-
-            # Load the identity.
-            with open(path, 'r') as file:
-                identity = EnrolledIdentity.from_json(json.load(file))
-
-            # Update it.
-            name = module.params['name']
-            new_identity = identity.clone()
-            new_identity.name = name
-
-            # The certificate may no longer be valid (revoked, expired, new certificate authority).
-            # If this is the case, we want to try re-enrolling it.
-            certificate_authority = get_certificate_authority_by_module(console, module)
-            with certificate_authority.connect(module, hsm, tls) as connection:
-
-                # Determine if the certificate is valid.
-                enrollment_id = module.params['enrollment_id']
-                enrollment_secret = module.params['enrollment_secret']
-                certificate_valid = False
-                try:
-                    connection.get_certificates(new_identity, enrollment_id)
-                    certificate_valid = True
-                except CertificateAuthorityException as e:
-                    if e.code == 71:
-                        # This means that the user is authenticated (certificate is valid), but the user is not authorized to get certificates.
-                        certificate_valid = True
-                    elif e.code == 20:
-                        # This means that the user is not authenticated (certificate is invalid).
-                        pass
-                    else:
-                        # This is some other problem that we should not ignore.
-                        raise
-
-                # Are we going to re-enroll the certificate?
-                reenroll_required = not certificate_valid
-                force_reenroll = module.params['force_reenroll']
-                if force_reenroll:
-                    reenroll_required = True
-                reenroll_before_expiry = module.params['reenroll_before_expiry']
-                if reenroll_before_expiry > -1:
-                    certificate = x509.load_pem_x509_certificate(new_identity.cert, default_backend())
-                    remaining_period_delta = certificate.not_valid_after - datetime.utcnow()
-                    remaining_period_secs = remaining_period_delta.total_seconds()
-                    if remaining_period_secs < reenroll_before_expiry:
-                        reenroll_required = True
-
-                # If we need to re-enroll the certificate, do it now.
-                if reenroll_required:
-                    new_identity = connection.reenroll(name, identity)
-
-            # Check if it has changed.
-            changed = not new_identity.equals(identity)
-            if changed:
-                with open(path, 'w') as file:
-                    json.dump(new_identity.to_json(), file, indent=4)
-            module.exit_json(changed=changed, enrolled_identity=new_identity.to_json())
-
-        elif state == 'absent' and path_exists:
-
-            # The enrolled identity should not exist, so delete it.
-            os.remove(path)
-            module.exit_json(changed=True)
-
+            connect = certificate_authority.connect(module, hsm, tls)
         else:
-
-            # The enrolled identity should not exist and doesn't.
-            module.exit_json(changed=False)
+            connect = contextlib.nullcontext()
+        with connect as connection:
+
+            # If only one identity was specified, handle it as before.
+            if identities is None:
+                changed, enrolled_identity = do_enrollment(module, connection, state, enrollments[0])
+                if enrolled_identity is None:
+                    return module.exit_json(changed=changed)
+                return module.exit_json(changed=changed, enrolled_identity=enrolled_identity)
+
+            # Otherwise, handle all of the identities concurrently over the same connection.
+            results = map_concurrently(lambda enrollment: do_enrollment(module, connection, state, enrollment), enrollments)
+
+        # Build the outcome for each identity.
+        enrolled_identities = list()
+        failed = list()
+        for enrollment, (result, error) in zip(enrollments, results):
+            path = enrollment['path']
+            if error is not None:
+                failed.append(path)
+                enrolled_identities.append(dict(path=path, changed=False, failed=True, msg=to_native(error)))
+                continue
+            changed, enrolled_identity = result
+            outcome = dict(path=path, changed=changed, failed=False)
+            if enrolled_identity is not None:
+                outcome['enrolled_identity'] = enrolled_identity
+            enrolled_identities.append(outcome)
+        changed = any(outcome['changed'] for outcome in enrolled_identities)
+        if failed:
+            return module.fail_json(msg=f'Failed to manage enrolled identities: {", ".join(failed)}', changed=changed, enrolled_identities=enrolled_identities)
+        module.exit_json(changed=changed, enrolled_identities=enrolled_identities)
 
     # Notify Ansible of the exception.
     except Exception as e:
@@ -7,18 +7,21 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
-import base64
 import hashlib
 import json
+import os
 import tarfile
 
 from ansible.module_utils._text import to_native
 from ansible.module_utils.basic import _load_params
 
 from ..module_utils.module import BlockchainModule
-from ..module_utils.proto_utils import proto_to_json
+from ..module_utils.file_utils import hash_stream, memoize_file, sha256_file
+from ..module_utils.proto_codec import (WIRE_LENGTH_DELIMITED, WIRE_VARINT,
+                                        decode_message, read_stream_varint)
 from ..module_utils.utils import (get_console, get_identity_by_module,
-                                  get_peer_by_module, resolve_identity)
+                                  get_peer_by_module, get_peers_by_module,
+                                  map_concurrently, resolve_identity)
 
 ANSIBLE_METADATA = {'metadata_version': '1.1',
                     'status': ['preview'],
@@ -81,8 +84,22 @@ options:
               with the Fabric operations console.
             - You can also pass a dict, which must match the result format of one of the
               M(peer_info) or M(peer) modules.
+            - Only one of I(peer) or I(peers) can be specified.
         type: raw
-        required: true
+    peers:
+        description:
+            - The peers to use to manage the installed chaincode.
+            - You can pass strings, which are the display names of peers registered
+              with the Fabric operations console.
+            - You can also pass dictionaries, which must match the result format of one of the
+              M(peer_info) or M(peer) modules.
+            - The chaincode package is only read once, and the peers are queried concurrently.
+              The chaincode is only installed on the peers where it is not already installed.
+            - The maximum number of peers that are managed at the same time can be set using
+              the C(IBP_ANSIBLE_MAX_WORKERS) environment variable, and defaults to 8.
+            - Only one of I(peer) or I(peers) can be specified.
+        type: list
+        elements: raw
     identity:
         description:
             - The identity to use when interacting with the peer.
@@ -174,6 +191,20 @@ EXAMPLES = '''
     msp_id: Org1MSP
     path: fabcar@1.0.0.tgz
 
+- name: Install the chaincode on multiple peers using Hyperledger Fabric v2.x lifecycle
+  hyperledger.fabric_ansible_collection.installed_chaincode:
+    state: present
+    api_endpoint: https://console.example.org:32000
+    api_authtype: basic
+    api_key: xxxxxxxx
+    api_secret: xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx
+    peers:
+      - Org1 Peer1
+      - Org1 Peer2
+    identity: Org1 Admin.json
+    msp_id: Org1MSP
+    path: fabcar@1.0.0.tgz
+
 - name: Ensure the chaincode is not installed on the peer using Hyperledger Fabric v1.4 lifecycle
   hyperledger.fabric_ansible_collection.installed_chaincode:
     state: absent
@@ -238,33 +269,94 @@ installed_chaincode:
             type: str
             sample: fabcar-1.0.0:5891b5b522d5df086d0ff0b110fbd9d21bb4fc7163af34d08286a2e846f6be03
             returned: when using the chaincode lifecycle in Hyperledger Fabric v2.x
+peers:
+    description:
+        - The result for each peer.
+    type: list
+    elements: dict
+    returned: when I(peers) is specified
+    contains:
+        name:
+            description:
+                - The name of the peer.
+            type: str
+            sample: Org1 Peer1
+        changed:
+            description:
+                - True if the chaincode was installed on the peer.
+            type: bool
+            sample: true
+        failed:
+            description:
+                - True if the chaincode could not be managed on the peer.
+            type: bool
+            sample: false
+        msg:
+            description:
+                - The error message, if the chaincode could not be managed on the peer.
+            type: str
+            returned: when I(failed) is true
+        installed_chaincode:
+            description:
+                - The installed chaincode, in the same format as I(installed_chaincode).
+            type: dict
+            returned: when I(state) is C(present) and I(failed) is false
 '''
 
 
-def do_old_lifecycle(module, console, peer, identity, msp_id, hsm):
-
-    # Extract the chaincode information.
-    name = module.params['name']
-    version = module.params['version']
-    path = module.params['path']
-    id = None
+def read_chaincode_deployment_spec(path):
+
+    # Read the chaincode specification from the package, and hash the code package
+    # as it is read, so that the code package is never held in memory.
+    chaincode_spec = None
+    code_package_hasher = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while True:
+            key = read_stream_varint(file)
+            if key is None:
+                break
+            number = key >> 3
+            wire_type = key & 0x7
+            if wire_type == WIRE_VARINT:
+                read_stream_varint(file)
+                continue
+            elif wire_type != WIRE_LENGTH_DELIMITED:
+                raise Exception(f'Chaincode package {path} is not a valid CDS file')
+            length = read_stream_varint(file)
+            if number == 1:
+                chaincode_spec = decode_message('protos.ChaincodeSpec', file.read(length))
+            elif number == 3:
+                hash_stream(file, code_package_hasher, length)
+            else:
+                file.seek(length, os.SEEK_CUR)
+    if chaincode_spec is None:
+        raise Exception(f'Chaincode package {path} is not a valid CDS file')
+    name = chaincode_spec['chaincode_id']['name']
+    version = chaincode_spec['chaincode_id']['version']
+    code_package_hash = code_package_hasher.digest()
+    hasher = hashlib.sha256(name.encode('utf-8'))
+    hasher.update(version.encode('utf-8'))
+    metadata_hash = hasher.digest()
+    hasher = hashlib.sha256(code_package_hash)
+    hasher.update(metadata_hash)
+    return dict(name=name, version=version, id=hasher.hexdigest())
+
+
+def get_old_lifecycle_chaincode(module):
 
     # If the path is provided, name and version won't be, so we need to extract them from the package.
+    path = module.params['path']
     if path is not None:
-        with open(path, 'rb') as file:
-            cds = proto_to_json('protos.ChaincodeDeploymentSpec', file.read())
-        name = cds['chaincode_spec']['chaincode_id']['name']
-        version = cds['chaincode_spec']['chaincode_id']['version']
-        code_package = base64.b64decode(cds['code_package'])
-        code_package_hash = hashlib.sha256(code_package).digest()
-        hasher = hashlib.sha256(name.encode('utf-8'))
-        hasher.update(version.encode('utf-8'))
-        metadata_hash = hasher.digest()
-        hasher = hashlib.sha256(code_package_hash)
-        hasher.update(metadata_hash)
-        id = hasher.hexdigest()
+        return memoize_file(path, 'cds', read_chaincode_deployment_spec)
+    return dict(name=module.params['name'], version=module.params['version'], id=None)
+
+
+def do_old_lifecycle(module, peer, identity, msp_id, hsm, chaincode):
 
     # Determine the chaincodes installed on the peer.
+    name = chaincode['name']
+    version = chaincode['version']
+    id = chaincode['id']
     with peer.connect(module, identity, msp_id, hsm) as peer_connection:
         installed_chaincodes = peer_connection.list_installed_chaincodes_oldlc()
 
@@ -283,7 +375,7 @@ def do_old_lifecycle(module, console, peer, identity, msp_id, hsm):
     elif state == 'absent' and not chaincode_installed:
 
         # The chaincode should not be installed and isn't.
-        return module.exit_json(changed=False)
+        return False, None
 
     elif state == 'present' and chaincode_installed:
 
@@ -292,36 +384,41 @@ def do_old_lifecycle(module, console, peer, identity, msp_id, hsm):
         # an exception.
         if id != installed_chaincode['id']:
             raise Exception(f'cannot update installed chaincode {name}@{version} with ID {installed_chaincode["id"]}')
-        return module.exit_json(changed=False, installed_chaincode=dict(name=name, version=version, id=id))
+        return False, dict(name=name, version=version, id=id)
 
     else:
 
         # Install the chaincode.
         with peer.connect(module, identity, msp_id, hsm) as peer_connection:
-            peer_connection.install_chaincode_oldlc(path)
-        return module.exit_json(changed=True, installed_chaincode=dict(name=name, version=version, id=id))
+            peer_connection.install_chaincode_oldlc(module.params['path'])
+        return True, dict(name=name, version=version, id=id)
 
 
-def do_new_lifecycle(module, console, peer, identity, msp_id, hsm):
+def read_chaincode_package(path):
 
-    # Ensure we have the Fabric v2.x binaries available.
-    module.check_for_missing_bins(min_fabric_version='2.1.1')
+    # Read the label from the package, and hash the package to determine the package ID.
+    with tarfile.open(path, 'r') as tar:
+        metadata_file = tar.extractfile('metadata.json')
+        metadata = json.load(metadata_file)
+    label = metadata['label']
+    hash = sha256_file(path)
+    return dict(package_id=f'{label}:{hash}', label=label)
 
-    # Extract the chaincode information.
-    path = module.params['path']
-    package_id = module.params['package_id']
+
+def get_new_lifecycle_chaincode(module):
 
     # If the path is provided, name and version won't be, so we need to extract them from the package.
+    path = module.params['path']
     if path is not None:
-        with tarfile.open(path, 'r') as tar:
-            metadata_file = tar.extractfile('metadata.json')
-            metadata = json.load(metadata_file)
-        label = metadata['label']
-        with open(path, 'rb') as f:
-            hash = hashlib.sha256(f.read()).hexdigest()
-        package_id = f'{label}:{hash}'
+        return memoize_file(path, 'chaincode-package', read_chaincode_package)
+    return dict(package_id=module.params['package_id'], label=None)
+
+
+def do_new_lifecycle(module, peer, identity, msp_id, hsm, chaincode):
 
     # Determine the chaincodes installed on the peer.
+    package_id = chaincode['package_id']
+    label = chaincode['label']
     with peer.connect(module, identity, msp_id, hsm) as peer_connection:
         installed_chaincodes = peer_connection.list_installed_chaincodes_newlc()
 
@@ -340,20 +437,20 @@ def do_new_lifecycle(module, console, peer, identity, msp_id, hsm):
     elif state == 'absent' and not chaincode_installed:
 
         # The chaincode should not be installed and isn't.
-        return module.exit_json(changed=False)
+        return False, None
 
     elif state == 'present' and chaincode_installed:
 
         # The chaincode should be installed and is.
         label = installed_chaincode['label']
-        return module.exit_json(changed=False, installed_chaincode=dict(package_id=package_id, label=label))
+        return False, dict(package_id=package_id, label=label)
 
     else:
 
         # Install the chaincode.
         with peer.connect(module, identity, msp_id, hsm) as peer_connection:
-            peer_connection.install_chaincode_newlc(path)
-        return module.exit_json(changed=True, installed_chaincode=dict(package_id=package_id, label=label))
+            peer_connection.install_chaincode_newlc(module.params['path'])
+        return True, dict(package_id=package_id, label=label)
 
 
 def main():
@@ -367,7 +464,8 @@ def main():
         api_secret=dict(type='str', no_log=True),
         api_timeout=dict(type='int', default=60),
         api_token_endpoint=dict(type='str', default='https://iam.cloud.ibm.com/identity/token'),
-        peer=dict(type='raw', required=True),
+        peer=dict(type='raw'),
+        peers=dict(type='list', elements='raw'),
         identity=dict(type='raw', required=True),
         msp_id=dict(type='str', required=True),
         hsm=dict(type='dict', options=dict(
@@ -396,7 +494,9 @@ def main():
     required_together = [
         ['name', 'version']
     ]
+    required_one_of.append(['peer', 'peers'])
     mutually_exclusive = [
+        ['peer', 'peers'],
         ['name', 'path'],
         ['version', 'path'],
         ['package_id', 'path'],
@@ -420,8 +520,11 @@ def main():
         # Log in to the console.
         console = get_console(module)
 
-        # Get the peer, identity, and MSP ID.
-        peer = get_peer_by_module(console, module)
+        # Get the peers, identity, and MSP ID.
+        if module.params['peers'] is not None:
+            peers = get_peers_by_module(console, module)
+        else:
+            peers = [get_peer_by_module(console, module)]
         identity = get_identity_by_module(module)
         msp_id = module.params['msp_id']
         hsm = module.params['hsm']
@@ -435,11 +538,44 @@ def main():
         else:
             new_lifecycle = package_id is not None
 
-        # Switch to new lifecycle code if requird.
+        # Switch to new lifecycle code if requird. The chaincode package is
+        # only read and hashed once, regardless of the number of peers.
         if new_lifecycle:
-            return do_new_lifecycle(module, console, peer, identity, msp_id, hsm)
+            module.check_for_missing_bins(min_fabric_version='2.1.1')
+            chaincode = get_new_lifecycle_chaincode(module)
+            do_lifecycle = do_new_lifecycle
         else:
-            return do_old_lifecycle(module, console, peer, identity, msp_id, hsm)
+            chaincode = get_old_lifecycle_chaincode(module)
+            do_lifecycle = do_old_lifecycle
+
+        # If only one peer was specified, handle it as before.
+        if module.params['peers'] is None:
+            changed, installed_chaincode = do_lifecycle(module, peers[0], identity, msp_id, hsm, chaincode)
+            if installed_chaincode is None:
+                return module.exit_json(changed=changed)
+            return module.exit_json(changed=changed, installed_chaincode=installed_chaincode)
+
+        # Otherwise, handle all of the peers concurrently.
+        results = map_concurrently(lambda peer: do_lifecycle(module, peer, identity, msp_id, hsm, chaincode), peers)
+        peer_results = list()
+        failed = list()
+        for peer, (result, error) in zip(peers, results):
+            if error is not None:
+                failed.append(peer.name)
+                peer_results.append(dict(name=peer.name, changed=False, failed=True, msg=to_native(error)))
+                continue
+            changed, installed_chaincode = result
+            peer_result = dict(name=peer.name, changed=changed, failed=False)
+            if installed_chaincode is not None:
+                peer_result['installed_chaincode'] = installed_chaincode
+            peer_results.append(peer_result)
+        changed = any(peer_result['changed'] for peer_result in peer_results)
+        if failed:
+            return module.fail_json(msg=f'Failed to manage installed chaincode on peers: {", ".join(failed)}', changed=changed, peers=peer_results)
+        installed_chaincode = next((peer_result['installed_chaincode'] for peer_result in peer_results if 'installed_chaincode' in peer_result), None)
+        if installed_chaincode is None:
+            return module.exit_json(changed=changed, peers=peer_results)
+        return module.exit_json(changed=changed, installed_chaincode=installed_chaincode, peers=peer_results)
 
     # Notify Ansible of the exception.
     except Exception as e:
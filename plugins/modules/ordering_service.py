@@ -732,7 +732,7 @@ def main():
         # Wait for the ordering service to start.
         ordering_service = OrderingService.from_json(console.extract_ordering_service_info(ordering_service))
         timeout = module.params['wait_timeout']
-        ordering_service.wait_for(timeout)
+        ordering_service.wait_for(timeout, module)
 
         # Return the ordering service.
         module.exit_json(changed=changed, ordering_service=ordering_service.to_json())
@@ -202,7 +202,7 @@ def main():
 
         # Wait for the peer to start.
         wait_timeout = module.params['wait_timeout']
-        ordering_service.wait_for(wait_timeout)
+        ordering_service.wait_for(wait_timeout, module)
 
         # Return peer information.
         module.exit_json(exists=True, ordering_service=ordering_service.to_json())
@@ -12,7 +12,7 @@ import urllib
 from ansible.module_utils._text import to_native
 from ansible.module_utils.basic import _load_params
 
-from ..module_utils.cert_utils import normalize_whitespace
+from ..module_utils.cert_utils import diff_certs
 from ..module_utils.dict_utils import (copy_dict, diff_dicts, equal_dicts,
                                        merge_dicts)
 from ..module_utils.module import BlockchainModule
@@ -876,12 +876,9 @@ def main():
                         if expected_admins:
                             break
             if expected_admins:
-                expected_admins_set = set(map(normalize_whitespace, expected_admins))
                 actual_admins = peer.get('admin_certs', None)
                 if actual_admins is not None:
-                    actual_admins_set = set(map(normalize_whitespace, actual_admins))
-                    append_admin_certs = list(expected_admins_set.difference(actual_admins_set))
-                    remove_admin_certs = list(actual_admins_set.difference(expected_admins_set))
+                    append_admin_certs, remove_admin_certs = diff_certs(expected_admins, actual_admins)
                     if append_admin_certs or remove_admin_certs:
                         console.edit_admin_certs(peer['id'], append_admin_certs, remove_admin_certs)
                         changed = True
@@ -12,7 +12,8 @@ from ansible.module_utils._text import to_native
 from ..module_utils.dict_utils import copy_dict, equal_dicts, merge_dicts
 from ..module_utils.module import BlockchainModule
 from ..module_utils.utils import (get_certificate_authority_by_module,
-                                  get_console, get_identity_by_module)
+                                  get_console, get_identity_by_module,
+                                  map_concurrently)
 
 ANSIBLE_METADATA = {'metadata_version': '1.1',
                     'status': ['preview'],
@@ -106,8 +107,8 @@ options:
     enrollment_id:
         description:
             - The enrollment ID, or user name, of the identity to register on the certificate authority.
+            - Required unless I(identities) is specified.
         type: str
-        required: true
     enrollment_secret:
         description:
             - The enrollment secret, or password, of an identity to register on the certificate authority.
@@ -150,6 +151,66 @@ options:
                 description:
                     - Whether or not the attribute and its value will be in the enrollment certificate.
                 type: bool
+    identities:
+        description:
+            - The identities to register on the certificate authority, instead of I(enrollment_id),
+              I(enrollment_secret), I(max_enrollments), I(type), I(affiliation) and I(attributes).
+            - All of the identities are registered, updated, or removed according to I(state) using
+              a single connection to the certificate authority and a single enrollment of I(registrar).
+            - The existing registrations are listed using a single request to the certificate authority,
+              rather than one request for each identity. Only the identities that I(registrar) is
+              allowed to see are listed.
+            - The maximum number of identities that are handled at the same time can be set using
+              the C(IBP_ANSIBLE_MAX_WORKERS) environment variable, and defaults to 8.
+        type: list
+        elements: dict
+        suboptions:
+            enrollment_id:
+                description:
+                    - The enrollment ID, or user name, of the identity to register on the certificate authority.
+                type: str
+                required: true
+            enrollment_secret:
+                description:
+                    - The enrollment secret, or password, of an identity to register on the certificate authority.
+                type: str
+            max_enrollments:
+                description:
+                    - The maximum number of times that this identity can be enrolled.
+                type: int
+                default: -1
+            type:
+                description:
+                    - The type of this identity.
+                type: str
+                default: client
+                choices:
+                    - admin
+                    - client
+                    - peer
+                    - orderer
+            affiliation:
+                description:
+                    - The affiliation of this identity.
+                type: str
+            attributes:
+                description:
+                    - The attributes for this identity.
+                type: list
+                elements: dict
+                suboptions:
+                    name:
+                        description:
+                            - The name of the attribute.
+                        type: str
+                    value:
+                        description:
+                            - The value of the attribute.
+                        type: str
+                    ecert:
+                        description:
+                            - Whether or not the attribute and its value will be in the enrollment certificate.
+                        type: bool
 notes: []
 requirements: []
 '''
@@ -172,6 +233,21 @@ EXAMPLES = '''
       - name: "fabcar.admin"
         value: "true"
 
+- name: Register many new identities
+  hyperledger.fabric_ansible_collection.registered_identity:
+    state: present
+    api_endpoint: https://console.example.org:32000
+    api_authtype: basic
+    api_key: xxxxxxxx
+    api_secret: xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx
+    certificate_authority: Org1 CA
+    registrar: Org1 CA Admin.json
+    identities:
+      - enrollment_id: org1app1
+        enrollment_secret: org1app1pw
+      - enrollment_id: org1app2
+        enrollment_secret: org1app2pw
+
 - name: Delete an existing identity
   hyperledger.fabric_ansible_collection.registered_identity:
     state: absent
@@ -238,9 +314,156 @@ registered_identity:
                         - Whether or not the attribute and its value will be in the enrollment certificate.
                     type: bool
                     sample: true
+registered_identities:
+    description:
+        - The outcome for each identity.
+    type: list
+    elements: dict
+    returned: when I(identities) is specified
+    contains:
+        enrollment_id:
+            description:
+                - The enrollment ID, or user name, of the identity.
+            type: str
+            sample: org1app1
+        changed:
+            description:
+                - True if the identity was registered, updated, or removed.
+            type: bool
+            sample: true
+        failed:
+            description:
+                - True if the identity could not be registered, updated, or removed.
+            type: bool
+            sample: false
+        msg:
+            description:
+                - The error message, if the identity could not be registered, updated, or removed.
+            type: str
+            returned: when I(failed) is true
+        registered_identity:
+            description:
+                - The registered identity, in the same format as I(registered_identity).
+            type: dict
+            returned: when I(state) is C(present) and I(failed) is false
 '''
 
 
+def get_expected_registration(params):
+
+    # The options for a single identity are the same, whether they are passed
+    # as module options or as an item in the list of identities.
+    return dict(
+        enrollment_id=params['enrollment_id'],
+        enrollment_secret=params['enrollment_secret'],
+        max_enrollments=params['max_enrollments'],
+        type=params['type'],
+        affiliation=params['affiliation'],
+        attributes=params['attributes']
+    )
+
+
+def do_registration(connection, registrar, state, registration, registrations=None):
+
+    # Determine if the identity is registered, either by asking the certificate
+    # authority, or by looking in the index of all registrations if one was passed.
+    enrollment_id = registration['enrollment_id']
+    if registrations is None:
+        identity_registered = connection.is_registered(registrar, enrollment_id)
+    else:
+        identity_registered = enrollment_id in registrations
+
+    # If the identity should not be registered, handle that now.
+    if state == 'absent' and identity_registered:
+
+        # The identity should not be registered, delete it.
+        connection.delete_registration(registrar, enrollment_id)
+        return True, None
+
+    elif state == 'absent':
+
+        # The identity should not be registered and isn't.
+        return False, None
+
+    # Extract the expected registration
+    enrollment_secret = registration['enrollment_secret']
+    max_enrollments = registration['max_enrollments']
+    type = registration['type']
+    affiliation = registration['affiliation']
+    attributes = registration['attributes']
+
+    # Either create or update the registration.
+    changed = False
+    if state == 'present' and not identity_registered:
+
+        # Create the registration.
+        enrollment_secret = connection.create_registration(registrar, enrollment_id, enrollment_secret, type, affiliation, max_enrollments, attributes)
+        changed = True
+
+    elif state == 'present' and identity_registered:
+
+        # Get the actual registration.
+        if registrations is None:
+            actual_registration = connection.get_registration(registrar, enrollment_id)
+        else:
+            actual_registration = registrations[enrollment_id]
+
+        # Update the registration.
+        new_registration = copy_dict(actual_registration)
+        expected_registration = dict(
+            id=enrollment_id,
+            max_enrollments=max_enrollments,
+            type=type,
+            affiliation=affiliation
+        )
+        merge_dicts(new_registration, expected_registration)
+
+        # If the registration has changed, apply the changes.
+        registration_changed = not equal_dicts(actual_registration, new_registration)
+
+        # If the registration has not changed, we now need to check the attributes.
+        if not registration_changed:
+
+            # First, transform both lists into dictionaries, and compare those.
+            actual_attrs_as_dict = dict()
+            actual_attrs = actual_registration.get('attrs', None)
+            if actual_attrs:
+                for attr in actual_attrs:
+                    name = attr['name']
+                    value = attr['value']
+                    actual_attrs_as_dict[name] = value
+            expected_attrs_as_dict = dict()
+            if attributes:
+                for attr in attributes:
+                    name = attr['name']
+                    value = attr['value']
+                    expected_attrs_as_dict[name] = value
+            for default_attr_name in ['hf.EnrollmentID', 'hf.Type', 'hf.Affiliation']:
+                actual_attrs_as_dict.pop(default_attr_name, None)
+                expected_attrs_as_dict.pop(default_attr_name, None)
+            registration_changed = not equal_dicts(actual_attrs_as_dict, expected_attrs_as_dict)
+
+            # In order to delete any attributes, we must set their values to the empty string.
+            for name, value in actual_attrs_as_dict.items():
+                if name not in expected_attrs_as_dict:
+                    attributes.append(dict(name=name, value=''))
+
+        # Apply the changes if required.
+        if registration_changed:
+            connection.update_registration(registrar, enrollment_id, enrollment_secret, type, affiliation, max_enrollments, attributes)
+            changed = True
+
+    # Return the registered identity.
+    return changed, dict(
+        enrollment_id=enrollment_id,
+        enrollment_secret=enrollment_secret,
+        type=type,
+        affiliation=affiliation,
+        max_enrollments=max_enrollments,
+        attributes=attributes
+    )
+
+
 def main():
 
     # Create the module.
@@ -254,7 +477,7 @@ def main():
         api_token_endpoint=dict(type='str', default='https://iam.cloud.ibm.com/identity/token'),
         certificate_authority=dict(type='raw', required=True),
         registrar=dict(type='raw', required=True),
-        enrollment_id=dict(type='str', required=True),
+        enrollment_id=dict(type='str'),
         enrollment_secret=dict(type='str', no_log=True),
         max_enrollments=dict(type='int', default=-1),
         type=dict(type='str', default='client', choices=['admin', 'client', 'peer', 'orderer']),
@@ -264,6 +487,18 @@ def main():
             value=dict(type='str', required=True),
             ecert=dict(type='bool', default=False)
         )),
+        identities=dict(type='list', elements='dict', options=dict(
+            enrollment_id=dict(type='str', required=True),
+            enrollment_secret=dict(type='str', no_log=True),
+            max_enrollments=dict(type='int', default=-1),
+            type=dict(type='str', default='client', choices=['admin', 'client', 'peer', 'orderer']),
+            affiliation=dict(type='str', default=''),
+            attributes=dict(type='list', elements='dict', default=list(), options=dict(
+                name=dict(type='str', required=True),
+                value=dict(type='str', required=True),
+                ecert=dict(type='bool', default=False)
+            ))
+        )),
         hsm=dict(type='dict', options=dict(
             pkcs11library=dict(type='str', required=True),
             label=dict(type='str', required=True, no_log=True),
@@ -273,7 +508,18 @@ def main():
     required_if = [
         ('api_authtype', 'basic', ['api_secret']),
     ]
-    module = BlockchainModule(argument_spec=argument_spec, supports_check_mode=True, required_if=required_if)
+    required_one_of = [
+        ['enrollment_id', 'identities']
+    ]
+    mutually_exclusive = [
+        ['enrollment_id', 'identities']
+    ]
+    module = BlockchainModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+        required_if=required_if,
+        required_one_of=required_one_of,
+        mutually_exclusive=mutually_exclusive)
 
     # Validate HSM requirements if HSM is specified.
     if module.params['hsm']:
@@ -291,100 +537,42 @@ def main():
 
         # Connect to the certificate authority.
         hsm = module.params['hsm']
+        state = module.params['state']
         with certificate_authority.connect(module, hsm) as connection:
 
-            # Determine if the identity is registered.
-            enrollment_id = module.params['enrollment_id']
-            identity_registered = connection.is_registered(registrar, enrollment_id)
-
-            # If the identity should not be registered, handle that now.
-            state = module.params['state']
-            if state == 'absent' and identity_registered:
-
-                # The identity should not be registered, delete it.
-                connection.delete_registration(registrar, enrollment_id)
-                return module.exit_json(changed=True)
-
-            elif state == 'absent':
-
-                # The identity should not be registered and isn't.
-                return module.exit_json(changed=False)
-
-            # Extract the expected registration
-            enrollment_id = module.params['enrollment_id']
-            enrollment_secret = module.params['enrollment_secret']
-            max_enrollments = module.params['max_enrollments']
-            type = module.params['type']
-            affiliation = module.params['affiliation']
-            attributes = module.params['attributes']
-
-            # Either create or update the registration.
-            changed = False
-            if state == 'present' and not identity_registered:
-
-                # Create the registration.
-                enrollment_secret = connection.create_registration(registrar, enrollment_id, enrollment_secret, type, affiliation, max_enrollments, attributes)
-                changed = True
-
-            elif state == 'present' and identity_registered:
-
-                # Get the actual registration.
-                actual_registration = connection.get_registration(registrar, enrollment_id)
-
-                # Update the registration.
-                new_registration = copy_dict(actual_registration)
-                expected_registration = dict(
-                    id=enrollment_id,
-                    max_enrollments=max_enrollments,
-                    type=type,
-                    affiliation=affiliation
-                )
-                merge_dicts(new_registration, expected_registration)
-
-                # If the registration has changed, apply the changes.
-                registration_changed = not equal_dicts(actual_registration, new_registration)
-
-                # If the registration has not changed, we now need to check the attributes.
-                if not registration_changed:
-
-                    # First, transform both lists into dictionaries, and compare those.
-                    actual_attrs_as_dict = dict()
-                    actual_attrs = actual_registration.get('attrs', None)
-                    if actual_attrs:
-                        for attr in actual_attrs:
-                            name = attr['name']
-                            value = attr['value']
-                            actual_attrs_as_dict[name] = value
-                    expected_attrs_as_dict = dict()
-                    if attributes:
-                        for attr in attributes:
-                            name = attr['name']
-                            value = attr['value']
-                            expected_attrs_as_dict[name] = value
-                    for default_attr_name in ['hf.EnrollmentID', 'hf.Type', 'hf.Affiliation']:
-                        actual_attrs_as_dict.pop(default_attr_name, None)
-                        expected_attrs_as_dict.pop(default_attr_name, None)
-                    registration_changed = not equal_dicts(actual_attrs_as_dict, expected_attrs_as_dict)
-
-                    # In order to delete any attributes, we must set their values to the empty string.
-                    for name, value in actual_attrs_as_dict.items():
-                        if name not in expected_attrs_as_dict:
-                            attributes.append(dict(name=name, value=''))
-
-                # Apply the changes if required.
-                if registration_changed:
-                    connection.update_registration(registrar, enrollment_id, enrollment_secret, type, affiliation, max_enrollments, attributes)
-                    changed = True
-
-            # Return the registered identity.
-            module.exit_json(changed=changed, registered_identity=dict(
-                enrollment_id=enrollment_id,
-                enrollment_secret=enrollment_secret,
-                type=type,
-                affiliation=affiliation,
-                max_enrollments=max_enrollments,
-                attributes=attributes
-            ))
+            # If only one identity was specified, handle it as before.
+            identities = module.params['identities']
+            if identities is None:
+                registration = get_expected_registration(module.params)
+                changed, registered_identity = do_registration(connection, registrar, state, registration)
+                if registered_identity is None:
+                    return module.exit_json(changed=changed)
+                return module.exit_json(changed=changed, registered_identity=registered_identity)
+
+            # Otherwise, list all of the registrations once, and handle all of the identities
+            # concurrently over the same connection.
+            actual_registrations = connection.get_all_registrations(registrar)
+            registrations = [get_expected_registration(identity) for identity in identities]
+            results = map_concurrently(lambda registration: do_registration(connection, registrar, state, registration, actual_registrations), registrations)
+
+        # Build the outcome for each identity.
+        registered_identities = list()
+        failed = list()
+        for registration, (result, error) in zip(registrations, results):
+            enrollment_id = registration['enrollment_id']
+            if error is not None:
+                failed.append(enrollment_id)
+                registered_identities.append(dict(enrollment_id=enrollment_id, changed=False, failed=True, msg=to_native(error)))
+                continue
+            changed, registered_identity = result
+            outcome = dict(enrollment_id=enrollment_id, changed=changed, failed=False)
+            if registered_identity is not None:
+                outcome['registered_identity'] = registered_identity
+            registered_identities.append(outcome)
+        changed = any(outcome['changed'] for outcome in registered_identities)
+        if failed:
+            return module.fail_json(msg=f'Failed to manage registered identities: {", ".join(failed)}', changed=changed, registered_identities=registered_identities)
+        module.exit_json(changed=changed, registered_identities=registered_identities)
 
     # Notify Ansible of the exception.
     except Exception as e:
@@ -0,0 +1,227 @@
+#!/usr/bin/python
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible.module_utils._text import to_native
+
+from ..module_utils.module import BlockchainModule
+from ..module_utils.utils import (get_certificate_authority_by_module,
+                                  get_console, get_identity_by_module)
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'community'}
+
+DOCUMENTATION = '''
+---
+module: registered_identity_list_info
+short_description: Get information about all of the identities registered on a Hyperledger Fabric certificate authority
+description:
+    - Get information about all of the identities registered on a Hyperledger Fabric certificate authority.
+    - All of the identities are listed using a single request to the certificate authority.
+    - This module works with the IBM Support for Hyperledger Fabric software or the Hyperledger Fabric
+      Open Source Stack running in a Red Hat OpenShift or Kubernetes cluster.
+author: Simon Stone (@sstone1)
+options:
+    api_endpoint:
+        description:
+            - The URL for the Fabric operations console.
+        type: str
+        required: true
+    api_authtype:
+        description:
+            - C(basic) - Authenticate to the Fabric operations console using basic authentication.
+              You must provide both a valid API key using I(api_key) and API secret using I(api_secret).
+        type: str
+        required: true
+    api_key:
+        description:
+            - The API key for the Fabric operations console.
+        type: str
+        required: true
+    api_secret:
+        description:
+            - The API secret for the Fabric operations console.
+            - Only required when I(api_authtype) is C(basic).
+        type: str
+    api_timeout:
+        description:
+            - The timeout, in seconds, to use when interacting with the Fabric operations console.
+        type: int
+        default: 60
+    certificate_authority:
+        description:
+            - The certificate authority to list the registered identities from.
+            - You can pass a string, which is the display name of a certificate authority registered
+              with the Fabric operations console.
+            - You can also pass a dictionary, which must match the result format of one of the
+              M(certificate_authority_info) or M(certificate_authority) modules.
+        type: raw
+        required: true
+    registrar:
+        description:
+            - The identity to use when interacting with the certificate authority.
+            - Only the identities that this identity is allowed to see are listed.
+            - You can pass a string, which is the path to the JSON file where the enrolled
+              identity is stored.
+            - You can also pass a dict, which must match the result format of one of the
+              M(enrolled_identity_info) or M(enrolled_identity) modules.
+        type: raw
+        required: true
+    hsm:
+        description:
+            - "The PKCS #11 compliant HSM configuration to use for digital signatures."
+            - Only required if the identity specified in I(registrar) was enrolled using an HSM.
+        type: dict
+        suboptions:
+            pkcs11library:
+                description:
+                    - "The PKCS #11 library that should be used for digital signatures."
+                type: str
+            label:
+                description:
+                    - The HSM label that should be used for digital signatures.
+                type: str
+            pin:
+                description:
+                    - The HSM pin that should be used for digital signatures.
+                type: str
+notes: []
+requirements: []
+'''
+
+EXAMPLES = '''
+- name: Get all registered identities
+  hyperledger.fabric_ansible_collection.registered_identity_list_info:
+    api_endpoint: https://console.example.org:32000
+    api_authtype: basic
+    api_key: xxxxxxxx
+    api_secret: xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx
+    certificate_authority: Org1 CA
+    registrar: Org1 CA Admin.json
+'''
+
+RETURN = '''
+---
+registered_identities:
+    description:
+        - The registered identities.
+    type: list
+    elements: dict
+    returned: always
+    contains:
+        enrollment_id:
+            description:
+                - The enrollment ID, or user name, of the identity.
+            type: str
+            sample: org1admin
+        max_enrollments:
+            description:
+                - The maximum number of times that this identity can be enrolled.
+            type: int
+            sample: -1
+        type:
+            description:
+                - The type of this identity.
+            type: str
+            sample: admin
+        affiliation:
+            description:
+                - The affiliation of this identity.
+            type: str
+            sample: org1.department
+        attributes:
+            description:
+                - The attributes for this identity.
+            type: list
+            elements: dict
+            contains:
+                name:
+                    description:
+                        - The name of the attribute.
+                    type: str
+                    sample: fabcar.admin
+                value:
+                    description:
+                        - The value of the attribute.
+                    type: str
+                    sample: true
+                ecert:
+                    description:
+                        - Whether or not the attribute and its value will be in the enrollment certificate.
+                    type: bool
+                    sample: true
+'''
+
+
+def main():
+
+    # Create the module.
+    argument_spec = dict(
+        api_endpoint=dict(type='str', required=True),
+        api_authtype=dict(type='str', required=True, choices=['ibmcloud', 'basic']),
+        api_key=dict(type='str', required=True, no_log=True),
+        api_secret=dict(type='str', no_log=True),
+        api_timeout=dict(type='int', default=60),
+        api_token_endpoint=dict(type='str', default='https://iam.cloud.ibm.com/identity/token'),
+        certificate_authority=dict(type='raw', required=True),
+        registrar=dict(type='raw', required=True),
+        hsm=dict(type='dict', options=dict(
+            pkcs11library=dict(type='str', required=True),
+            label=dict(type='str', required=True, no_log=True),
+            pin=dict(type='str', required=True, no_log=True)
+        ))
+    )
+    required_if = [
+        ('api_authtype', 'basic', ['api_secret'])
+    ]
+    module = BlockchainModule(argument_spec=argument_spec, supports_check_mode=True, required_if=required_if)
+
+    # Validate HSM requirements if HSM is specified.
+    if module.params['hsm']:
+        module.check_for_missing_hsm_libs()
+
+    # Ensure all exceptions are caught.
+    try:
+
+        # Log in to the console.
+        console = get_console(module)
+
+        # Get the certificate authority and identity.
+        certificate_authority = get_certificate_authority_by_module(console, module)
+        registrar = get_identity_by_module(module, 'registrar')
+
+        # Get all of the registrations.
+        hsm = module.params['hsm']
+        with certificate_authority.connect(module, hsm) as connection:
+            registrations = connection.get_all_registrations(registrar)
+
+        # Convert them into the same format as the registered identity module.
+        registered_identities = list()
+        for enrollment_id, registration in sorted(registrations.items()):
+            registered_identities.append(dict(
+                enrollment_id=enrollment_id,
+                max_enrollments=registration.get('max_enrollments'),
+                type=registration.get('type'),
+                affiliation=registration.get('affiliation'),
+                attributes=[
+                    dict(name=attr['name'], value=attr['value'], ecert=attr.get('ecert', False))
+                    for attr in registration.get('attrs') or list()
+                ]
+            ))
+
+        # Return the registered identities.
+        module.exit_json(registered_identities=registered_identities)
+
+    # Notify Ansible of the exception.
+    except Exception as e:
+        module.fail_json(msg=to_native(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/python
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+# Representative channel configuration messages and configuration updates,
+# built using the protoc generated classes shipped with the Fabric SDK for
+# Python, for testing the native protobuf codec against.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from google.protobuf import descriptor_pb2, descriptor_pool, timestamp_pb2
+from hfc.protos.common import common_pb2, configtx_pb2, configuration_pb2, policies_pb2
+from hfc.protos.msp import identities_pb2, msp_config_pb2, msp_principal_pb2
+from hfc.protos.orderer import configuration_pb2 as orderer_configuration_pb2
+from hfc.protos.peer import configuration_pb2 as peer_configuration_pb2
+
+try:
+    from google.protobuf.message_factory import GetMessageClass
+except ImportError:
+    GetMessageClass = None
+
+CERT = b'-----BEGIN CERTIFICATE-----\nMIIB8jCCAZigAwIBAgIUZm9vYmFy\n-----END CERTIFICATE-----\n'
+OTHER_CERT = b'-----BEGIN CERTIFICATE-----\nMIIB8zCCAZmgAwIBAgIUYmF6cXV4\n-----END CERTIFICATE-----\n'
+
+
+def _build_extra_messages():
+
+    # The version of the Fabric SDK for Python that is available does not include
+    # the etcdraft or ACL messages, so define them here from their .proto files.
+    file = descriptor_pb2.FileDescriptorProto(name='fixtures/extra.proto', syntax='proto3')
+    TYPE_STRING = descriptor_pb2.FieldDescriptorProto.TYPE_STRING
+    TYPE_UINT32 = descriptor_pb2.FieldDescriptorProto.TYPE_UINT32
+    TYPE_BYTES = descriptor_pb2.FieldDescriptorProto.TYPE_BYTES
+    TYPE_MESSAGE = descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE
+    OPTIONAL = descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL
+    REPEATED = descriptor_pb2.FieldDescriptorProto.LABEL_REPEATED
+
+    def add_message(name, fields, container=None):
+        message = file.message_type.add() if container is None else container.nested_type.add()
+        message.name = name
+        for (number, field_name, field_type, label, type_name) in fields:
+            message.field.add(name=field_name, number=number, type=field_type, label=label, type_name=type_name)
+        return message
+
+    add_message('Consenter', [
+        (1, 'host', TYPE_STRING, OPTIONAL, None),
+        (2, 'port', TYPE_UINT32, OPTIONAL, None),
+        (3, 'client_tls_cert', TYPE_BYTES, OPTIONAL, None),
+        (4, 'server_tls_cert', TYPE_BYTES, OPTIONAL, None),
+    ])
+    add_message('Options', [
+        (1, 'tick_interval', TYPE_STRING, OPTIONAL, None),
+        (2, 'election_tick', TYPE_UINT32, OPTIONAL, None),
+        (3, 'heartbeat_tick', TYPE_UINT32, OPTIONAL, None),
+        (4, 'max_inflight_blocks', TYPE_UINT32, OPTIONAL, None),
+        (5, 'snapshot_interval_size', TYPE_UINT32, OPTIONAL, None),
+    ])
+    add_message('ConfigMetadata', [
+        (1, 'consenters', TYPE_MESSAGE, REPEATED, '.fixtures.Consenter'),
+        (2, 'options', TYPE_MESSAGE, OPTIONAL, '.fixtures.Options'),
+    ])
+    add_message('APIResource', [
+        (1, 'policy_ref', TYPE_STRING, OPTIONAL, None),
+    ])
+    acls = add_message('ACLs', [
+        (1, 'acls', TYPE_MESSAGE, REPEATED, '.fixtures.ACLs.AclsEntry'),
+    ])
+    entry = add_message('AclsEntry', [
+        (1, 'key', TYPE_STRING, OPTIONAL, None),
+        (2, 'value', TYPE_MESSAGE, OPTIONAL, '.fixtures.APIResource'),
+    ], acls)
+    entry.options.map_entry = True
+    add_message('ConsensusType', [
+        (1, 'type', TYPE_STRING, OPTIONAL, None),
+        (2, 'metadata', TYPE_BYTES, OPTIONAL, None),
+        (3, 'state', descriptor_pb2.FieldDescriptorProto.TYPE_ENUM, OPTIONAL, '.fixtures.State'),
+    ])
+    state = file.enum_type.add(name='State')
+    state.value.add(name='STATE_NORMAL', number=0)
+    state.value.add(name='STATE_MAINTENANCE', number=1)
+    file.package = 'fixtures'
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file)
+    result = dict()
+    for name in ['Consenter', 'Options', 'ConfigMetadata', 'APIResource', 'ACLs', 'ConsensusType']:
+        descriptor = pool.FindMessageTypeByName(f'fixtures.{name}')
+        if GetMessageClass is not None:
+            result[name] = GetMessageClass(descriptor)
+        else:
+            from google.protobuf import message_factory
+            result[name] = message_factory.MessageFactory(pool).GetPrototype(descriptor)
+    return result
+
+
+EXTRA = _build_extra_messages()
+
+
+def serialize(message):
+    return message.SerializeToString(deterministic=True)
+
+
+def config_value(message, mod_policy='Admins', version=0):
+    return configtx_pb2.ConfigValue(version=version, value=serialize(message), mod_policy=mod_policy)
+
+
+def signature_policy(msp_ids, role=msp_principal_pb2.MSPRole.MEMBER, n=1):
+    principals = [
+        msp_principal_pb2.MSPPrincipal(
+            principal_classification=msp_principal_pb2.MSPPrincipal.ROLE,
+            principal=serialize(msp_principal_pb2.MSPRole(msp_identifier=msp_id, role=role))
+        ) for msp_id in msp_ids
+    ]
+    rule = policies_pb2.SignaturePolicy(n_out_of=policies_pb2.SignaturePolicy.NOutOf(
+        n=n,
+        rules=[policies_pb2.SignaturePolicy(signed_by=i) for i in range(len(msp_ids))]
+    ))
+    envelope = policies_pb2.SignaturePolicyEnvelope(version=0, rule=rule, identities=principals)
+    return policies_pb2.Policy(type=policies_pb2.Policy.SIGNATURE, value=serialize(envelope))
+
+
+def implicit_meta_policy(sub_policy, rule=policies_pb2.ImplicitMetaPolicy.ANY):
+    policy = policies_pb2.ImplicitMetaPolicy(sub_policy=sub_policy, rule=rule)
+    return policies_pb2.Policy(type=policies_pb2.Policy.IMPLICIT_META, value=serialize(policy))
+
+
+def config_policy(policy, mod_policy='Admins', version=0):
+    return configtx_pb2.ConfigPolicy(version=version, policy=policy, mod_policy=mod_policy)
+
+
+def msp_value(msp_id, root_cert=CERT):
+    fabric_config = msp_config_pb2.FabricMSPConfig(
+        name=msp_id,
+        root_certs=[root_cert],
+        admins=[],
+        tls_root_certs=[root_cert],
+        crypto_config=msp_config_pb2.FabricCryptoConfig(
+            signature_hash_family='SHA2',
+            identity_identifier_hash_function='SHA256'
+        ),
+        fabric_node_ous=msp_config_pb2.FabricNodeOUs(
+            enable=True,
+            client_ou_identifier=msp_config_pb2.FabricOUIdentifier(certificate=root_cert, organizational_unit_identifier='client'),
+            peer_ou_identifier=msp_config_pb2.FabricOUIdentifier(certificate=root_cert, organizational_unit_identifier='peer')
+        )
+    )
+    return msp_config_pb2.MSPConfig(type=0, config=serialize(fabric_config))
+
+
+def organization_group(msp_id, anchor_peers=None):
+    group = configtx_pb2.ConfigGroup(mod_policy='Admins')
+    group.values['MSP'].CopyFrom(config_value(msp_value(msp_id)))
+    if anchor_peers:
+        group.values['AnchorPeers'].CopyFrom(config_value(peer_configuration_pb2.AnchorPeers(anchor_peers=[
+            peer_configuration_pb2.AnchorPeer(host=host, port=port) for (host, port) in anchor_peers
+        ])))
+    group.policies['Readers'].CopyFrom(config_policy(signature_policy([msp_id])))
+    group.policies['Writers'].CopyFrom(config_policy(signature_policy([msp_id])))
+    group.policies['Admins'].CopyFrom(config_policy(signature_policy([msp_id], role=msp_principal_pb2.MSPRole.ADMIN)))
+    group.policies['Endorsement'].CopyFrom(config_policy(signature_policy([msp_id], role=msp_principal_pb2.MSPRole.PEER)))
+    return group
+
+
+def standard_policies(group):
+    group.policies['Readers'].CopyFrom(config_policy(implicit_meta_policy('Readers')))
+    group.policies['Writers'].CopyFrom(config_policy(implicit_meta_policy('Writers')))
+    group.policies['Admins'].CopyFrom(config_policy(implicit_meta_policy('Admins', policies_pb2.ImplicitMetaPolicy.MAJORITY)))
+
+
+def consensus_type():
+    metadata = EXTRA['ConfigMetadata'](
+        consenters=[
+            EXTRA['Consenter'](host=f'orderer{i}.example.org', port=7050, client_tls_cert=CERT, server_tls_cert=CERT)
+            for i in range(3)
+        ],
+        options=EXTRA['Options'](
+            tick_interval='500ms',
+            election_tick=10,
+            heartbeat_tick=1,
+            max_inflight_blocks=5,
+            snapshot_interval_size=16777216
+        )
+    )
+    return EXTRA['ConsensusType'](type='etcdraft', metadata=serialize(metadata))
+
+
+def channel_config(channel_id='mychannel', sequence=3):
+    channel = configtx_pb2.ConfigGroup(mod_policy='Admins', version=0)
+    standard_policies(channel)
+    channel.values['HashingAlgorithm'].CopyFrom(config_value(configuration_pb2.HashingAlgorithm(name='SHA256')))
+    channel.values['BlockDataHashingStructure'].CopyFrom(config_value(configuration_pb2.BlockDataHashingStructure(width=4294967295)))
+    channel.values['OrdererAddresses'].CopyFrom(config_value(configuration_pb2.OrdererAddresses(addresses=['orderer0.example.org:7050']), mod_policy='/Channel/Orderer/Admins'))
+    channel.values['Capabilities'].CopyFrom(config_value(configuration_pb2.Capabilities(capabilities={'V2_0': configuration_pb2.Capability()})))
+    orderer = channel.groups['Orderer']
+    orderer.mod_policy = 'Admins'
+    standard_policies(orderer)
+    orderer.policies['BlockValidation'].CopyFrom(config_policy(implicit_meta_policy('Writers')))
+    orderer.values['ConsensusType'].CopyFrom(config_value(consensus_type()))
+    orderer.values['BatchSize'].CopyFrom(config_value(orderer_configuration_pb2.BatchSize(max_message_count=10, absolute_max_bytes=103809024, preferred_max_bytes=524288)))
+    orderer.values['BatchTimeout'].CopyFrom(config_value(orderer_configuration_pb2.BatchTimeout(timeout='2s')))
+    orderer.values['ChannelRestrictions'].CopyFrom(config_value(orderer_configuration_pb2.ChannelRestrictions()))
+    orderer.values['Capabilities'].CopyFrom(config_value(configuration_pb2.Capabilities(capabilities={'V2_0': configuration_pb2.Capability()})))
+    orderer.groups['OrdererOrg'].CopyFrom(organization_group('OrdererMSP'))
+    orderer.groups['OrdererOrg'].values['Endpoints'].CopyFrom(config_value(configuration_pb2.OrdererAddresses(addresses=['orderer0.example.org:7050'])))
+    application = channel.groups['Application']
+    application.mod_policy = 'Admins'
+    application.version = 1
+    standard_policies(application)
+    application.policies['LifecycleEndorsement'].CopyFrom(config_policy(implicit_meta_policy('Endorsement', policies_pb2.ImplicitMetaPolicy.MAJORITY)))
+    application.policies['Endorsement'].CopyFrom(config_policy(implicit_meta_policy('Endorsement', policies_pb2.ImplicitMetaPolicy.MAJORITY)))
+    application.values['Capabilities'].CopyFrom(config_value(configuration_pb2.Capabilities(capabilities={'V2_0': configuration_pb2.Capability()})))
+    application.values['ACLs'].CopyFrom(config_value(EXTRA['ACLs'](acls={
+        '_lifecycle/CommitChaincodeDefinition': EXTRA['APIResource'](policy_ref='/Channel/Application/Writers'),
+        'peer/Propose': EXTRA['APIResource'](policy_ref='/Channel/Application/Writers'),
+        'qscc/GetChainInfo': EXTRA['APIResource'](policy_ref='/Channel/Application/Readers'),
+    })))
+    application.groups['Org1'].CopyFrom(organization_group('Org1MSP', [('peer0.org1.example.org', 7051)]))
+    application.groups['Org2'].CopyFrom(organization_group('Org2MSP'))
+    return configtx_pb2.Config(sequence=sequence, channel_group=channel)
+
+
+def signature_header(msp_id):
+    creator = identities_pb2.SerializedIdentity(mspid=msp_id, id_bytes=CERT)
+    return common_pb2.SignatureHeader(creator=serialize(creator), nonce=b'\x01\x02\x03\x04\x05\x06\x07\x08')
+
+
+def channel_header(header_type, channel_id='mychannel', tx_id=''):
+    return common_pb2.ChannelHeader(
+        type=header_type,
+        version=0,
+        timestamp=timestamp_pb2.Timestamp(seconds=1700000000, nanos=123000000),
+        channel_id=channel_id,
+        tx_id=tx_id,
+        epoch=0
+    )
+
+
+def config_update():
+    read_set = configtx_pb2.ConfigGroup(version=0)
+    read_set.groups['Application'].version = 1
+    read_set.groups['Application'].groups['Org1'].version = 0
+    write_set = configtx_pb2.ConfigGroup(version=0)
+    write_set.groups['Application'].version = 2
+    write_set.groups['Application'].mod_policy = 'Admins'
+    write_set.groups['Application'].groups['Org1'].version = 0
+    write_set.groups['Application'].groups['Org3'].CopyFrom(organization_group('Org3MSP'))
+    return configtx_pb2.ConfigUpdate(channel_id='mychannel', read_set=read_set, write_set=write_set)
+
+
+def config_update_envelope():
+    signatures = [
+        configtx_pb2.ConfigSignature(signature_header=serialize(signature_header(msp_id)), signature=b'\x30\x44' + msp_id.encode('utf-8'))
+        for msp_id in ['Org1MSP', 'Org2MSP']
+    ]
+    return configtx_pb2.ConfigUpdateEnvelope(config_update=serialize(config_update()), signatures=signatures)
+
+
+def envelope(header_type, data, msp_id='Org1MSP', tx_id=''):
+    payload = common_pb2.Payload(
+        header=common_pb2.Header(
+            channel_header=serialize(channel_header(header_type, tx_id=tx_id)),
+            signature_header=serialize(signature_header(msp_id))
+        ),
+        data=serialize(data)
+    )
+    return common_pb2.Envelope(payload=serialize(payload), signature=b'\x30\x45\x02\x21\x00signature')
+
+
+def config_block():
+    last_update = envelope(common_pb2.CONFIG_UPDATE, config_update_envelope())
+    config_envelope = configtx_pb2.ConfigEnvelope(config=channel_config(), last_update=last_update)
+    data = common_pb2.BlockData(data=[serialize(envelope(common_pb2.CONFIG, config_envelope, msp_id='OrdererMSP'))])
+    metadata = common_pb2.BlockMetadata(metadata=[
+        serialize(common_pb2.Metadata(value=b'', signatures=[common_pb2.MetadataSignature(signature_header=serialize(signature_header('OrdererMSP')), signature=b'sig')])),
+        b'',
+        b'',
+        b'',
+    ])
+    header = common_pb2.BlockHeader(number=7, previous_hash=b'\x11' * 32, data_hash=b'\x22' * 32)
+    return common_pb2.Block(header=header, data=data, metadata=metadata)
+
+
+# The messages to test, by name, as (message type, message) pairs.
+MESSAGES = {
+    'config_block': ('common.Block', config_block),
+    'config': ('common.Config', channel_config),
+    'config_envelope': ('common.ConfigEnvelope', lambda: configtx_pb2.ConfigEnvelope(config=channel_config(), last_update=envelope(common_pb2.CONFIG_UPDATE, config_update_envelope()))),
+    'config_update': ('common.ConfigUpdate', config_update),
+    'config_update_envelope': ('common.ConfigUpdateEnvelope', config_update_envelope),
+    'config_update_tx': ('common.Envelope', lambda: envelope(common_pb2.CONFIG_UPDATE, config_update_envelope())),
+}
+
+
+def modify(function):
+    def result():
+        config = channel_config()
+        function(config.channel_group)
+        return config
+    return result
+
+
+def add_group(channel):
+    channel.groups['Application'].groups['Org3'].CopyFrom(organization_group('Org3MSP'))
+
+
+def modify_group(channel):
+    channel.groups['Application'].groups['Org1'].mod_policy = 'Writers'
+
+
+def remove_group(channel):
+    del channel.groups['Application'].groups['Org2']
+
+
+def add_value(channel):
+    channel.groups['Application'].groups['Org2'].values['AnchorPeers'].CopyFrom(config_value(peer_configuration_pb2.AnchorPeers(anchor_peers=[
+        peer_configuration_pb2.AnchorPeer(host='peer0.org2.example.org', port=9051)
+    ])))
+
+
+def modify_value(channel):
+    channel.groups['Orderer'].values['BatchSize'].CopyFrom(config_value(orderer_configuration_pb2.BatchSize(max_message_count=500, absolute_max_bytes=103809024, preferred_max_bytes=524288)))
+
+
+def modify_msp(channel):
+    channel.groups['Application'].groups['Org1'].values['MSP'].CopyFrom(config_value(msp_value('Org1MSP', OTHER_CERT)))
+
+
+def remove_value(channel):
+    del channel.groups['Application'].groups['Org1'].values['AnchorPeers']
+
+
+def add_policy(channel):
+    channel.groups['Application'].policies['Custom'].CopyFrom(config_policy(signature_policy(['Org1MSP', 'Org2MSP'], n=2)))
+
+
+def modify_policy(channel):
+    channel.groups['Application'].policies['Endorsement'].CopyFrom(config_policy(implicit_meta_policy('Endorsement', policies_pb2.ImplicitMetaPolicy.ANY)))
+
+
+def remove_policy(channel):
+    del channel.groups['Application'].policies['LifecycleEndorsement']
+
+
+def modify_mod_policy(channel):
+    channel.groups['Orderer'].mod_policy = 'Writers'
+
+
+def modify_nested(channel):
+    modify_value(channel)
+    add_group(channel)
+    remove_policy(channel)
+
+
+# The configuration updates to test, by name, as (original config, updated config) pairs.
+UPDATES = {
+    'add_group': (channel_config, modify(add_group)),
+    'modify_group': (channel_config, modify(modify_group)),
+    'remove_group': (channel_config, modify(remove_group)),
+    'add_value': (channel_config, modify(add_value)),
+    'modify_value': (channel_config, modify(modify_value)),
+    'modify_msp': (channel_config, modify(modify_msp)),
+    'remove_value': (channel_config, modify(remove_value)),
+    'add_policy': (channel_config, modify(add_policy)),
+    'modify_policy': (channel_config, modify(modify_policy)),
+    'remove_policy': (channel_config, modify(remove_policy)),
+    'modify_mod_policy': (channel_config, modify(modify_mod_policy)),
+    'modify_nested': (channel_config, modify(modify_nested)),
+}
@@ -0,0 +1,206 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.hyperledger.fabric_ansible_collection.plugins.module_utils.channel_utils import compute_config_update
+from ansible_collections.hyperledger.fabric_ansible_collection.plugins.module_utils.proto_codec import decode_message
+from ansible_collections.hyperledger.fabric_ansible_collection.tests.unit.plugins.module_utils.proto_fixtures import (
+    UPDATES, channel_config, serialize)
+
+# The members of the groups in the original configuration, at their versions.
+SAME = dict(version='0')
+ORG_POLICIES = dict(Readers='0', Writers='0', Admins='0', Endorsement='0')
+ORDERER_VALUES = dict(ConsensusType='0', BatchSize='0', BatchTimeout='0', ChannelRestrictions='0', Capabilities='0')
+ORDERER_POLICIES = dict(Readers='0', Writers='0', Admins='0', BlockValidation='0')
+APPLICATION_GROUPS = dict(Org1=SAME, Org2=SAME)
+APPLICATION_VALUES = dict(Capabilities='0', ACLs='0')
+APPLICATION_POLICIES = dict(ORG_POLICIES, LifecycleEndorsement='0')
+ORG3 = dict(version='0', mod_policy='Admins', values=dict(MSP='0'), policies=ORG_POLICIES)
+
+# The expected read set and write set for each configuration update, where
+# each group is summarized as its version, mod policy, and the versions of its
+# members. These follow the rules used by configtxlator compute_update:
+#  - modified values and policies are written at their next version;
+#  - added members are written at version zero;
+#  - if members are added or removed, or the mod policy is changed, then the
+#    group is written at its next version, and the unchanged members are
+#    included in both the read set and the write set;
+#  - otherwise the group is included at its current version, with only the
+#    modified members.
+CASES = [
+    ('add_group', dict(
+        read_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=APPLICATION_GROUPS, values=APPLICATION_VALUES, policies=APPLICATION_POLICIES)
+        )),
+        write_set=dict(version='0', groups=dict(
+            Application=dict(version='2', mod_policy='Admins', groups=dict(APPLICATION_GROUPS, Org3=ORG3), values=APPLICATION_VALUES, policies=APPLICATION_POLICIES)
+        ))
+    )),
+    ('modify_group', dict(
+        read_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=dict(
+                Org1=dict(version='0', values=dict(MSP='0', AnchorPeers='0'), policies=ORG_POLICIES)
+            ))
+        )),
+        write_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=dict(
+                Org1=dict(version='1', mod_policy='Writers', values=dict(MSP='0', AnchorPeers='0'), policies=ORG_POLICIES)
+            ))
+        ))
+    )),
+    ('remove_group', dict(
+        read_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=dict(Org1=SAME), values=APPLICATION_VALUES, policies=APPLICATION_POLICIES)
+        )),
+        write_set=dict(version='0', groups=dict(
+            Application=dict(version='2', mod_policy='Admins', groups=dict(Org1=SAME), values=APPLICATION_VALUES, policies=APPLICATION_POLICIES)
+        ))
+    )),
+    ('add_value', dict(
+        read_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=dict(
+                Org2=dict(version='0', values=dict(MSP='0'), policies=ORG_POLICIES)
+            ))
+        )),
+        write_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=dict(
+                Org2=dict(version='1', mod_policy='Admins', values=dict(MSP='0', AnchorPeers='0'), policies=ORG_POLICIES)
+            ))
+        ))
+    )),
+    ('modify_value', dict(
+        read_set=dict(version='0', groups=dict(
+            Orderer=dict(version='0')
+        )),
+        write_set=dict(version='0', groups=dict(
+            Orderer=dict(version='0', values=dict(BatchSize='1'))
+        ))
+    )),
+    ('modify_msp', dict(
+        read_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=dict(Org1=SAME))
+        )),
+        write_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=dict(
+                Org1=dict(version='0', values=dict(MSP='1'))
+            ))
+        ))
+    )),
+    ('remove_value', dict(
+        read_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=dict(
+                Org1=dict(version='0', values=dict(MSP='0'), policies=ORG_POLICIES)
+            ))
+        )),
+        write_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=dict(
+                Org1=dict(version='1', mod_policy='Admins', values=dict(MSP='0'), policies=ORG_POLICIES)
+            ))
+        ))
+    )),
+    ('add_policy', dict(
+        read_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=APPLICATION_GROUPS, values=APPLICATION_VALUES, policies=APPLICATION_POLICIES)
+        )),
+        write_set=dict(version='0', groups=dict(
+            Application=dict(version='2', mod_policy='Admins', groups=APPLICATION_GROUPS, values=APPLICATION_VALUES, policies=dict(APPLICATION_POLICIES, Custom='0'))
+        ))
+    )),
+    ('modify_policy', dict(
+        read_set=dict(version='0', groups=dict(
+            Application=dict(version='1')
+        )),
+        write_set=dict(version='0', groups=dict(
+            Application=dict(version='1', policies=dict(Endorsement='1'))
+        ))
+    )),
+    ('remove_policy', dict(
+        read_set=dict(version='0', groups=dict(
+            Application=dict(version='1', groups=APPLICATION_GROUPS, values=APPLICATION_VALUES, policies=ORG_POLICIES)
+        )),
+        write_set=dict(version='0', groups=dict(
+            Application=dict(version='2', mod_policy='Admins', groups=APPLICATION_GROUPS, values=APPLICATION_VALUES, policies=ORG_POLICIES)
+        ))
+    )),
+    ('modify_mod_policy', dict(
+        read_set=dict(version='0', groups=dict(
+            Orderer=dict(version='0', groups=dict(OrdererOrg=SAME), values=ORDERER_VALUES, policies=ORDERER_POLICIES)
+        )),
+        write_set=dict(version='0', groups=dict(
+            Orderer=dict(version='1', mod_policy='Writers', groups=dict(OrdererOrg=SAME), values=ORDERER_VALUES, policies=ORDERER_POLICIES)
+        ))
+    )),
+    ('modify_nested', dict(
+        read_set=dict(version='0', groups=dict(
+            Orderer=dict(version='0'),
+            Application=dict(version='1', groups=APPLICATION_GROUPS, values=APPLICATION_VALUES, policies=ORG_POLICIES)
+        )),
+        write_set=dict(version='0', groups=dict(
+            Orderer=dict(version='0', values=dict(BatchSize='1')),
+            Application=dict(version='2', mod_policy='Admins', groups=dict(APPLICATION_GROUPS, Org3=ORG3), values=APPLICATION_VALUES, policies=ORG_POLICIES)
+        ))
+    )),
+]
+
+
+def summarize(group):
+    result = dict(version=group['version'])
+    if group.get('mod_policy'):
+        result['mod_policy'] = group['mod_policy']
+    if group.get('groups'):
+        result['groups'] = {name: summarize(child) for name, child in group['groups'].items()}
+    for key in ['values', 'policies']:
+        if group.get(key):
+            result[key] = {name: member['version'] for name, member in group[key].items()}
+    return result
+
+
+def check_written_members(write_set, updated):
+
+    # Unchanged members are included with only their version, so every member
+    # with a mod policy must have been written with its updated contents.
+    for (key, content) in [('values', 'value'), ('policies', 'policy')]:
+        for name, member in write_set.get(key, dict()).items():
+            if member['mod_policy']:
+                assert member[content] == updated[key][name][content]
+                assert member['mod_policy'] == updated[key][name]['mod_policy']
+    for name, group in write_set.get('groups', dict()).items():
+        check_written_members(group, updated['groups'][name])
+
+
+def compute(name):
+    (build_original, build_updated) = UPDATES[name]
+    original = decode_message('common.Config', serialize(build_original()))
+    updated = decode_message('common.Config', serialize(build_updated()))
+    return (compute_config_update('mychannel', original, updated), updated)
+
+
+def test_cases_cover_updates():
+    assert sorted(name for (name, _) in CASES) == sorted(UPDATES)
+
+
+@pytest.mark.parametrize('name,expected', CASES, ids=[name for (name, _) in CASES])
+def test_compute_config_update(name, expected):
+    (config_update, updated) = compute(name)
+    assert config_update['channel_id'] == 'mychannel'
+    assert summarize(config_update['read_set']) == expected['read_set']
+    assert summarize(config_update['write_set']) == expected['write_set']
+    check_written_members(config_update['write_set'], updated['channel_group'])
+
+
+def test_compute_config_update_no_changes():
+    config = decode_message('common.Config', serialize(channel_config()))
+    assert compute_config_update('mychannel', config, config) is None
+
+
+def test_compute_config_update_no_channel_group():
+    config = decode_message('common.Config', serialize(channel_config()))
+    with pytest.raises(Exception, match='No channel group included for original config'):
+        compute_config_update('mychannel', dict(), config)
+    with pytest.raises(Exception, match='No channel group included for updated config'):
+        compute_config_update('mychannel', config, dict())
@@ -0,0 +1,138 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from unittest import mock
+
+import pytest
+
+from ansible_collections.hyperledger.fabric_ansible_collection.plugins.module_utils import proto_utils
+from ansible_collections.hyperledger.fabric_ansible_collection.plugins.module_utils.proto_codec import (
+    UnsupportedProtoError, decode_message, encode_message)
+from ansible_collections.hyperledger.fabric_ansible_collection.tests.unit.plugins.module_utils.proto_fixtures import (
+    MESSAGES, channel_config, serialize)
+
+MESSAGE_NAMES = sorted(MESSAGES)
+
+# An extra field that is not part of common.Config (field 111, varint 1).
+UNKNOWN_FIELD = b'\xf8\x06\x01'
+
+
+def build(name):
+    (proto_type, builder) = MESSAGES[name]
+    return (proto_type, serialize(builder()))
+
+
+@pytest.mark.parametrize('name', MESSAGE_NAMES)
+def test_round_trip_matches_protobuf_bytes(name):
+    (proto_type, data) = build(name)
+    assert encode_message(proto_type, decode_message(proto_type, data)) == data
+
+
+def test_decode_config_block():
+    (proto_type, data) = build('config_block')
+    block = decode_message(proto_type, data)
+    assert block['header']['number'] == '7'
+    payload = block['data']['data'][0]['payload']
+    assert payload['header']['channel_header']['type'] == 1
+    assert payload['header']['channel_header']['timestamp'] == '2023-11-14T22:13:20.123Z'
+    assert payload['header']['signature_header']['creator']['mspid'] == 'OrdererMSP'
+    config = payload['data']['config']
+    assert config['sequence'] == '3'
+    channel_group = config['channel_group']
+    org1 = channel_group['groups']['Application']['groups']['Org1']
+    assert org1['values']['MSP']['value']['config']['name'] == 'Org1MSP'
+    assert org1['values']['AnchorPeers']['value']['anchor_peers'] == [dict(host='peer0.org1.example.org', port=7051)]
+    assert org1['policies']['Admins']['policy']['type'] == 1
+    assert org1['policies']['Admins']['policy']['value']['identities'][0]['principal'] == dict(msp_identifier='Org1MSP', role='ADMIN')
+    assert channel_group['policies']['Admins']['policy']['value'] == dict(rule='MAJORITY', sub_policy='Admins')
+    orderer = channel_group['groups']['Orderer']
+    assert orderer['values']['BatchSize']['value']['max_message_count'] == 10
+    consensus_type = orderer['values']['ConsensusType']['value']
+    assert consensus_type['type'] == 'etcdraft'
+    assert [consenter['host'] for consenter in consensus_type['metadata']['consenters']] == ['orderer0.example.org', 'orderer1.example.org', 'orderer2.example.org']
+    assert consensus_type['metadata']['options']['snapshot_interval_size'] == 16777216
+    last_update = payload['data']['last_update']['payload']['data']
+    assert last_update['config_update']['write_set']['groups']['Application']['version'] == '2'
+    assert [signature['signature_header']['creator']['mspid'] for signature in last_update['signatures']] == ['Org1MSP', 'Org2MSP']
+
+
+def test_decode_unknown_field():
+    with pytest.raises(UnsupportedProtoError):
+        decode_message('common.Config', serialize(channel_config()) + UNKNOWN_FIELD)
+
+
+def test_encode_unknown_field():
+    config = decode_message('common.Config', serialize(channel_config()))
+    config['channel_group']['values']['Custom'] = dict(version='0', mod_policy='Admins', value=dict(foo='bar'))
+    with pytest.raises(UnsupportedProtoError):
+        encode_message('common.Config', config)
+
+
+def test_default_codec(monkeypatch):
+    monkeypatch.delenv('IBP_ANSIBLE_PROTO_CODEC', raising=False)
+    assert proto_utils.get_codec() == 'configtxlator'
+
+
+@pytest.fixture
+def configtxlator(monkeypatch):
+    monkeypatch.setenv('IBP_ANSIBLE_PROTO_CODEC', 'native')
+    with mock.patch.object(proto_utils, '_configtxlator_proto_to_json') as proto_to_json, \
+            mock.patch.object(proto_utils, '_configtxlator_json_to_proto') as json_to_proto:
+        yield (proto_to_json, json_to_proto)
+
+
+def test_proto_to_json_native(configtxlator):
+    (proto_to_json, json_to_proto) = configtxlator
+    data = serialize(channel_config())
+    assert proto_utils.proto_to_json('common.Config', data) == decode_message('common.Config', data)
+    proto_to_json.assert_not_called()
+
+
+def test_json_to_proto_native(configtxlator):
+    (proto_to_json, json_to_proto) = configtxlator
+    data = serialize(channel_config())
+    assert proto_utils.json_to_proto('common.Config', decode_message('common.Config', data)) == data
+    json_to_proto.assert_not_called()
+
+
+def test_proto_to_json_falls_back_on_unsupported_proto(configtxlator):
+    (proto_to_json, json_to_proto) = configtxlator
+    proto_to_json.return_value = dict(fallback=True)
+    data = serialize(channel_config()) + UNKNOWN_FIELD
+    assert proto_utils.proto_to_json('common.Config', data) == dict(fallback=True)
+    proto_to_json.assert_called_once_with('common.Config', data)
+
+
+def test_json_to_proto_falls_back_on_unsupported_proto(configtxlator):
+    (proto_to_json, json_to_proto) = configtxlator
+    json_to_proto.return_value = b'fallback'
+    config = decode_message('common.Config', serialize(channel_config()))
+    config['channel_group']['values']['Custom'] = dict(version='0', mod_policy='Admins', value=dict(foo='bar'))
+    assert proto_utils.json_to_proto('common.Config', config) == b'fallback'
+    json_to_proto.assert_called_once_with('common.Config', config)
+
+
+def test_unsupported_type_uses_configtxlator(configtxlator):
+    (proto_to_json, json_to_proto) = configtxlator
+    proto_to_json.return_value = dict(fallback=True)
+    json_to_proto.return_value = b'fallback'
+    assert proto_utils.proto_to_json('protos.ProposalResponse', b'data') == dict(fallback=True)
+    assert proto_utils.json_to_proto('protos.ProposalResponse', dict()) == b'fallback'
+
+
+def test_verify_codec(configtxlator, monkeypatch):
+    (proto_to_json, json_to_proto) = configtxlator
+    monkeypatch.setenv('IBP_ANSIBLE_PROTO_CODEC', 'verify')
+    data = serialize(channel_config())
+    config = decode_message('common.Config', data)
+    proto_to_json.side_effect = lambda proto_type, proto_input: decode_message(proto_type, proto_input)
+    json_to_proto.return_value = data
+    assert proto_utils.proto_to_json('common.Config', data) == config
+    assert proto_utils.json_to_proto('common.Config', config) == data
+    proto_to_json.side_effect = lambda proto_type, proto_input: dict(config, sequence='4')
+    with pytest.raises(Exception, match=r'differs from configtxlator at \$.sequence'):
+        proto_utils.proto_to_json('common.Config', data)